@@ -0,0 +1,159 @@
+# aspects.py — Aspect detection engine
+# Computes the full pairwise separation matrix once with NumPy and matches it against
+# configurable aspect sets (degree-based, per-planet orbs) or Vedic graha drishti (sign-based).
+# Used for the sky snapshot's planet-to-planet aspects, transits to the natal Moon and the
+# Cosmic Battery (live and forecast), which scores drishti cast on the natal Moon.
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class AspectType:
+    name: str      # "conjunct", "opposite", ...
+    angle: float   # Exact separation in degrees
+    orb: float     # Default allowed deviation in degrees
+
+
+@dataclass
+class Aspect:
+    planet_a: str
+    planet_b: str
+    kind: str          # Aspect name, or e.g. "drishti 7th" for graha drishti
+    angle: float       # Exact aspect angle (0 for sign-based drishti)
+    separation: float  # Actual angular separation (0-180)
+    orb: float         # |separation - angle|
+
+    @property
+    def is_drishti(self) -> bool:
+        """Sign-based: planet_a casts drishti on planet_b (not symmetric)."""
+        return self.kind.startswith("drishti")
+
+
+# Checked in order; the first match wins for a pair
+MAJOR_ASPECTS = [
+    AspectType("conjunct", 0, 8),
+    AspectType("opposite", 180, 8),
+    AspectType("trine", 120, 8),
+    AspectType("square", 90, 8),
+]
+
+# Per-planet orbs (deg); a pair uses the mean of both planets' orbs
+PLANET_ORBS = {
+    "Sun": 10, "Moon": 10, "Mars": 7, "Mercury": 7, "Jupiter": 9,
+    "Venus": 7, "Saturn": 9, "Rahu": 5, "Ketu": 5,
+}
+
+# Vedic graha drishti: houses counted from the planet's own sign (all planets aspect the 7th)
+GRAHA_DRISHTI = {
+    "Mars": (4, 7, 8),
+    "Jupiter": (5, 7, 9),
+    "Saturn": (3, 7, 10),
+}
+DEFAULT_DRISHTI = (7,)
+
+
+def separation_matrix(lon_a: np.ndarray, lon_b: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Shortest angular separation (0-180) between every pair of longitudes.
+    Works on trailing axes, so (n, p) inputs give an (n, p, q) matrix.
+    """
+    lon_a = np.asarray(lon_a, dtype=np.float64)
+    lon_b = lon_a if lon_b is None else np.asarray(lon_b, dtype=np.float64)
+    diff = np.abs(lon_a[..., :, None] - lon_b[..., None, :]) % 360.0
+    return np.minimum(diff, 360.0 - diff)
+
+
+def _orb_matrix(names_a: List[str], names_b: List[str], aspect: AspectType,
+                planet_orbs: Optional[Dict[str, float]]) -> np.ndarray:
+    if planet_orbs is None:
+        return np.full((len(names_a), len(names_b)), aspect.orb)
+    orbs_a = np.array([planet_orbs.get(n, aspect.orb) for n in names_a], dtype=np.float64)
+    orbs_b = np.array([planet_orbs.get(n, aspect.orb) for n in names_b], dtype=np.float64)
+    return (orbs_a[:, None] + orbs_b[None, :]) / 2
+
+
+def find_aspects(
+    positions: Dict[str, float],
+    others: Optional[Dict[str, float]] = None,
+    aspect_types: Optional[List[AspectType]] = None,
+    planet_orbs: Optional[Dict[str, float]] = None,
+) -> List[Aspect]:
+    """
+    Find degree-based aspects. With only `positions`, each unordered pair is
+    reported once (planet_a before planet_b in input order). With `others`
+    (e.g. natal longitudes), every positions × others pair is checked.
+    """
+    aspect_types = MAJOR_ASPECTS if aspect_types is None else aspect_types
+    names_a = list(positions)
+    names_b = names_a if others is None else list(others)
+    sep = separation_matrix(
+        np.fromiter(positions.values(), dtype=np.float64, count=len(names_a)),
+        None if others is None else np.fromiter(others.values(), dtype=np.float64, count=len(names_b)),
+    )
+
+    # Index of the first matching aspect type per pair (-1 = none)
+    match = np.full(sep.shape, -1, dtype=np.int64)
+    for k, aspect in enumerate(aspect_types):
+        hit = (np.abs(sep - aspect.angle) < _orb_matrix(names_a, names_b, aspect, planet_orbs)) & (match < 0)
+        match[hit] = k
+    if others is None:
+        match[np.tril_indices(len(names_a))] = -1
+
+    records = []
+    for i, j in zip(*np.nonzero(match >= 0)):
+        aspect = aspect_types[match[i, j]]
+        separation = float(sep[i, j])
+        records.append(Aspect(
+            planet_a=names_a[i], planet_b=names_b[j], kind=aspect.name,
+            angle=aspect.angle, separation=round(separation, 2),
+            orb=round(abs(separation - aspect.angle), 2),
+        ))
+    return records
+
+
+def find_graha_drishti(
+    sign_indices: Dict[str, int],
+    others: Optional[Dict[str, int]] = None,
+) -> List[Aspect]:
+    """
+    Sign-based Vedic aspects: planet_a casts drishti on planet_b. Sign indices are 0-11.
+    With `others` (e.g. the natal Moon's sign), only drishti onto those targets is reported.
+    """
+    targets = sign_indices if others is None else others
+    records = []
+    for name, sign in sign_indices.items():
+        for house in GRAHA_DRISHTI.get(name, DEFAULT_DRISHTI):
+            target = (sign + house - 1) % 12
+            distance = (house - 1) * 30
+            for other, other_sign in targets.items():
+                if other_sign == target and (others is not None or other != name):
+                    records.append(Aspect(
+                        planet_a=name, planet_b=other, kind=f"drishti {house}th",
+                        angle=0, separation=float(min(distance, 360 - distance)), orb=0,
+                    ))
+    return records
+
+
+def summarize_by_planet(records: List[Aspect], planets: List[str], limit: int = 3) -> Dict[str, str]:
+    """
+    Per-planet summary like 'square Moon, trine Rahu, drishti 7th from Saturn'.
+    Degree aspects come first; drishti reads "on X" for the caster and "from X" for the target.
+    """
+    found: Dict[str, List[Tuple[bool, str, str]]] = {name: [] for name in planets}
+    for r in records:
+        if r.is_drishti:
+            found.setdefault(r.planet_a, []).append((True, r.planet_b, f"{r.kind} on {r.planet_b}"))
+            found.setdefault(r.planet_b, []).append((True, r.planet_a, f"{r.kind} from {r.planet_a}"))
+        else:
+            found.setdefault(r.planet_a, []).append((False, r.planet_b, f"{r.kind} {r.planet_b}"))
+            found.setdefault(r.planet_b, []).append((False, r.planet_a, f"{r.kind} {r.planet_a}"))
+
+    order = {name: i for i, name in enumerate(planets)}
+    summary = {}
+    for name, items in found.items():
+        items.sort(key=lambda item: (item[0], order.get(item[1], len(order))))
+        summary[name] = ", ".join(text for _, _, text in items[:limit]) or "No major aspects"
+    return summary
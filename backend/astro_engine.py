@@ -2,9 +2,19 @@
 # Uses pyswisseph (Swiss Ephemeris) when available for accurate planetary positions.
 # Falls back to a lightweight mean-motion ephemeris when pyswisseph is unavailable.
 
-from datetime import datetime, date, time
-from typing import Optional, Dict, List, Tuple
-from dataclasses import dataclass
+import calendar
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from datetime import datetime, date, time, timedelta
+from typing import Any, Optional, Dict, List, Sequence, Tuple
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from config import settings
+from ephemeris_table import get_table
+from aspects import PLANET_ORBS, Aspect, find_aspects, find_graha_drishti, summarize_by_planet
 
 try:
     import swisseph as swe
@@ -126,6 +136,15 @@ class TransitInfo:
     aspect_info: str       # Key aspects being formed
 
 
+@dataclass
+class EphemerisBatch:
+    planets: List[str]       # Column order of the 2-D arrays
+    jd: np.ndarray           # Shape (n,)
+    longitude: np.ndarray    # Shape (n, len(planets)) sidereal longitude (0-360)
+    speed: np.ndarray        # Shape (n, len(planets)) deg/day
+    retrograde: np.ndarray   # Shape (n, len(planets)) bool
+
+
 @dataclass
 class CosmicBattery:
     percentage: int        # 0-100
@@ -163,9 +182,20 @@ def datetime_to_jd(dt: datetime) -> float:
     return jd + (hour / 24.0)
 
 
+_swe_thread = threading.local()
+
+
+def _swe_sidereal() -> None:
+    """Swiss Ephemeris keeps the sidereal mode per thread; set Lahiri once in each thread."""
+    if not getattr(_swe_thread, "ready", False):
+        swe.set_sid_mode(swe.SIDM_LAHIRI)
+        _swe_thread.ready = True
+
+
 def get_ayanamsa(jd: float) -> float:
     """Get the Lahiri ayanamsa value for a given Julian Day."""
     if SWE_AVAILABLE:
+        _swe_sidereal()
         return swe.get_ayanamsa(jd)
 
     # Approximate Lahiri ayanamsa (deg) using linear precession from J2000
@@ -188,10 +218,16 @@ def get_sidereal_position(planet_name: str, jd: float) -> Tuple[float, bool]:
     Calculate sidereal longitude of a planet.
     Returns (longitude, is_retrograde).
     """
+    table = get_table()
+    if table is not None and planet_name in MEAN_LONGITUDE and table.covers(jd):
+        longitude, speed = table.lookup(planet_name, jd)
+        return longitude, speed < 0 or planet_name == "Rahu"
+
     if SWE_AVAILABLE:
         planet_id = PLANET_IDS.get(planet_name)
         if planet_id is None:
             raise ValueError(f"Unknown planet: {planet_name}")
+        _swe_sidereal()
         flags = swe.FLG_SIDEREAL | swe.FLG_SPEED
         result = swe.calc_ut(jd, planet_id, flags)
         longitude = result[0][0]
@@ -243,87 +279,207 @@ def calculate_house_from_moon(planet_sign: str, moon_sign: str) -> int:
 
 
 # ═══════════════════════════════════════════════════════════════
-# HIGH-LEVEL FUNCTIONS (Used by API routes)
+# BATCH EPHEMERIS (NumPy, many instants at once)
 # ═══════════════════════════════════════════════════════════════
 
+def jd_range(start: datetime, days: float, step_hours: float) -> np.ndarray:
+    """Julian Days every step_hours from start, for the given number of days (end excluded)."""
+    count = int(days * 24 / step_hours)
+    return datetime_to_jd(start) + np.arange(count) * (step_hours / 24.0)
 
-def get_all_planet_positions(
-    dt: datetime,
-    birth_dt: Optional[datetime] = None
-) -> Dict[str, PlanetPosition]:
+
+def get_sidereal_positions_batch(
+    jds,
+    planets: Optional[List[str]] = None,
+    use_table: bool = True,
+) -> EphemerisBatch:
     """
-    Calculate sidereal positions of all planets for a given datetime.
-    If birth_dt provided, also calculates houses relative to birth Moon.
+    Calculate sidereal longitudes, speeds and retrograde flags for many
+    Julian Days and planets at once. Ketu is derived from Rahu.
+    Uses the precomputed ephemeris table when it covers the range.
     """
-    jd = datetime_to_jd(dt)
-    positions: Dict[str, PlanetPosition] = {}
+    jd = np.atleast_1d(np.asarray(jds, dtype=np.float64))
+    planets = list(planets or PLANETS)
+    for name in planets:
+        if name != "Ketu" and name not in MEAN_LONGITUDE:
+            raise ValueError(f"Unknown planet: {name}")
+
+    n, p = len(jd), len(planets)
+    longitude = np.empty((n, p), dtype=np.float64)
+    speed = np.empty((n, p), dtype=np.float64)
+
+    table = get_table() if use_table else None
+    if table is not None and not table.covers(float(jd.min()), float(jd.max())):
+        table = None
+
+    for col, name in enumerate(planets):
+        source = "Rahu" if name == "Ketu" else name
+        if table is not None:
+            longitude[:, col], speed[:, col] = table.lookup_batch(source, jd)
+        elif SWE_AVAILABLE:
+            _swe_fill(jd, PLANET_IDS[source], longitude[:, col], speed[:, col])
+        else:
+            _mean_motion_fill(jd, source, longitude[:, col], speed[:, col])
+        if name == "Ketu":
+            longitude[:, col] = (longitude[:, col] + 180.0) % 360.0
 
-    # Calculate birth Moon for house calculation
-    birth_moon_sign = None
-    if birth_dt:
-        birth_jd = datetime_to_jd(birth_dt)
-        moon_long, _ = get_sidereal_position("Moon", birth_jd)
-        birth_moon_sign, _ = longitude_to_sign(moon_long)
+    if table is not None or SWE_AVAILABLE:
+        retrograde = speed < 0
+    else:
+        d = jd - 2451545.0
+        retrograde = np.zeros((n, p), dtype=bool)
+        for col, name in enumerate(planets):
+            period = SYNODIC_PERIODS.get(name)
+            if period:
+                cycle, retro_window = period
+                retrograde[:, col] = (d % cycle) < retro_window
+
+    # Rahu/Ketu are always considered retrograde in Vedic astrology
+    for col, name in enumerate(planets):
+        if name in ("Rahu", "Ketu"):
+            retrograde[:, col] = True
+
+    return EphemerisBatch(planets=planets, jd=jd, longitude=longitude, speed=speed, retrograde=retrograde)
+
+
+def _swe_fill(jd: np.ndarray, planet_id: int, lon_out: np.ndarray, speed_out: np.ndarray) -> None:
+    _swe_sidereal()
+    calc_ut = swe.calc_ut
+    flags = swe.FLG_SIDEREAL | swe.FLG_SPEED
+    for i, t in enumerate(jd.tolist()):
+        xx = calc_ut(t, planet_id, flags)[0]
+        lon_out[i] = xx[0]
+        speed_out[i] = xx[3]
+    np.mod(lon_out, 360.0, out=lon_out)
+
+
+def _mean_motion_fill(jd: np.ndarray, planet: str, lon_out: np.ndarray, speed_out: np.ndarray) -> None:
+    l0, n = MEAN_LONGITUDE[planet]
+    d = jd - 2451545.0
+    ayanamsa = 24.0 + 0.0139696 * (d / 365.25)
+    lon_out[:] = ((l0 + n * d) - ayanamsa) % 360.0
+    speed_out[:] = n
+
+
+# ═══════════════════════════════════════════════════════════════
+# HIGH-LEVEL FUNCTIONS (Used by API routes)
+# ═══════════════════════════════════════════════════════════════
+
+
+def _build_positions(jd: float) -> Dict[str, PlanetPosition]:
+    """Calculate sidereal positions of all planets at a Julian Day (no houses)."""
+    positions: Dict[str, PlanetPosition] = {}
 
     for name in PLANETS:
         if name == "Ketu":
             # Ketu is 180° from Rahu
             rahu_pos = positions.get("Rahu")
-            if rahu_pos:
-                ketu_long = (rahu_pos.longitude + 180) % 360
-                sign, degree = longitude_to_sign(ketu_long)
-                nak, pada, _ = longitude_to_nakshatra(ketu_long)
-                house = None
-                if birth_moon_sign:
-                    house = calculate_house_from_moon(sign, birth_moon_sign)
-                positions["Ketu"] = PlanetPosition(
-                    planet="Ketu", longitude=ketu_long, sign=sign,
-                    sign_degree=round(degree, 2), nakshatra=nak,
-                    nakshatra_pada=pada, is_retrograde=True,
-                    house=house
-                )
-            continue
-
-        longitude, is_retro = get_sidereal_position(name, jd)
-        sign, degree = longitude_to_sign(longitude)
-        nak, pada, _ = longitude_to_nakshatra(longitude)
-
-        house = None
-        if birth_moon_sign:
-            house = calculate_house_from_moon(sign, birth_moon_sign)
-
-        # Rahu is always considered retrograde in Vedic astrology
-        if name == "Rahu":
+            if not rahu_pos:
+                continue
+            longitude = (rahu_pos.longitude + 180) % 360
             is_retro = True
+        else:
+            longitude, is_retro = get_sidereal_position(name, jd)
+            # Rahu is always considered retrograde in Vedic astrology
+            if name == "Rahu":
+                is_retro = True
 
+        sign, degree = longitude_to_sign(longitude)
+        nak, pada, _ = longitude_to_nakshatra(longitude)
         positions[name] = PlanetPosition(
             planet=name, longitude=longitude, sign=sign,
             sign_degree=round(degree, 2), nakshatra=nak,
             nakshatra_pada=pada, is_retrograde=is_retro,
-            house=house
         )
 
     return positions
 
 
-def get_current_transits(user_sign: str, user_dob: date) -> List[TransitInfo]:
-    """Get current planetary transits relative to user's Moon sign."""
-    now = datetime.utcnow()
-    birth_dt = datetime.combine(user_dob, time(12, 0))  # Default noon if no birth time
+def get_all_planet_positions(
+    dt: datetime,
+    birth_dt: Optional[datetime] = None
+) -> Dict[str, PlanetPosition]:
+    """
+    Calculate sidereal positions of all planets for a given datetime.
+    If birth_dt provided, also calculates houses relative to birth Moon.
+    """
+    positions = _build_positions(datetime_to_jd(dt))
 
-    positions = get_all_planet_positions(now, birth_dt)
+    # Calculate birth Moon for house calculation
+    if birth_dt:
+        moon_long, _ = get_sidereal_position("Moon", datetime_to_jd(birth_dt))
+        birth_moon_sign, _ = longitude_to_sign(moon_long)
+        for pos in positions.values():
+            pos.house = calculate_house_from_moon(pos.sign, birth_moon_sign)
 
-    # Get Moon sign from birth chart
-    birth_jd = datetime_to_jd(birth_dt)
-    moon_long, _ = get_sidereal_position("Moon", birth_jd)
-    moon_sign, _ = longitude_to_sign(moon_long)
+    return positions
 
-    transits = []
+
+# ═══════════════════════════════════════════════════════════════
+# SKY SNAPSHOT (shared across all users per time bucket)
+# ═══════════════════════════════════════════════════════════════
+
+@dataclass
+class SkySnapshot:
+    """Everything about the current sky that does not depend on the user."""
+    bucket_start: datetime
+    positions: Dict[str, PlanetPosition]
+    sign_index: Dict[str, int]     # Planet -> index into SIGNS
+    combust: Dict[str, bool]
+    aspect_records: List[Aspect]
+    aspects: Dict[str, str]        # Planet -> formatted key aspects
+    # Only 12 possible per-user results: precomputed for every natal Moon sign
+    transits_by_moon_sign: Dict[str, List[TransitInfo]] = field(default_factory=dict)
+    battery_by_moon_sign: Dict[str, CosmicBattery] = field(default_factory=dict)
+
+    def transits_for_moon_sign(self, moon_sign: str) -> List[TransitInfo]:
+        """Per-user transits: houses offset from the natal Moon sign."""
+        transits = self.transits_by_moon_sign.get(moon_sign)
+        if transits is not None:
+            return transits
+        moon_idx = SIGNS.index(moon_sign)
+        return [
+            TransitInfo(
+                planet=name,
+                sign=pos.sign,
+                house_from_moon=((self.sign_index[name] - moon_idx) % 12) + 1,
+                is_retrograde=pos.is_retrograde,
+                is_combust=self.combust[name],
+                aspect_info=self.aspects[name],
+            )
+            for name, pos in self.positions.items()
+        ]
+
+    def moon_drishti(self, moon_sign: str) -> List[Aspect]:
+        """Graha drishti cast on a natal Moon in this sign."""
+        return find_graha_drishti(self.sign_index, {"Moon": SIGNS.index(moon_sign)})
+
+    def battery_for_moon_sign(self, moon_sign: str) -> CosmicBattery:
+        battery = self.battery_by_moon_sign.get(moon_sign)
+        if battery is None:
+            battery = score_cosmic_battery(self.transits_for_moon_sign(moon_sign), self.moon_drishti(moon_sign))
+        return battery
+
+
+_SNAPSHOT_CACHE_SIZE = 4
+_snapshot_cache: "OrderedDict[datetime, SkySnapshot]" = OrderedDict()
+_snapshot_lock = threading.Lock()
+
+
+def sky_bucket_start(dt: datetime) -> datetime:
+    """Start of the SKY_SNAPSHOT_BUCKET_SECONDS bucket containing dt."""
+    bucket = max(1, settings.SKY_SNAPSHOT_BUCKET_SECONDS)
+    epoch = calendar.timegm(dt.utctimetuple())
+    return datetime.utcfromtimestamp(epoch - epoch % bucket)
+
+
+def build_sky_snapshot(dt: datetime) -> SkySnapshot:
+    """Compute positions, combustion and aspects for every planet at dt."""
+    positions = _build_positions(datetime_to_jd(dt))
     sun_long = positions["Sun"].longitude
 
+    combust: Dict[str, bool] = {}
     for name, pos in positions.items():
-        house = calculate_house_from_moon(pos.sign, moon_sign)
-
         # Check combustion (within 6° of Sun for most planets)
         is_combust = False
         if name not in ("Sun", "Rahu", "Ketu"):
@@ -332,42 +488,144 @@ def get_current_transits(user_sign: str, user_dob: date) -> List[TransitInfo]:
                 diff = 360 - diff
             combust_threshold = 6 if name != "Moon" else 12
             is_combust = diff < combust_threshold
+        combust[name] = is_combust
+
+    # Major aspects (per-planet orbs) plus graha drishti between all planets
+    sign_index = {name: SIGNS.index(pos.sign) for name, pos in positions.items()}
+    aspect_records = find_aspects(
+        {name: pos.longitude for name, pos in positions.items()}, planet_orbs=PLANET_ORBS
+    ) + find_graha_drishti(sign_index)
+
+    snapshot = SkySnapshot(
+        bucket_start=dt,
+        positions=positions,
+        sign_index=sign_index,
+        combust=combust,
+        aspect_records=aspect_records,
+        aspects=summarize_by_planet(aspect_records, list(positions)),
+    )
+    for moon_sign in SIGNS:
+        transits = snapshot.transits_for_moon_sign(moon_sign)
+        snapshot.transits_by_moon_sign[moon_sign] = transits
+        snapshot.battery_by_moon_sign[moon_sign] = score_cosmic_battery(transits, snapshot.moon_drishti(moon_sign))
+    return snapshot
 
-        # Determine key aspects
-        aspects = []
-        for other_name, other_pos in positions.items():
-            if other_name == name:
-                continue
-            diff = abs(pos.longitude - other_pos.longitude)
-            if diff > 180:
-                diff = 360 - diff
-            # Check major aspects (conjunction, opposition, trine, square)
-            if diff < 8:
-                aspects.append(f"conjunct {other_name}")
-            elif abs(diff - 180) < 8:
-                aspects.append(f"opposite {other_name}")
-            elif abs(diff - 120) < 8:
-                aspects.append(f"trine {other_name}")
-            elif abs(diff - 90) < 8:
-                aspects.append(f"square {other_name}")
-
-        transits.append(TransitInfo(
-            planet=name,
-            sign=pos.sign,
-            house_from_moon=house,
-            is_retrograde=pos.is_retrograde,
-            is_combust=is_combust,
-            aspect_info=", ".join(aspects[:3]) if aspects else "No major aspects"
-        ))
-
-    return transits
 
+def get_sky_snapshot(dt: Optional[datetime] = None) -> SkySnapshot:
+    """
+    Return the process-wide snapshot for the time bucket containing dt (default: now).
+    The sky is computed once per bucket and shared by every user.
+    """
+    start = sky_bucket_start(dt or datetime.utcnow())
+    snapshot = _snapshot_cache.get(start)
+    if snapshot is not None:
+        return snapshot
+
+    with _snapshot_lock:
+        snapshot = _snapshot_cache.get(start)
+        if snapshot is None:
+            snapshot = build_sky_snapshot(start)
+            _snapshot_cache[start] = snapshot
+            while len(_snapshot_cache) > _SNAPSHOT_CACHE_SIZE:
+                _snapshot_cache.popitem(last=False)
+    return snapshot
 
-def calculate_cosmic_battery(user_sign: str, user_dob: date) -> CosmicBattery:
+
+# ═══════════════════════════════════════════════════════════════
+# NATAL CHART (depends only on birth datetime)
+# ═══════════════════════════════════════════════════════════════
+
+@dataclass(frozen=True)
+class NatalChart:
+    moon_longitude: float
+    moon_sign: str
+    moon_nakshatra: str
+    moon_pada: int
+    dasha_lord: str             # Vimshottari Mahadasha running at birth
+    dasha_balance_years: float  # Years of that dasha remaining at birth
+    source: str = ""            # Ephemeris used: "table", "swe" or "mean" (see ephemeris_source)
+
+
+# Sources accurate enough to persist a natal chart (the mean-motion fallback is not)
+ACCURATE_SOURCES = ("table", "swe")
+
+
+def ephemeris_source(jd: float) -> str:
+    """Which ephemeris get_sidereal_position uses at jd: "table", "swe" or "mean"."""
+    table = get_table()
+    if table is not None and table.covers(jd):
+        return "table"
+    return "swe" if SWE_AVAILABLE else "mean"
+
+
+@lru_cache(maxsize=4096)
+def get_natal_chart(user_dob: date, birth_time: Optional[time] = None) -> NatalChart:
+    """Birth Moon sign, nakshatra and starting Vimshottari dasha (memoized)."""
+    birth_dt = datetime.combine(user_dob, birth_time or time(12, 0))  # Default noon if no birth time
+    jd = datetime_to_jd(birth_dt)
+    moon_long, _ = get_sidereal_position("Moon", jd)
+    moon_long = float(moon_long)
+    moon_sign, _ = longitude_to_sign(moon_long)
+    nak, pada, lord = longitude_to_nakshatra(moon_long)
+
+    # Balance of the first dasha = unelapsed fraction of the birth nakshatra
+    nak_span = 360 / 27
+    remaining = 1 - (moon_long % nak_span) / nak_span
+
+    return NatalChart(
+        moon_longitude=moon_long,
+        moon_sign=moon_sign,
+        moon_nakshatra=nak,
+        moon_pada=pada,
+        dasha_lord=lord,
+        dasha_balance_years=round(remaining * DASHA_YEARS[lord], 4),
+        source=ephemeris_source(jd),
+    )
+
+
+def natal_columns(natal: NatalChart) -> Optional[Dict[str, Any]]:
+    """User-row natal columns for a chart, or None if its ephemeris isn't worth persisting."""
+    if natal.source not in ACCURATE_SOURCES:
+        return None
+    return {
+        "natal_moon_longitude": natal.moon_longitude,
+        "natal_moon_sign": natal.moon_sign,
+        "natal_nakshatra": natal.moon_nakshatra,
+        "natal_nakshatra_pada": natal.moon_pada,
+        "natal_dasha_lord": natal.dasha_lord,
+        "natal_dasha_balance": natal.dasha_balance_years,
+        "natal_source": natal.source,
+    }
+
+
+def user_natal_chart(user: Dict[str, Any]) -> NatalChart:
+    """Natal chart from a user's stored columns; computed (memoized) when none were persisted."""
+    if not user.get("natal_source") or not user.get("natal_moon_sign"):
+        return get_natal_chart(date.fromisoformat(str(user["dob"])))
+    return NatalChart(
+        moon_longitude=float(user["natal_moon_longitude"]),
+        moon_sign=user["natal_moon_sign"],
+        moon_nakshatra=user["natal_nakshatra"],
+        moon_pada=int(user["natal_nakshatra_pada"]),
+        dasha_lord=user["natal_dasha_lord"],
+        dasha_balance_years=float(user["natal_dasha_balance"]),
+        source=user["natal_source"],
+    )
+
+
+# Graha drishti on the natal Moon: (score change, factor text)
+MOON_DRISHTI_SCORES = {
+    "Jupiter": (5, "Jupiter's {house} drishti on your Moon (protection) 🌟"),
+    "Saturn": (-5, "Saturn's {house} drishti on your Moon (pressure) 🪨"),
+    "Mars": (-4, "Mars's {house} drishti on your Moon (irritability) 🔥"),
+}
+
+
+def score_cosmic_battery(transits: List[TransitInfo], moon_drishti: Sequence[Aspect] = ()) -> CosmicBattery:
     """
-    Calculate the Cosmic Battery percentage based on current transits.
+    Score the Cosmic Battery from a user's transits and the graha drishti cast on
+    their natal Moon (see SkySnapshot.moon_drishti).
     """
-    transits = get_current_transits(user_sign, user_dob)
     score = 60  # Start neutral
     factors = []
 
@@ -431,6 +689,12 @@ def calculate_cosmic_battery(user_sign: str, user_dob: date) -> CosmicBattery:
                 score -= 5
                 factors.append(f"Rahu in {t.house_from_moon}th (creating confusion)")
 
+    for a in moon_drishti:
+        if a.planet_a in MOON_DRISHTI_SCORES:
+            delta, text = MOON_DRISHTI_SCORES[a.planet_a]
+            score += delta
+            factors.append(text.format(house=a.kind.split()[-1]))
+
     # Clamp score
     score = max(5, min(98, score))
 
@@ -459,46 +723,152 @@ def calculate_cosmic_battery(user_sign: str, user_dob: date) -> CosmicBattery:
     )
 
 
-def format_planetary_context(user_sign: str, user_dob: date) -> str:
+# ═══════════════════════════════════════════════════════════════
+# USER SKY CONTEXT (single pass per request)
+# ═══════════════════════════════════════════════════════════════
+
+@dataclass
+class UserSkyContext:
+    """Natal Moon, transits and battery for one user, computed once per request."""
+    user_sign: str
+    user_dob: date
+    now: datetime
+    natal: NatalChart
+    transits: List[TransitInfo]
+    natal_aspects: List[Aspect]    # Transiting planets aspecting the natal Moon
+    battery: CosmicBattery
+
+    @property
+    def planetary_context(self) -> str:
+        """Human-readable planetary context string to inject into AI prompts."""
+        lines = [f"Current Date: {self.now.strftime('%B %d, %Y %H:%M UTC')}"]
+        lines.append(f"User's Sun Sign: {self.user_sign.capitalize()}")
+        lines.append(f"User's Moon Sign (Rashi): {self.natal.moon_sign}")
+        lines.append(f"User's Birth Nakshatra: {self.natal.moon_nakshatra} (Pada {self.natal.moon_pada})")
+        lines.append("")
+        lines.append("CURRENT PLANETARY TRANSITS (Sidereal/Lahiri):")
+        lines.append("-" * 50)
+
+        for t in self.transits:
+            retro = " [RETROGRADE]" if t.is_retrograde else ""
+            combust = " [COMBUST]" if t.is_combust else ""
+            line = f"  {t.planet}: {t.sign}{retro}{combust}"
+            line += f" — {t.house_from_moon}th house from Moon"
+            if t.aspect_info != "No major aspects":
+                line += f" | Aspects: {t.aspect_info}"
+            lines.append(line)
+
+        if self.natal_aspects:
+            lines.append("")
+            lines.append("TRANSITS TO NATAL MOON:")
+            for a in self.natal_aspects:
+                if a.is_drishti:
+                    lines.append(f"  {a.planet_a} casts {a.kind} on natal Moon")
+                else:
+                    lines.append(f"  {a.planet_a} {a.kind} natal Moon (orb {a.orb}°)")
+
+        # Add battery info
+        lines.append("")
+        lines.append(f"COSMIC BATTERY: {self.battery.percentage}% ({self.battery.level})")
+        for f in self.battery.factors:
+            lines.append(f"  • {f}")
+
+        return "\n".join(lines)
+
+
+def get_user_sky_context(
+    user_sign: str,
+    user_dob: date,
+    natal: Optional[NatalChart] = None,
+) -> UserSkyContext:
     """
-    Generate a human-readable planetary context string to inject into AI prompts.
+    Compute natal Moon, current transits and battery for a user in one pass.
+    Pass a stored NatalChart to skip the birth-chart lookup entirely.
     """
-    transits = get_current_transits(user_sign, user_dob)
     now = datetime.utcnow()
+    natal = natal or get_natal_chart(user_dob)
+    snapshot = get_sky_snapshot(now)
+    transits = snapshot.transits_for_moon_sign(natal.moon_sign)
+    natal_aspects = find_aspects(
+        {name: pos.longitude for name, pos in snapshot.positions.items()},
+        {"Moon": natal.moon_longitude},
+        planet_orbs=PLANET_ORBS,
+    ) + snapshot.moon_drishti(natal.moon_sign)
+
+    return UserSkyContext(
+        user_sign=user_sign,
+        user_dob=user_dob,
+        now=now,
+        natal=natal,
+        transits=transits,
+        natal_aspects=natal_aspects,
+        battery=snapshot.battery_for_moon_sign(natal.moon_sign),
+    )
 
-    lines = [f"Current Date: {now.strftime('%B %d, %Y %H:%M UTC')}"]
-    lines.append(f"User's Sun Sign: {user_sign.capitalize()}")
 
-    # Get birth Moon sign
-    birth_dt = datetime.combine(user_dob, time(12, 0))
-    birth_jd = datetime_to_jd(birth_dt)
-    moon_long, _ = get_sidereal_position("Moon", birth_jd)
-    moon_sign, _ = longitude_to_sign(moon_long)
-    moon_nak, moon_pada, _ = longitude_to_nakshatra(moon_long)
+# ═══════════════════════════════════════════════════════════════
+# BATTERY FORECAST (one batch ephemeris pass)
+# ═══════════════════════════════════════════════════════════════
 
-    lines.append(f"User's Moon Sign (Rashi): {moon_sign}")
-    lines.append(f"User's Birth Nakshatra: {moon_nak} (Pada {moon_pada})")
-    lines.append("")
-    lines.append("CURRENT PLANETARY TRANSITS (Sidereal/Lahiri):")
-    lines.append("-" * 50)
+def forecast_cosmic_battery(
+    natal: NatalChart,
+    start: datetime,
+    days: int,
+    step_hours: float = 1.0,
+) -> List[Tuple[datetime, CosmicBattery]]:
+    """
+    Cosmic Battery at every step from start over the given number of days.
+    The score depends only on each planet's sign and retrograde flag (graha drishti
+    on the natal Moon is sign-based too), so each distinct sky configuration is
+    scored once with score_cosmic_battery.
+    """
+    batch = get_sidereal_positions_batch(jd_range(start, days, step_hours))
+
+    signs = (batch.longitude // 30).astype(np.int64) % 12
+    state = np.concatenate([signs, batch.retrograde.astype(np.int64)], axis=1)
+    configs, inverse = np.unique(state, axis=0, return_inverse=True)
+
+    moon_idx = SIGNS.index(natal.moon_sign)
+    p = len(batch.planets)
+    scored = []
+    for row in configs.tolist():
+        transits = [
+            TransitInfo(
+                planet=name,
+                sign=SIGNS[row[col]],
+                house_from_moon=((row[col] - moon_idx) % 12) + 1,
+                is_retrograde=bool(row[p + col]),
+                is_combust=False,
+                aspect_info="",
+            )
+            for col, name in enumerate(batch.planets)
+        ]
+        drishti = find_graha_drishti(
+            {name: row[col] for col, name in enumerate(batch.planets)}, {"Moon": moon_idx}
+        )
+        scored.append(score_cosmic_battery(transits, drishti))
 
-    for t in transits:
-        retro = " [RETROGRADE]" if t.is_retrograde else ""
-        combust = " [COMBUST]" if t.is_combust else ""
-        line = f"  {t.planet}: {t.sign}{retro}{combust}"
-        line += f" — {t.house_from_moon}th house from Moon"
-        if t.aspect_info != "No major aspects":
-            line += f" | Aspects: {t.aspect_info}"
-        lines.append(line)
-
-    # Add battery info
-    battery = calculate_cosmic_battery(user_sign, user_dob)
-    lines.append("")
-    lines.append(f"COSMIC BATTERY: {battery.percentage}% ({battery.level})")
-    for f in battery.factors:
-        lines.append(f"  • {f}")
+    step = timedelta(hours=step_hours)
+    return [(start + i * step, scored[k]) for i, k in enumerate(inverse.ravel().tolist())]
 
-    return "\n".join(lines)
+
+def get_current_transits(user_sign: str, user_dob: date) -> List[TransitInfo]:
+    """Get current planetary transits relative to user's Moon sign."""
+    return get_sky_snapshot().transits_for_moon_sign(get_natal_chart(user_dob).moon_sign)
+
+
+def calculate_cosmic_battery(user_sign: str, user_dob: date) -> CosmicBattery:
+    """
+    Calculate the Cosmic Battery percentage based on current transits.
+    """
+    return get_sky_snapshot().battery_for_moon_sign(get_natal_chart(user_dob).moon_sign)
+
+
+def format_planetary_context(user_sign: str, user_dob: date) -> str:
+    """
+    Generate a human-readable planetary context string to inject into AI prompts.
+    """
+    return get_user_sky_context(user_sign, user_dob).planetary_context
 
 
 def get_sign_from_dob(dob: date) -> str:
@@ -0,0 +1,35 @@
+# backfill_natal.py — Persist natal Moon/nakshatra/dasha for users without stored fields
+# Covers users created before the columns existed, on a host without an accurate ephemeris,
+# or before natal_source was recorded (those may hold mean-motion values and are recomputed).
+# Needs the ephemeris table or pyswisseph. Run: python backfill_natal.py
+
+import sys
+from datetime import date
+
+from config import settings
+from astro_engine import get_natal_chart, natal_columns
+from storage import init_db, users_missing_natal, set_natal_fields
+
+
+def backfill(batch_size: int = 500) -> int:
+    """Returns rows updated; users whose birth date no accurate source covers are skipped."""
+    updated, after_id = 0, ""
+    while True:
+        rows = users_missing_natal(batch_size, after_id)
+        if not rows:
+            return updated
+        for row in rows:
+            natal = natal_columns(get_natal_chart(date.fromisoformat(str(row["dob"]))))
+            if natal is not None:
+                set_natal_fields(row["id"], natal)
+                updated += 1
+        after_id = rows[-1]["id"]
+
+
+if __name__ == "__main__":
+    init_db(settings.DB_PATH)
+    count = backfill()
+    print(f"✦ Backfilled natal data for {count} users")
+    if count == 0 and users_missing_natal(1):
+        print("✦ No accurate ephemeris here (build the table or install pyswisseph)")
+        sys.exit(1)
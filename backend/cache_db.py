@@ -0,0 +1,190 @@
+# cache_db.py — Local SQLite cache for reusable model outputs
+# Kept apart from the user database (which may be Supabase): entries are per host,
+# disposable, and rebuilt by the warm-up jobs if the file is deleted.
+
+import json
+import sqlite3
+from datetime import datetime, date
+from pathlib import Path
+from typing import Optional, List, Dict, Any, Tuple
+
+_CACHE_PATH: Optional[Path] = None
+
+
+def init_cache_db(db_path: str) -> None:
+    global _CACHE_PATH
+    _CACHE_PATH = Path(db_path)
+    _CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+
+    with _connect() as conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS match_cache (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_sign TEXT NOT NULL,
+                crush_sign TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_match_pair ON match_cache(user_sign, crush_sign, created_at)")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS roast_pool (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                sign TEXT NOT NULL,
+                day TEXT NOT NULL,
+                roast TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_roast_sign_day ON roast_pool(sign, day)")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS receipts_cache (
+                key TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                day TEXT NOT NULL,
+                context_key TEXT NOT NULL,
+                phash TEXT,
+                payload TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                last_used_at TEXT NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_receipts_user_day ON receipts_cache(user_id, day, context_key)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_receipts_last_used ON receipts_cache(last_used_at)")
+        conn.commit()
+
+
+def _connect() -> sqlite3.Connection:
+    if _CACHE_PATH is None:
+        raise RuntimeError("Cache database not initialized")
+    conn = sqlite3.connect(_CACHE_PATH, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+# ═══════════════════════════════════════════════════════════════
+# MATCH CACHE
+# ═══════════════════════════════════════════════════════════════
+
+def get_match_variants(user_sign: str, crush_sign: str, fresh_after: datetime) -> List[Tuple[datetime, Dict[str, Any]]]:
+    """(created_at, payload) for every variant of the pair created after fresh_after."""
+    with _connect() as conn:
+        rows = conn.execute(
+            "SELECT payload, created_at FROM match_cache "
+            "WHERE user_sign = ? AND crush_sign = ? AND created_at >= ? ORDER BY created_at",
+            (user_sign, crush_sign, fresh_after.isoformat()),
+        ).fetchall()
+    return [(datetime.fromisoformat(row["created_at"]), json.loads(row["payload"])) for row in rows]
+
+
+def add_match_variant(user_sign: str, crush_sign: str, payload: Dict[str, Any], created_at: datetime) -> None:
+    with _connect() as conn:
+        conn.execute(
+            "INSERT INTO match_cache (user_sign, crush_sign, payload, created_at) VALUES (?, ?, ?, ?)",
+            (user_sign, crush_sign, json.dumps(payload, ensure_ascii=False), created_at.isoformat()),
+        )
+        conn.commit()
+
+
+def prune_match_variants(older_than: datetime) -> int:
+    with _connect() as conn:
+        cur = conn.execute("DELETE FROM match_cache WHERE created_at < ?", (older_than.isoformat(),))
+        conn.commit()
+        return cur.rowcount
+
+
+# ═══════════════════════════════════════════════════════════════
+# ROAST POOL
+# ═══════════════════════════════════════════════════════════════
+
+def get_roasts(sign: str, day: date) -> List[str]:
+    with _connect() as conn:
+        rows = conn.execute(
+            "SELECT roast FROM roast_pool WHERE sign = ? AND day = ?",
+            (sign, day.isoformat()),
+        ).fetchall()
+    return [row["roast"] for row in rows]
+
+
+def add_roast(sign: str, day: date, roast: str) -> None:
+    with _connect() as conn:
+        conn.execute(
+            "INSERT INTO roast_pool (sign, day, roast, created_at) VALUES (?, ?, ?, ?)",
+            (sign, day.isoformat(), roast, datetime.utcnow().isoformat()),
+        )
+        conn.commit()
+
+
+def prune_roasts(before: date) -> int:
+    with _connect() as conn:
+        cur = conn.execute("DELETE FROM roast_pool WHERE day < ?", (before.isoformat(),))
+        conn.commit()
+        return cur.rowcount
+
+
+# ═══════════════════════════════════════════════════════════════
+# RECEIPTS CACHE
+# ═══════════════════════════════════════════════════════════════
+
+def get_receipt(key: str) -> Optional[Dict[str, Any]]:
+    """Cached analysis for key (touching its last-used time), or None."""
+    with _connect() as conn:
+        row = conn.execute("SELECT payload FROM receipts_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        conn.execute(
+            "UPDATE receipts_cache SET last_used_at = ? WHERE key = ?",
+            (datetime.utcnow().isoformat(), key),
+        )
+        conn.commit()
+    return json.loads(row["payload"])
+
+
+def get_receipt_candidates(user_id: str, day: date, context_key: str) -> List[Tuple[str, str]]:
+    """(key, phash) of the user's entries for the day and context that have a perceptual hash."""
+    with _connect() as conn:
+        rows = conn.execute(
+            "SELECT key, phash FROM receipts_cache "
+            "WHERE user_id = ? AND day = ? AND context_key = ? AND phash IS NOT NULL",
+            (user_id, day.isoformat(), context_key),
+        ).fetchall()
+    return [(row["key"], row["phash"]) for row in rows]
+
+
+def add_receipt(
+    key: str,
+    user_id: str,
+    day: date,
+    context_key: str,
+    phash: Optional[str],
+    payload: Dict[str, Any],
+) -> None:
+    now = datetime.utcnow().isoformat()
+    with _connect() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO receipts_cache "
+            "(key, user_id, day, context_key, phash, payload, created_at, last_used_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, user_id, day.isoformat(), context_key, phash, json.dumps(payload, ensure_ascii=False), now, now),
+        )
+        conn.commit()
+
+
+def evict_receipts(max_entries: int, before: date) -> int:
+    """Drop entries from before `before`, then the least recently used beyond max_entries."""
+    with _connect() as conn:
+        removed = conn.execute("DELETE FROM receipts_cache WHERE day < ?", (before.isoformat(),)).rowcount
+        removed += conn.execute(
+            "DELETE FROM receipts_cache WHERE key IN ("
+            "SELECT key FROM receipts_cache ORDER BY last_used_at DESC LIMIT -1 OFFSET ?)",
+            (max_entries,),
+        ).rowcount
+        conn.commit()
+        return removed
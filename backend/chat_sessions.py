@@ -0,0 +1,90 @@
+# chat_sessions.py — Server-side chat history with token-budgeted compaction
+# Each session stores its messages plus a running summary. A turn sends the summary and
+# the newest messages that fit the model's history budget; once the unsummarized messages
+# outgrow the budget, the oldest are folded into the summary in the background.
+
+import asyncio
+from dataclasses import dataclass
+from typing import Dict, List, Set
+
+from limiter import Priority, set_priority
+from usage import start_meter
+from gemini_client import estimate_tokens, history_token_budget, summarize_conversation
+from storage import add_chat_messages, get_chat_messages, get_chat_session, update_chat_summary
+
+# Sessions being compacted in this process, and their tasks (kept so they aren't GC'd)
+_compacting: Set[str] = set()
+_tasks: Set[asyncio.Task] = set()
+
+
+@dataclass
+class SessionHistory:
+    summary: str
+    messages: List[Dict]  # Unsummarized messages, oldest first: {id, role, content, tokens}
+
+    @property
+    def tokens(self) -> int:
+        return sum(m["tokens"] for m in self.messages)
+
+
+def load_history(session: Dict) -> SessionHistory:
+    return SessionHistory(
+        summary=session.get("summary") or "",
+        messages=get_chat_messages(session["id"], int(session.get("summarized_through") or 0)),
+    )
+
+
+def record_exchange(session_id: str, message: str, reply: str) -> None:
+    add_chat_messages(session_id, [
+        {"role": "user", "content": message, "tokens": estimate_tokens(message)},
+        {"role": "model", "content": reply, "tokens": estimate_tokens(reply)},
+    ])
+
+
+async def compact_session(session_id: str, model: str) -> bool:
+    """
+    Fold the oldest messages into the summary until the rest fit in half the model's
+    history budget. Returns True if the summary was updated.
+    """
+    if session_id in _compacting:
+        return False
+    _compacting.add(session_id)
+    try:
+        session = get_chat_session(session_id)
+        if not session:
+            return False
+        history = load_history(session)
+        budget = history_token_budget(model)
+        if history.tokens <= budget:
+            return False
+
+        keep, kept_tokens = 0, 0
+        for m in reversed(history.messages):
+            if kept_tokens + m["tokens"] > budget // 2:
+                break
+            kept_tokens += m["tokens"]
+            keep += 1
+        fold = history.messages[:len(history.messages) - keep]
+
+        summary = await summarize_conversation(history.summary, fold)
+        if not summary:
+            return False
+        update_chat_summary(session_id, summary, fold[-1]["id"])
+        return True
+    finally:
+        _compacting.discard(session_id)
+
+
+def schedule_compaction(session_id: str, model: str) -> None:
+    """Run compact_session after the response has been sent; failures only log."""
+    async def run():
+        set_priority(Priority.LOW)
+        start_meter(None, "chat_summary")
+        try:
+            await compact_session(session_id, model)
+        except Exception as e:
+            print(f"✦ Chat compaction failed for {session_id}: {e}")
+
+    task = asyncio.get_running_loop().create_task(run())
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
@@ -23,6 +23,13 @@ def _get_int(name: str, default: int) -> int:
         return default
 
 
+def _get_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
 class Settings:
     """Application settings loaded from environment variables."""
 
@@ -35,11 +42,53 @@ class Settings:
     GEMINI_MODEL_PRO: str = os.getenv("GEMINI_MODEL_PRO", "gemini-1.5-pro")
     GEMINI_API_BASE: str = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1beta")
 
+    # Outbound HTTP pool (shared by all Gemini calls)
+    HTTP_MAX_CONNECTIONS: int = _get_int("HTTP_MAX_CONNECTIONS", 100)
+    HTTP_MAX_KEEPALIVE: int = _get_int("HTTP_MAX_KEEPALIVE", 20)
+    HTTP_KEEPALIVE_EXPIRY: float = _get_float("HTTP_KEEPALIVE_EXPIRY", 60.0)
+    GEMINI_CONNECT_TIMEOUT: float = _get_float("GEMINI_CONNECT_TIMEOUT", 5.0)
+    GEMINI_FLASH_READ_TIMEOUT: float = _get_float("GEMINI_FLASH_READ_TIMEOUT", 30.0)
+    GEMINI_PRO_READ_TIMEOUT: float = _get_float("GEMINI_PRO_READ_TIMEOUT", 90.0)
+
+    # Resilience: retries with jittered backoff, optional hedging, per-model circuit breaker
+    GEMINI_MAX_RETRIES: int = _get_int("GEMINI_MAX_RETRIES", 2)
+    GEMINI_RETRY_BASE_DELAY: float = _get_float("GEMINI_RETRY_BASE_DELAY", 0.5)
+    GEMINI_RETRY_MAX_DELAY: float = _get_float("GEMINI_RETRY_MAX_DELAY", 8.0)
+    GEMINI_HEDGE_ENABLED: bool = os.getenv("GEMINI_HEDGE_ENABLED", "false").strip().lower() in ("1", "true", "yes")
+    GEMINI_HEDGE_MIN_DELAY: float = _get_float("GEMINI_HEDGE_MIN_DELAY", 1.0)
+    GEMINI_BREAKER_FAILURES: int = _get_int("GEMINI_BREAKER_FAILURES", 5)
+    GEMINI_BREAKER_RESET_SECONDS: float = _get_float("GEMINI_BREAKER_RESET_SECONDS", 30.0)
+    GEMINI_PRO_FALLBACK: bool = os.getenv("GEMINI_PRO_FALLBACK", "true").strip().lower() in ("1", "true", "yes")
+
+    # Adaptive (AIMD) limit on concurrent upstream Gemini requests, with a priority queue
+    GEMINI_CONCURRENCY_INITIAL: int = _get_int("GEMINI_CONCURRENCY_INITIAL", 32)
+    GEMINI_CONCURRENCY_MIN: int = _get_int("GEMINI_CONCURRENCY_MIN", 4)
+    GEMINI_CONCURRENCY_MAX: int = _get_int("GEMINI_CONCURRENCY_MAX", 128)
+    GEMINI_LIMITER_BACKOFF: float = _get_float("GEMINI_LIMITER_BACKOFF", 0.7)
+    # A call counts as overload when slower than this × its model's median latency (0 = off)
+    GEMINI_LIMITER_LATENCY_FACTOR: float = _get_float("GEMINI_LIMITER_LATENCY_FACTOR", 3.0)
+
+    # Model router: free-tier Guru chat / remedies / receipts may move from Pro to Flash
+    MODEL_ROUTER_ENABLED: bool = os.getenv("MODEL_ROUTER_ENABLED", "true").strip().lower() in ("1", "true", "yes")
+    ROUTER_PRO_SLOW_P95_SECONDS: float = _get_float("ROUTER_PRO_SLOW_P95_SECONDS", 8.0)
+    ROUTER_PRO_MAX_ERROR_RATE: float = _get_float("ROUTER_PRO_MAX_ERROR_RATE", 0.2)
+    ROUTER_SHORT_MESSAGE_CHARS: int = _get_int("ROUTER_SHORT_MESSAGE_CHARS", 160)
+    ROUTER_PRO_DAILY_TOKENS: int = _get_int("ROUTER_PRO_DAILY_TOKENS", 0)  # Per process; 0 = unlimited
+    ROUTER_PRO_PROBE_RATE: float = _get_float("ROUTER_PRO_PROBE_RATE", 0.05)
+
+    # Context caching of static persona prompts: "gemini", "local" (in-process stand-in) or "off"
+    GEMINI_CONTEXT_CACHE: str = os.getenv("GEMINI_CONTEXT_CACHE", "gemini").strip().lower()
+    GEMINI_CONTEXT_CACHE_TTL_SECONDS: int = _get_int("GEMINI_CONTEXT_CACHE_TTL_SECONDS", 3600)
+    # Smaller instructions are sent inline (Gemini 1.5's cachedContents minimum is 32,768 tokens)
+    GEMINI_CONTEXT_CACHE_MIN_TOKENS: int = _get_int("GEMINI_CONTEXT_CACHE_MIN_TOKENS", 32768)
+
     # Database (Supabase PostgreSQL or local SQLite)
     DATABASE_URL: str = os.getenv("DATABASE_URL", "")
     SUPABASE_URL: str = os.getenv("SUPABASE_URL", "")
     SUPABASE_KEY: str = os.getenv("SUPABASE_KEY", "")
     DB_PATH: str = os.getenv("AURA_DB_PATH", str(Path(__file__).resolve().parent / "aura.db"))
+    # Local per-host cache of reusable model outputs (always SQLite)
+    CACHE_DB_PATH: str = os.getenv("AURA_CACHE_DB_PATH", str(Path(__file__).resolve().parent / "cache.db"))
 
     # Razorpay
     RAZORPAY_KEY_ID: str = os.getenv("RAZORPAY_KEY_ID", "")
@@ -53,5 +102,47 @@ class Settings:
     # Rate limiting
     RATE_LIMIT_PER_MINUTE: int = _get_int("RATE_LIMIT_PER_MINUTE", 20)
 
+    # Receipts screenshots: uploads are downscaled to SCREENSHOT_MAX_SIDE px and re-encoded as JPEG
+    SCREENSHOT_MAX_BYTES: int = _get_int("SCREENSHOT_MAX_BYTES", 10 * 1024 * 1024)
+    SCREENSHOT_MAX_PIXELS: int = _get_int("SCREENSHOT_MAX_PIXELS", 40_000_000)
+    SCREENSHOT_MAX_SIDE: int = _get_int("SCREENSHOT_MAX_SIDE", 1536)
+    SCREENSHOT_JPEG_QUALITY: int = _get_int("SCREENSHOT_JPEG_QUALITY", 85)
+    SCREENSHOT_WORKERS: int = _get_int("SCREENSHOT_WORKERS", 2)
+    # Receipts cache: analyses kept per (user, screenshot, context, day); 0 disables.
+    # PHASH_DISTANCE > 0 also matches near-duplicate screenshots (bits of a 256-bit dHash)
+    RECEIPTS_CACHE_MAX_ENTRIES: int = _get_int("RECEIPTS_CACHE_MAX_ENTRIES", 5000)
+    RECEIPTS_CACHE_PHASH_DISTANCE: int = _get_int("RECEIPTS_CACHE_PHASH_DISTANCE", 0)
+
+    # Chat sessions: prior-conversation tokens sent per turn; older turns are summarized
+    CHAT_HISTORY_TOKENS_FLASH: int = _get_int("CHAT_HISTORY_TOKENS_FLASH", 2000)
+    CHAT_HISTORY_TOKENS_PRO: int = _get_int("CHAT_HISTORY_TOKENS_PRO", 6000)
+    CHAT_SUMMARY_MAX_WORDS: int = _get_int("CHAT_SUMMARY_MAX_WORDS", 200)
+    # Calls without session_id continue the user's session if it was active this recently;
+    # sessions idle longer than RETENTION_DAYS are deleted (0 = keep forever)
+    CHAT_SESSION_IDLE_HOURS: float = _get_float("CHAT_SESSION_IDLE_HOURS", 12.0)
+    CHAT_SESSION_RETENTION_DAYS: int = _get_int("CHAT_SESSION_RETENTION_DAYS", 30)
+
+    # Match cache (144 sign pairs)
+    MATCH_CACHE_VARIANTS: int = _get_int("MATCH_CACHE_VARIANTS", 3)
+    MATCH_CACHE_TTL_HOURS: int = _get_int("MATCH_CACHE_TTL_HOURS", 168)
+
+    # Roast pool: general roasts pre-generated per sign per UTC day (0 = always live)
+    ROAST_POOL_SIZE: int = _get_int("ROAST_POOL_SIZE", 10)
+
+    # Token usage accounting: buffered counters are written every USAGE_FLUSH_SECONDS
+    USAGE_FLUSH_SECONDS: float = _get_float("USAGE_FLUSH_SECONDS", 15.0)
+    # X-Admin-Key for /api/admin/* (admin routes are disabled while empty)
+    ADMIN_API_KEY: str = os.getenv("ADMIN_API_KEY", "")
+
+    # Astro engine
+    SKY_SNAPSHOT_BUCKET_SECONDS: int = _get_int("SKY_SNAPSHOT_BUCKET_SECONDS", 300)
+    # Empty (as in .env.example) means the default location, not "no table"
+    EPHEMERIS_TABLE_PATH: str = os.getenv("EPHEMERIS_TABLE_PATH") or str(
+        Path(__file__).resolve().parent / "data" / "ephemeris.bin"
+    )
+    EVENT_CALENDAR_PATH: str = os.getenv("EVENT_CALENDAR_PATH") or str(
+        Path(__file__).resolve().parent / "data" / "events.json"
+    )
+
 
 settings = Settings()
@@ -0,0 +1,124 @@
+# context_cache.py — Gemini context caching for static system instructions
+# A persona prompt is registered once per model via the cachedContents API and later
+# requests reference it by name instead of re-sending it. GEMINI_CONTEXT_CACHE selects:
+#   gemini — real cachedContents (falls back to inline systemInstruction on any failure)
+#   local  — in-process stand-in that tracks hits/misses but always sends it inline (dev/tests)
+#   off    — always inline systemInstruction
+# Instructions under GEMINI_CONTEXT_CACHE_MIN_TOKENS are always sent inline: Gemini rejects
+# caches below the model's minimum size, so trying would only add a failing round trip.
+
+import asyncio
+import hashlib
+import time
+from dataclasses import dataclass
+from typing import Dict, Set, Tuple
+
+from config import settings
+from http_pool import get_client
+
+# Refresh a cache this long before it expires upstream
+_REFRESH_MARGIN_SECONDS = 120
+# After a failed create (e.g. prompt below the model's minimum cacheable size) or a
+# rejected cache name, send the instruction inline for this long before trying again
+_RETRY_AFTER_SECONDS = 600
+
+
+@dataclass
+class CachedInstruction:
+    name: str          # "cachedContents/..." (or "local/..." for the stand-in)
+    expires_at: float  # time.monotonic() deadline
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    failures: int = 0
+
+
+stats = CacheStats()
+
+_entries: Dict[Tuple[str, str], CachedInstruction] = {}
+_unsupported_until: Dict[Tuple[str, str], float] = {}
+_locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+_too_small: Set[Tuple[str, str]] = set()  # Already logged as below the minimum size
+
+
+def inline_instruction(text: str) -> Dict:
+    return {"systemInstruction": {"parts": [{"text": text}]}}
+
+
+def _key(model: str, text: str) -> Tuple[str, str]:
+    return model, hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+async def _create(model: str, text: str, digest: str) -> CachedInstruction:
+    ttl = max(60, settings.GEMINI_CONTEXT_CACHE_TTL_SECONDS)
+    if settings.GEMINI_CONTEXT_CACHE == "local":
+        return CachedInstruction(name=f"local/{digest[:16]}", expires_at=time.monotonic() + ttl)
+
+    url = f"{settings.GEMINI_API_BASE}/cachedContents?key={settings.GEMINI_API_KEY}"
+    payload = {
+        "model": f"models/{model}",
+        "displayName": f"aura-{digest[:12]}",
+        "ttl": f"{ttl}s",
+        **inline_instruction(text),
+    }
+    resp = await get_client("gemini").post(url, json=payload)
+    if resp.status_code >= 400:
+        raise RuntimeError(f"Gemini cachedContents error {resp.status_code}: {resp.text}")
+    return CachedInstruction(name=resp.json()["name"], expires_at=time.monotonic() + ttl)
+
+
+async def instruction_fields(model: str, text: str) -> Dict:
+    """
+    Request fields carrying a static system instruction: {"cachedContent": name} when
+    a cache is available, otherwise the inline {"systemInstruction": ...}.
+    """
+    mode = settings.GEMINI_CONTEXT_CACHE
+    if mode not in ("gemini", "local"):
+        return inline_instruction(text)
+
+    key = _key(model, text)
+    tokens = len(text) // 4  # Same ~4 characters per token estimate as gemini_client
+    if tokens < settings.GEMINI_CONTEXT_CACHE_MIN_TOKENS:
+        if key not in _too_small:
+            _too_small.add(key)
+            print(
+                f"✦ Context cache skipped for {model}: instruction is ~{tokens} tokens, "
+                f"under GEMINI_CONTEXT_CACHE_MIN_TOKENS={settings.GEMINI_CONTEXT_CACHE_MIN_TOKENS}"
+            )
+        return inline_instruction(text)
+
+    now = time.monotonic()
+    if _unsupported_until.get(key, 0) > now:
+        return inline_instruction(text)
+
+    entry = _entries.get(key)
+    if entry is None or entry.expires_at - _REFRESH_MARGIN_SECONDS <= now:
+        lock = _locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            entry = _entries.get(key)
+            if entry is None or entry.expires_at - _REFRESH_MARGIN_SECONDS <= time.monotonic():
+                stats.misses += 1
+                try:
+                    entry = await _create(model, text, key[1])
+                except Exception as e:
+                    stats.failures += 1
+                    _unsupported_until[key] = time.monotonic() + _RETRY_AFTER_SECONDS
+                    print(f"✦ Context cache disabled for {model}: {e}")
+                    return inline_instruction(text)
+                _entries[key] = entry
+    else:
+        stats.hits += 1
+
+    if mode == "local":
+        return inline_instruction(text)
+    return {"cachedContent": entry.name}
+
+
+def invalidate(model: str, text: str) -> None:
+    """Forget the cache for (model, text) after the API rejected its name, and back off."""
+    key = _key(model, text)
+    _entries.pop(key, None)
+    _unsupported_until[key] = time.monotonic() + _RETRY_AFTER_SECONDS
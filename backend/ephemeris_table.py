@@ -0,0 +1,176 @@
+# ephemeris_table.py — Precomputed, memory-mapped sidereal ephemeris
+# Build once (needs pyswisseph):  python ephemeris_table.py --start 1900 --end 2100
+# At runtime the table is memory-mapped read-only, so all workers share the same pages,
+# and positions are cubic-Hermite interpolated from stored longitudes and speeds.
+
+import argparse
+import struct
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import settings
+
+# Ketu is always derived from Rahu, so it is not stored.
+TABLE_PLANETS = ["Sun", "Moon", "Mars", "Mercury", "Jupiter", "Venus", "Saturn", "Rahu"]
+
+_MAGIC = b"AURAEPH1"
+# magic, first JD, step (days), sample count, planet count
+_HEADER = struct.Struct("<8sddqi")
+_HEADER_SIZE = 64
+
+
+class EphemerisTable:
+    """Read-only view over a table of shape (count, planets, 2) = (longitude, speed)."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as fh:
+            magic, jd0, step, count, nplanets = _HEADER.unpack(fh.read(_HEADER.size))
+        if magic != _MAGIC or nplanets != len(TABLE_PLANETS):
+            raise ValueError(f"Not an Aura ephemeris table: {path}")
+
+        self.path = path
+        self.jd0 = jd0
+        self.step = step
+        self.count = count
+        self.jd_end = jd0 + step * (count - 1)
+        self.data = np.memmap(path, dtype="<f4", mode="r", offset=_HEADER_SIZE,
+                              shape=(count, nplanets, 2))
+        self._columns = {name: i for i, name in enumerate(TABLE_PLANETS)}
+
+    def covers(self, jd_min: float, jd_max: Optional[float] = None) -> bool:
+        jd_max = jd_min if jd_max is None else jd_max
+        return self.jd0 <= jd_min and jd_max < self.jd_end
+
+    def lookup(self, planet: str, jd: float) -> Tuple[float, float]:
+        """Interpolated (sidereal longitude, speed in deg/day) for one instant."""
+        col = self._columns[planet]
+        pos = (jd - self.jd0) / self.step
+        idx = min(max(int(pos), 0), self.count - 2)
+        u = pos - idx
+
+        (l0, v0), (l1, v1) = self.data[idx, col].tolist(), self.data[idx + 1, col].tolist()
+        dl = (l1 - l0 + 180.0) % 360.0 - 180.0
+        m0 = v0 * self.step
+        m1 = v1 * self.step
+
+        u2 = u * u
+        u3 = u2 * u
+        lon = l0 + (u3 - 2 * u2 + u) * m0 + (-2 * u3 + 3 * u2) * dl + (u3 - u2) * m1
+        return lon % 360.0, v0 + (v1 - v0) * u
+
+    def lookup_batch(self, planet: str, jds: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Interpolated longitudes and speeds for an array of Julian Days."""
+        col = self._columns[planet]
+        pos = (np.asarray(jds, dtype=np.float64) - self.jd0) / self.step
+        idx = np.clip(np.floor(pos).astype(np.int64), 0, self.count - 2)
+        u = pos - idx
+
+        l0 = self.data[idx, col, 0].astype(np.float64)
+        l1 = self.data[idx + 1, col, 0].astype(np.float64)
+        v0 = self.data[idx, col, 1].astype(np.float64)
+        v1 = self.data[idx + 1, col, 1].astype(np.float64)
+
+        # Unwrap across 0°/360° before interpolating
+        dl = (l1 - l0 + 180.0) % 360.0 - 180.0
+        m0 = v0 * self.step
+        m1 = v1 * self.step
+
+        u2 = u * u
+        u3 = u2 * u
+        lon = l0 + (u3 - 2 * u2 + u) * m0 + (-2 * u3 + 3 * u2) * dl + (u3 - u2) * m1
+        speed = v0 + (v1 - v0) * u
+        return lon % 360.0, speed
+
+
+_table: Optional[EphemerisTable] = None
+_table_loaded = False
+_table_detail = "not loaded"  # Why the table is (in)active, for startup logs and /health
+_table_lock = threading.Lock()
+
+
+def get_table() -> Optional[EphemerisTable]:
+    """Return the process-wide table, or None if no table file is available (see table_status)."""
+    global _table, _table_loaded, _table_detail
+    if _table_loaded:
+        return _table
+    with _table_lock:
+        if not _table_loaded:
+            path = settings.EPHEMERIS_TABLE_PATH
+            if not Path(path).exists():
+                _table_detail = f"missing: {path} (build it with python ephemeris_table.py)"
+            else:
+                try:
+                    _table = EphemerisTable(path)
+                    _table_detail = "active"
+                except (OSError, ValueError, struct.error) as e:
+                    _table_detail = f"unreadable: {e}"
+            _table_loaded = True
+    return _table
+
+
+def _jd_to_date(jd: float) -> str:
+    return (datetime(2000, 1, 1, 12) + timedelta(days=jd - 2451545.0)).date().isoformat()
+
+
+def table_status() -> Dict[str, Any]:
+    """Whether the table is in use, and if not, why. Loads it on first call."""
+    table = get_table()
+    status: Dict[str, Any] = {"active": table is not None, "detail": _table_detail}
+    if table is not None:
+        status["path"] = table.path
+        status["covers"] = [_jd_to_date(table.jd0), _jd_to_date(table.jd_end)]
+    return status
+
+
+def build_table(path: str, start_year: int, end_year: int, step_hours: float) -> int:
+    """Generate the table with Swiss Ephemeris. Returns the number of samples."""
+    from astro_engine import SWE_AVAILABLE, datetime_to_jd, get_sidereal_positions_batch
+
+    if not SWE_AVAILABLE:
+        raise RuntimeError("Building the ephemeris table requires pyswisseph")
+
+    step = step_hours / 24.0
+    jd0 = datetime_to_jd(datetime(start_year, 1, 1))
+    jd1 = datetime_to_jd(datetime(end_year + 1, 1, 1))
+    count = int((jd1 - jd0) / step) + 2
+
+    out = Path(path)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_suffix(out.suffix + ".tmp")
+    with open(tmp, "wb") as fh:
+        fh.write(_HEADER.pack(_MAGIC, jd0, step, count, len(TABLE_PLANETS)).ljust(_HEADER_SIZE, b"\0"))
+
+    data = np.memmap(tmp, dtype="<f4", mode="r+", offset=_HEADER_SIZE,
+                     shape=(count, len(TABLE_PLANETS), 2))
+    chunk = 50_000
+    for start in range(0, count, chunk):
+        jds = jd0 + np.arange(start, min(start + chunk, count)) * step
+        batch = get_sidereal_positions_batch(jds, TABLE_PLANETS, use_table=False)
+        data[start:start + len(jds), :, 0] = batch.longitude
+        data[start:start + len(jds), :, 1] = batch.speed
+    data.flush()
+    del data
+
+    tmp.replace(out)
+    return count
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Build the Aura precomputed ephemeris table.")
+    parser.add_argument("--out", default=settings.EPHEMERIS_TABLE_PATH)
+    parser.add_argument("--start", type=int, default=1900)
+    parser.add_argument("--end", type=int, default=2100)
+    parser.add_argument("--step-hours", type=float, default=6.0)
+    args = parser.parse_args(argv)
+
+    count = build_table(args.out, args.start, args.end, args.step_hours)
+    size_mb = Path(args.out).stat().st_size / 1e6
+    print(f"✦ Wrote {count} samples ({size_mb:.1f} MB) to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+# events.py — Ingress and station event finder
+# Samples the batch ephemeris on a coarse grid to bracket events, then bisects with
+# get_sidereal_position to the minute. Events over a long range can be precomputed
+# into an on-disk calendar:  python events.py --start 2024 --end 2035
+
+import argparse
+import bisect
+import json
+import threading
+from dataclasses import dataclass, asdict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from config import settings
+from astro_engine import (
+    PLANETS,
+    SIGNS,
+    NAKSHATRAS,
+    datetime_to_jd,
+    get_sidereal_position,
+    get_sidereal_positions_batch,
+)
+
+EVENT_KINDS = ["ingress", "nakshatra", "retrograde", "direct"]
+
+# Grid step (days) per planet; must be shorter than the gap between two events
+SAMPLE_STEP_DAYS = {"Moon": 0.25}
+DEFAULT_STEP_DAYS = 1.0
+
+# Precision of bisection (days) — one minute
+EVENT_PRECISION_DAYS = 1 / 1440
+
+# Planets that never station (Sun/Moon direct, nodes always treated as retrograde)
+NO_STATIONS = ("Sun", "Moon", "Rahu", "Ketu")
+
+_NAK_SPAN = 360 / 27
+
+
+@dataclass
+class AstroEvent:
+    planet: str
+    kind: str          # "ingress", "nakshatra", "retrograde" or "direct"
+    time: datetime     # UTC, accurate to EVENT_PRECISION_DAYS
+    from_value: str    # Previous sign / nakshatra / motion
+    to_value: str      # New sign / nakshatra / motion
+
+
+def _jd_to_datetime(jd: float) -> datetime:
+    dt = datetime(2000, 1, 1, 12) + timedelta(days=jd - 2451545.0)
+    return dt.replace(microsecond=0)
+
+
+def _longitude(planet: str, jd: float) -> float:
+    if planet == "Ketu":
+        rahu, _ = get_sidereal_position("Rahu", jd)
+        return (rahu + 180) % 360
+    longitude, _ = get_sidereal_position(planet, jd)
+    return longitude
+
+
+def _bisect_state(jd0: float, jd1: float, state: Callable[[float], object]) -> float:
+    """Narrow [jd0, jd1] to the instant where state() stops equalling state(jd0)."""
+    before = state(jd0)
+    while jd1 - jd0 > EVENT_PRECISION_DAYS:
+        mid = (jd0 + jd1) / 2
+        if state(mid) == before:
+            jd0 = mid
+        else:
+            jd1 = mid
+    return jd1
+
+
+def _planet_events(planet: str, jd_start: float, jd_end: float, kinds: List[str]) -> List[AstroEvent]:
+    step = SAMPLE_STEP_DAYS.get(planet, DEFAULT_STEP_DAYS)
+    grid = np.append(np.arange(jd_start, jd_end, step), jd_end)
+    batch = get_sidereal_positions_batch(grid, [planet])
+    lon = batch.longitude[:, 0]
+    retro = batch.retrograde[:, 0]
+
+    events: List[AstroEvent] = []
+
+    def scan(values: np.ndarray, kind: str, state: Callable[[float], object], label: Callable[[object], str]):
+        for i in np.nonzero(values[1:] != values[:-1])[0]:
+            jd = _bisect_state(grid[i], grid[i + 1], state)
+            events.append(AstroEvent(
+                planet=planet, kind=kind, time=_jd_to_datetime(jd),
+                from_value=label(values[i]), to_value=label(values[i + 1]),
+            ))
+
+    if "ingress" in kinds:
+        scan((lon // 30).astype(int) % 12, "ingress",
+             lambda jd: int(_longitude(planet, jd) // 30) % 12, lambda v: SIGNS[v])
+    if "nakshatra" in kinds:
+        scan((lon // _NAK_SPAN).astype(int) % 27, "nakshatra",
+             lambda jd: int(_longitude(planet, jd) // _NAK_SPAN) % 27, lambda v: NAKSHATRAS[v][0])
+    if planet not in NO_STATIONS and ("retrograde" in kinds or "direct" in kinds):
+        motion = lambda v: "retrograde" if v else "direct"
+        for i in np.nonzero(retro[1:] != retro[:-1])[0]:
+            kind = motion(retro[i + 1])
+            if kind not in kinds:
+                continue
+            jd = _bisect_state(grid[i], grid[i + 1], lambda t: bool(get_sidereal_position(planet, t)[1]))
+            events.append(AstroEvent(
+                planet=planet, kind=kind, time=_jd_to_datetime(jd),
+                from_value=motion(retro[i]), to_value=kind,
+            ))
+
+    return events
+
+
+def find_events(
+    start: datetime,
+    end: datetime,
+    planets: Optional[List[str]] = None,
+    kinds: Optional[List[str]] = None,
+) -> List[AstroEvent]:
+    """Find sign ingresses, nakshatra changes and stations between start and end (UTC)."""
+    planets = planets or PLANETS
+    kinds = kinds or EVENT_KINDS
+    jd_start, jd_end = datetime_to_jd(start), datetime_to_jd(end)
+    if jd_end <= jd_start:
+        return []
+
+    events: List[AstroEvent] = []
+    for planet in planets:
+        events.extend(_planet_events(planet, jd_start, jd_end, kinds))
+    events.sort(key=lambda e: e.time)
+    return events
+
+
+# ═══════════════════════════════════════════════════════════════
+# PRECOMPUTED CALENDAR
+# ═══════════════════════════════════════════════════════════════
+
+@dataclass
+class EventCalendar:
+    start: datetime
+    end: datetime
+    events: List[AstroEvent]
+    times: List[datetime]  # Sorted event times for range lookups
+
+
+_calendar: Optional[EventCalendar] = None
+_calendar_loaded = False
+_calendar_lock = threading.Lock()
+
+
+def _load_calendar(path: str) -> EventCalendar:
+    with open(path) as fh:
+        raw = json.load(fh)
+    events = [
+        AstroEvent(**{**e, "time": datetime.fromisoformat(e["time"])})
+        for e in raw["events"]
+    ]
+    return EventCalendar(
+        start=datetime.fromisoformat(raw["start"]),
+        end=datetime.fromisoformat(raw["end"]),
+        events=events,
+        times=[e.time for e in events],
+    )
+
+
+def get_calendar() -> Optional[EventCalendar]:
+    """Return the process-wide precomputed calendar, or None if none was built."""
+    global _calendar, _calendar_loaded
+    if _calendar_loaded:
+        return _calendar
+    with _calendar_lock:
+        if not _calendar_loaded:
+            path = settings.EVENT_CALENDAR_PATH
+            if path and Path(path).exists():
+                try:
+                    _calendar = _load_calendar(path)
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"✦ Event calendar ignored: {e}")
+            _calendar_loaded = True
+    return _calendar
+
+
+def get_events(
+    start: datetime,
+    end: datetime,
+    planets: Optional[List[str]] = None,
+    kinds: Optional[List[str]] = None,
+) -> List[AstroEvent]:
+    """Events in [start, end), served from the calendar when it covers the range."""
+    calendar = get_calendar()
+    if calendar is None or start < calendar.start or end > calendar.end:
+        return [e for e in find_events(start, end, planets, kinds) if start <= e.time < end]
+
+    lo = bisect.bisect_left(calendar.times, start)
+    hi = bisect.bisect_left(calendar.times, end)
+    return [
+        e for e in calendar.events[lo:hi]
+        if (not planets or e.planet in planets) and (not kinds or e.kind in kinds)
+    ]
+
+
+def build_calendar(path: str, start: datetime, end: datetime) -> int:
+    """Compute all events for the range and write them as JSON. Returns the event count."""
+    events = find_events(start, end)
+    out = Path(path)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    payload = {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "events": [{**asdict(e), "time": e.time.isoformat()} for e in events],
+    }
+    tmp = out.with_suffix(out.suffix + ".tmp")
+    tmp.write_text(json.dumps(payload))
+    tmp.replace(out)
+    return len(events)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Build the Aura precomputed event calendar.")
+    parser.add_argument("--out", default=settings.EVENT_CALENDAR_PATH)
+    parser.add_argument("--start", type=int, default=datetime.utcnow().year)
+    parser.add_argument("--end", type=int, default=datetime.utcnow().year + 10)
+    args = parser.parse_args(argv)
+
+    count = build_calendar(args.out, datetime(args.start, 1, 1), datetime(args.end + 1, 1, 1))
+    print(f"✦ Wrote {count} events to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+# fake_gemini.py — Local stand-in for the Gemini REST API (load tests, no quota)
+# Serves generateContent, streamGenerateContent (SSE) and cachedContents with configurable
+# latency and error rates. JSON-mode requests get a random object matching their
+# responseSchema, so the structured-output validation path runs as in production.
+#
+#   python fake_gemini.py --port 8090 --latency lognormal:700,0.5 --pro-latency lognormal:2500,0.6
+#   GEMINI_API_BASE=http://127.0.0.1:8090/v1beta GEMINI_API_KEY=fake uvicorn main:app
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+_WORDS = (
+    "mercury retrograde bestie vibes moon venus mars saturn energy rahu ketu transit cosmic "
+    "honestly chart karma boundaries red flag green flag tea era main character drama"
+).split()
+
+
+# ═══════════════════════════════════════════════════════════════
+# CONFIG
+# ═══════════════════════════════════════════════════════════════
+
+@dataclass
+class Latency:
+    """Latency distribution in milliseconds: fixed:X, uniform:A,B or lognormal:MEDIAN,SIGMA."""
+    kind: str = "lognormal"
+    a: float = 600.0
+    b: float = 0.5
+
+    @classmethod
+    def parse(cls, spec: str) -> "Latency":
+        kind, _, args = spec.partition(":")
+        values = [float(v) for v in args.split(",") if v.strip()]
+        if kind == "fixed" and len(values) == 1:
+            return cls(kind, values[0], 0.0)
+        if kind in ("uniform", "lognormal") and len(values) == 2:
+            return cls(kind, values[0], values[1])
+        raise ValueError(f"Bad latency spec: {spec!r}")
+
+    def sample(self) -> float:
+        """One latency in seconds."""
+        if self.kind == "fixed":
+            ms = self.a
+        elif self.kind == "uniform":
+            ms = random.uniform(self.a, self.b)
+        else:
+            ms = self.a * math.exp(random.gauss(0.0, self.b))
+        return max(0.0, ms) / 1000
+
+
+@dataclass
+class FakeConfig:
+    flash_latency: Latency = field(default_factory=lambda: Latency("lognormal", 600, 0.5))
+    pro_latency: Latency = field(default_factory=lambda: Latency("lognormal", 2000, 0.6))
+    error_rate: float = 0.0           # Fraction of calls answered with an error status
+    error_statuses: List[int] = field(default_factory=lambda: [429, 503])
+    timeout_rate: float = 0.0         # Fraction of calls that hang for 120s
+    text_words: int = 80              # Length of free-text replies
+    stream_chunks: int = 8
+
+
+config = FakeConfig()
+stats: Dict[str, int] = {"generate": 0, "stream": 0, "cache_create": 0, "errors": 0}
+_cached: Dict[str, int] = {}  # cachedContents name → instruction token estimate
+
+
+# ═══════════════════════════════════════════════════════════════
+# CANNED BODIES
+# ═══════════════════════════════════════════════════════════════
+
+def _words(n: int) -> str:
+    return " ".join(random.choice(_WORDS) for _ in range(max(1, n)))
+
+
+def _from_schema(schema: Dict[str, Any]) -> Any:
+    """Random value matching a Gemini responseSchema node."""
+    kind = str(schema.get("type", "STRING")).upper()
+    if "enum" in schema:
+        return random.choice(schema["enum"])
+    if kind == "OBJECT":
+        props = schema.get("properties", {})
+        required = set(schema.get("required", props))
+        return {name: _from_schema(prop) for name, prop in props.items() if name in required or random.random() < 0.7}
+    if kind == "ARRAY":
+        low = int(schema.get("minItems", 1))
+        high = max(low, min(int(schema.get("maxItems", 3)), 3))
+        return [_from_schema(schema.get("items", {})) for _ in range(random.randint(low, high))]
+    if kind == "INTEGER":
+        return random.randint(int(schema.get("minimum", 0)), int(schema.get("maximum", 100)))
+    if kind == "NUMBER":
+        return round(random.uniform(float(schema.get("minimum", 0)), float(schema.get("maximum", 1))), 3)
+    if kind == "BOOLEAN":
+        return random.random() < 0.5
+    return _words(random.randint(4, 16))
+
+
+def _reply_text(payload: Dict[str, Any]) -> str:
+    gen = payload.get("generationConfig") or {}
+    if gen.get("responseSchema"):
+        return json.dumps(_from_schema(gen["responseSchema"]), ensure_ascii=False)
+    return _words(config.text_words) + " ✨"
+
+
+def _usage(payload: Dict[str, Any], text: str) -> Dict[str, int]:
+    # ~4 characters per token, like the client's own estimate; inline images count 258 tokens
+    prompt = 0
+    for content in payload.get("contents", []):
+        for part in content.get("parts", []):
+            prompt += len(part.get("text", "")) // 4 + (258 if "inline_data" in part else 0)
+    cached = _cached.get(payload.get("cachedContent", ""), 0)
+    system = payload.get("systemInstruction", {}).get("parts", [{}])[0].get("text", "")
+    prompt += cached + len(system) // 4
+    candidates = max(1, len(text) // 4)
+    usage = {"promptTokenCount": prompt, "candidatesTokenCount": candidates, "totalTokenCount": prompt + candidates}
+    if cached:
+        usage["cachedContentTokenCount"] = cached
+    return usage
+
+
+def _response(text: str, usage: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+    body: Dict[str, Any] = {
+        "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP"}],
+    }
+    if usage:
+        body["usageMetadata"] = usage
+    return body
+
+
+# ═══════════════════════════════════════════════════════════════
+# APP
+# ═══════════════════════════════════════════════════════════════
+
+app = FastAPI(title="Fake Gemini")
+
+
+def _latency(model: str) -> Latency:
+    return config.pro_latency if "pro" in model else config.flash_latency
+
+
+async def _maybe_fail() -> Optional[JSONResponse]:
+    if config.timeout_rate and random.random() < config.timeout_rate:
+        await asyncio.sleep(120)
+    if config.error_rate and random.random() < config.error_rate:
+        stats["errors"] += 1
+        status = random.choice(config.error_statuses)
+        return JSONResponse({"error": {"code": status, "message": "Injected by fake_gemini"}}, status_code=status)
+    return None
+
+
+@app.post("/v1beta/models/{target}")
+async def models(target: str, request: Request):
+    model, _, action = target.partition(":")
+    payload = await request.json()
+    cache_name = payload.get("cachedContent")
+    if cache_name and cache_name not in _cached:
+        return JSONResponse({"error": {"code": 404, "message": f"{cache_name} not found"}}, status_code=404)
+
+    error = await _maybe_fail()
+    if error is not None:
+        return error
+    latency = _latency(model).sample()
+    text = _reply_text(payload)
+    usage = _usage(payload, text)
+
+    if action == "generateContent":
+        stats["generate"] += 1
+        await asyncio.sleep(latency)
+        return _response(text, usage)
+
+    if action == "streamGenerateContent":
+        stats["stream"] += 1
+
+        async def events():
+            # A third of the latency before the first chunk, the rest spread across chunks
+            await asyncio.sleep(latency / 3)
+            words = text.split(" ")
+            step = max(1, math.ceil(len(words) / max(1, config.stream_chunks)))
+            chunks = [" ".join(words[i:i + step]) + " " for i in range(0, len(words), step)]
+            for i, chunk in enumerate(chunks):
+                if i:
+                    await asyncio.sleep(2 * latency / 3 / len(chunks))
+                last = i == len(chunks) - 1
+                yield f"data: {json.dumps(_response(chunk, usage if last else None))}\r\n\r\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return JSONResponse({"error": {"code": 404, "message": f"Unknown action {action}"}}, status_code=404)
+
+
+@app.post("/v1beta/cachedContents")
+async def create_cache(request: Request):
+    payload = await request.json()
+    stats["cache_create"] += 1
+    name = f"cachedContents/{uuid.uuid4().hex[:12]}"
+    text = payload.get("systemInstruction", {}).get("parts", [{}])[0].get("text", "")
+    _cached[name] = len(text) // 4
+    return {"name": name, "model": payload.get("model"), "expireTime": time.time() + 3600}
+
+
+@app.get("/stats")
+async def get_stats():
+    return {**stats, "cached_contents": len(_cached)}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Fake Gemini API for local load tests.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", default="lognormal:600,0.5", help="Flash latency (ms)")
+    parser.add_argument("--pro-latency", default="lognormal:2000,0.6", help="Pro latency (ms)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-statuses", default="429,503")
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--text-words", type=int, default=80)
+    parser.add_argument("--stream-chunks", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    config.flash_latency = Latency.parse(args.latency)
+    config.pro_latency = Latency.parse(args.pro_latency)
+    config.error_rate = args.error_rate
+    config.error_statuses = [int(s) for s in args.error_statuses.split(",") if s.strip()]
+    config.timeout_rate = args.timeout_rate
+    config.text_words = args.text_words
+    config.stream_chunks = args.stream_chunks
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,181 +1,38 @@
 # gemini_client.py — Gemini API wrapper for Aura AI
 # Uses direct REST calls to Google Generative Language API.
 
+import asyncio
+import hashlib
 import json
-import base64
-import re
-from typing import Optional, List, Dict
+import time
+from contextlib import AsyncExitStack
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Optional, List, Dict, Tuple, Type
+
 import httpx
+from pydantic import BaseModel, ValidationError
 
 from config import settings
+from http_pool import get_client, gemini_timeout
+from resilience import call_with_resilience, http_error, upstream_started, upstream_finished
+from limiter import gemini_slot, observe
+from usage import record_usage
+from context_cache import instruction_fields, inline_instruction, invalidate
+from schemas import ReceiptsAnalysis, MatchResponse, RemedyAnalysis
+from screenshots import PreparedImage
 from prompts import (
-    BESTIE_SYSTEM_PROMPT,
-    GURU_SYSTEM_PROMPT,
+    BESTIE_PERSONA,
+    GURU_PERSONA,
+    CHAT_CONTEXT_TEMPLATE,
+    CHAT_SUMMARY_PROMPT,
     RECEIPTS_SYSTEM_PROMPT,
     MATCH_SYSTEM_PROMPT,
     ROAST_SYSTEM_PROMPT,
     REMEDY_SYSTEM_PROMPT,
+    STRUCTURED_RETRY_PROMPT,
 )
 
 
-import ast
-
-
-def _extract_json(text: str):
-    """Extract JSON object from model output."""
-    if not text:
-        return None
-    t = text.strip()
-    if t.startswith("```"):
-        t = t.strip("`")
-    start = t.find("{")
-    end = t.rfind("}")
-    if start == -1 or end == -1 or end <= start:
-        return None
-    snippet = t[start:end + 1]
-    snippet = re.sub(r",\s*([}\]])", r"\1", snippet)
-    try:
-        obj = json.loads(snippet)
-        if isinstance(obj, dict) and "candidates" in obj:
-            return None
-        return obj
-    except Exception:
-        pass
-    try:
-        obj = ast.literal_eval(snippet)
-        if isinstance(obj, dict) and "candidates" in obj:
-            return None
-        return obj
-    except Exception:
-        return None
-
-
-def _extract_kv(text: str, key_map: dict) -> dict:
-    """Extract key/value lines like 'Title: ...' into a dict."""
-    if not text:
-        return {}
-    out = {}
-    lines = [ln.strip().lstrip("-•*—") for ln in text.splitlines()]
-    i = 0
-    while i < len(lines):
-        line = lines[i].strip()
-        if not line or line in ("{", "}", "[", "]"):
-            i += 1
-            continue
-        m = re.match(r"^([A-Za-z _]+)\s*[:\-–—]\s*(.+)$", line)
-        if not m:
-            m = re.match(r'^"?([A-Za-z _]+)"?\s*:\s*(.+)$', line)
-        if m:
-            k = m.group(1).strip().lower().strip('"'')
-            v = m.group(2).strip().rstrip(",")
-            if len(v) >= 2 and ((v[0] == '"' and v.endswith('"')) or (v[0] == "'" and v.endswith("'"))):
-                v = v[1:-1].strip()
-            elif v.startswith('"') or v.startswith("'"):
-                v = v[1:].strip()
-            if k in key_map and v:
-                out[key_map[k]] = v
-            i += 1
-            continue
-        key_only = line.strip().lower().strip('"'')
-        if key_only in key_map:
-            j = i + 1
-            while j < len(lines) and not lines[j].strip():
-                j += 1
-            if j < len(lines):
-                out[key_map[key_only]] = lines[j].strip()
-                i = j + 1
-                continue
-        i += 1
-    return out
-
-
-def _parse_remedy_from_text(text: str) -> dict:
-    key_map = {
-        "title": "title",
-        "description": "description",
-        "icon": "icon",
-        "for concern": "for_concern",
-        "concern": "for_concern",
-        "planetary basis": "planetary_basis",
-        "reason": "planetary_basis",
-        "timing": "timing",
-    }
-    return _extract_kv(text, key_map)
-
-
-def _fallback_remedy_from_text(text: str, concern: str) -> dict:
-    t = (text or "").strip()
-    if not t:
-        return {}
-    title_line = None
-    for ln in t.splitlines():
-        s = ln.strip()
-        if not s or s in ("{", "}", "[", "]"):
-            continue
-        if ":" in s:
-            continue
-        title_line = s
-        break
-    title = (title_line or "Personalized Upay")[:60].rstrip(".")
-    return {
-        "title": title,
-        "description": t[:800],
-        "icon": "🪔",
-        "for_concern": concern or "general",
-        "planetary_basis": "Based on your current transits.",
-        "timing": "Today",
-    }
-    first_line = t.splitlines()[0].strip() if t.splitlines() else t
-    title = (first_line[:60] or "Personalized Upay").rstrip(".")
-    return {
-        "title": title,
-        "description": t[:800],
-        "icon": "🪔",
-        "for_concern": concern or "general",
-        "planetary_basis": "Based on your current transits.",
-        "timing": "Today",
-    }
-
-
-def _parse_match_from_text(text: str) -> dict:
-    key_map = {
-        "overall score": "overall_score",
-        "score": "overall_score",
-        "toxic level": "toxic_level",
-        "verdict": "verdict",
-        "element dynamics": "element_dynamics",
-        "advice": "advice",
-        "summary": "shareable_summary",
-        "shareable summary": "shareable_summary",
-    }
-    data = _extract_kv(text, key_map)
-    breakdown = {}
-    for raw in text.splitlines():
-        line = raw.strip().lower().lstrip("-•*")
-        m = re.match(r"^(emotional|physical|intellectual|spiritual)\s*[:\-–]\s*(\d{1,3})", line)
-        if m:
-            breakdown[m.group(1)] = int(m.group(2))
-    if breakdown:
-        data["breakdown"] = breakdown
-    return data
-
-
-def _parse_receipts_from_text(text: str) -> dict:
-    key_map = {
-        "toxic score": "toxic_score",
-        "verdict": "verdict",
-        "planetary context": "planetary_context",
-        "advice": "advice",
-        "timestamp analysis": "timestamp_analysis",
-        "summary": "shareable_summary",
-        "shareable summary": "shareable_summary",
-    }
-    data = _extract_kv(text, key_map)
-    if "toxic_score" not in data:
-        m = re.search(r"toxic\s*score\s*[:\-–]?\s*(\d{1,3})", text, re.I)
-        if m:
-            data["toxic_score"] = int(m.group(1))
-    return data
 # ═══════════════════════════════════════════════════════════════
 # GENERATION CONFIGS
 # ═══════════════════════════════════════════════════════════════
@@ -201,6 +58,101 @@ ANALYSIS_CONFIG = {
     "maxOutputTokens": 1500,
 }
 
+SUMMARY_CONFIG = {
+    "temperature": 0.2,
+    "topP": 0.9,
+    "maxOutputTokens": 600,
+}
+
+
+# ═══════════════════════════════════════════════════════════════
+# STRUCTURED OUTPUT (responseSchema from schemas.py)
+# ═══════════════════════════════════════════════════════════════
+
+class StructuredOutputError(RuntimeError):
+    """Gemini's JSON still failed schema validation after the retry."""
+
+
+# JSON Schema keywords Gemini's OpenAPI-subset Schema accepts
+_SCHEMA_KEYS = {"type", "format", "description", "enum", "required", "minimum", "maximum", "minItems", "maxItems"}
+
+
+def response_schema(model: Type[BaseModel]) -> Dict[str, Any]:
+    """Pydantic model → Gemini responseSchema ($refs inlined, Optional → nullable)."""
+    schema = model.model_json_schema()
+    defs = schema.get("$defs", {})
+
+    def convert(node: Dict[str, Any]) -> Dict[str, Any]:
+        if "$ref" in node:
+            return convert(defs[node["$ref"].rsplit("/", 1)[-1]])
+        if "anyOf" in node:
+            options = [o for o in node["anyOf"] if o.get("type") != "null"]
+            if len(options) != 1:
+                raise ValueError(f"Unsupported union in {model.__name__}: {node['anyOf']}")
+            out = convert(options[0])
+            if len(options) < len(node["anyOf"]):
+                out["nullable"] = True
+            return out
+
+        out = {k: v for k, v in node.items() if k in _SCHEMA_KEYS}
+        if "type" in out:
+            out["type"] = out["type"].upper()
+        if "properties" in node:
+            out["properties"] = {name: convert(prop) for name, prop in node["properties"].items()}
+            out["propertyOrdering"] = list(node["properties"])
+        if "items" in node:
+            out["items"] = convert(node["items"])
+        return out
+
+    return convert(schema)
+
+
+def json_config(base: Dict, model: Type[BaseModel]) -> Dict:
+    """Generation config that makes Gemini answer with JSON matching `model`."""
+    return {**base, "responseMimeType": "application/json", "responseSchema": response_schema(model)}
+
+
+RECEIPTS_CONFIG = json_config(ANALYSIS_CONFIG, ReceiptsAnalysis)
+MATCH_CONFIG = json_config(ANALYSIS_CONFIG, MatchResponse)
+REMEDY_CONFIG = json_config(ANALYSIS_CONFIG, RemedyAnalysis)
+
+
+def _validation_summary(error: ValidationError, limit: int = 10) -> str:
+    lines = []
+    for err in error.errors()[:limit]:
+        loc = ".".join(str(part) for part in err["loc"]) or "(root)"
+        lines.append(f"- {loc}: {err['msg']}")
+    return "\n".join(lines)
+
+
+async def _generate_structured(
+    model: str,
+    contents: List[Dict],
+    generation_config: Dict,
+    schema: Type[BaseModel],
+) -> Dict:
+    """
+    generateContent in JSON mode, validated against `schema` in one pass. An invalid reply
+    gets one retry that shows the model its output and the validation errors.
+    """
+    text = await _generate_content(model, contents, generation_config)
+    try:
+        return schema.model_validate_json(text).model_dump()
+    except ValidationError as e:
+        error = e
+
+    retry_contents = contents + [
+        {"role": "model", "parts": [{"text": text}]},
+        {"role": "user", "parts": [{"text": STRUCTURED_RETRY_PROMPT.format(errors=_validation_summary(error))}]},
+    ]
+    text = await _generate_content(model, retry_contents, generation_config)
+    try:
+        return schema.model_validate_json(text).model_dump()
+    except ValidationError as e:
+        raise StructuredOutputError(
+            f"{schema.__name__} failed validation after retry: {_validation_summary(e, limit=3)}"
+        ) from e
+
 
 # ═══════════════════════════════════════════════════════════════
 # SAFETY SETTINGS (relaxed for astrology/relationship content)
@@ -218,104 +170,365 @@ SAFETY_SETTINGS = [
 # CORE REQUEST HELPERS
 # ═══════════════════════════════════════════════════════════════
 
-async def _generate_content(model: str, contents: List[Dict], generation_config: Dict) -> str:
+# A request naming a cache that no longer exists upstream
+CACHE_REJECTED_STATUSES = {400, 403, 404}
+
+@dataclass
+class Generation:
+    """One generateContent result, with the usage needed to attribute it to each caller."""
+    text: str
+    model: str                           # Model that answered (after any fallback)
+    usage_metadata: Optional[Dict] = None
+
+
+# Single-flight: identical concurrent requests share one upstream call
+_inflight: Dict[str, "asyncio.Task[Generation]"] = {}
+
+
+def _request_key(model: str, contents: List[Dict], generation_config: Dict,
+                 system_instruction: Optional[str] = None) -> str:
+    raw = json.dumps([model, contents, generation_config, system_instruction],
+                     sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+async def _generate_content(
+    model: str,
+    contents: List[Dict],
+    generation_config: Dict,
+    system_instruction: Optional[str] = None,
+) -> str:
+    """
+    generateContent, coalesced: callers with the same (model, contents, config) while a
+    request is in flight await that request instead of sending their own. The sender's
+    usage is billed inside the call; joiners record it as shared in their own context.
+    """
     if not settings.GEMINI_API_KEY:
         raise RuntimeError("GEMINI_API_KEY is missing")
 
-    url = f"{settings.GEMINI_API_BASE}/models/{model}:generateContent?key={settings.GEMINI_API_KEY}"
+    key = _request_key(model, contents, generation_config, system_instruction)
+    task = _inflight.get(key)
+    joined = task is not None
+    if task is None:
+        task = asyncio.ensure_future(
+            _post_generate_content(model, contents, generation_config, system_instruction)
+        )
+        _inflight[key] = task
+
+        def _done(t: "asyncio.Task[Generation]") -> None:
+            if _inflight.get(key) is t:
+                del _inflight[key]
+            if not t.cancelled():
+                t.exception()  # Mark retrieved even if every caller went away
+
+        task.add_done_callback(_done)
+
+    # Shielded so one caller disconnecting doesn't cancel the shared request
+    generation = await asyncio.shield(task)
+    if joined:
+        record_usage(generation.model, generation.usage_metadata, shared=True)
+    return generation.text
+
+
+async def _build_payload(
+    model: str,
+    contents: List[Dict],
+    generation_config: Dict,
+    system_instruction: Optional[str],
+    use_cache: bool = True,
+) -> Dict:
     payload = {
         "contents": contents,
         "generationConfig": generation_config,
         "safetySettings": SAFETY_SETTINGS,
     }
+    if system_instruction:
+        if use_cache:
+            payload.update(await instruction_fields(model, system_instruction))
+        else:
+            payload.update(inline_instruction(system_instruction))
+    return payload
+
+
+async def _post_generate_content(
+    model: str,
+    contents: List[Dict],
+    generation_config: Dict,
+    system_instruction: Optional[str] = None,
+) -> Generation:
+    """One logical generateContent call: retried, hedged and Pro→Flash fallback as configured."""
+    return await call_with_resilience(
+        model, lambda m: _post_once(m, contents, generation_config, system_instruction)
+    )
 
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        resp = await client.post(url, json=payload)
+
+async def _send(model: str, request) -> httpx.Response:
+    """
+    Send one upstream request inside a limiter slot, reporting the outcome to AIMD and the
+    upstream-only latency (queue wait excluded) to the resilience layer.
+    """
+    async with gemini_slot():
+        upstream_started()
+        started = time.monotonic()
+        try:
+            resp = await request()
+        except httpx.TransportError:
+            observe(None, time.monotonic() - started)
+            raise
+        latency = time.monotonic() - started
+        observe(resp.status_code, latency, model)
+        upstream_finished(latency)
+        return resp
+
+
+async def _post_once(
+    model: str,
+    contents: List[Dict],
+    generation_config: Dict,
+    system_instruction: Optional[str] = None,
+) -> Generation:
+    url = f"{settings.GEMINI_API_BASE}/models/{model}:generateContent?key={settings.GEMINI_API_KEY}"
+    payload = await _build_payload(model, contents, generation_config, system_instruction)
+    resp = await _send(model, lambda: get_client("gemini").post(url, json=payload, timeout=gemini_timeout(model)))
+
+    if resp.status_code in CACHE_REJECTED_STATUSES and "cachedContent" in payload:
+        # Cache expired or evicted upstream: forget it and resend the instruction inline
+        invalidate(model, system_instruction)
+        payload = await _build_payload(model, contents, generation_config, system_instruction, use_cache=False)
+        resp = await _send(model, lambda: get_client("gemini").post(url, json=payload, timeout=gemini_timeout(model)))
 
     if resp.status_code >= 400:
-        raise RuntimeError(f"Gemini API error {resp.status_code}: {resp.text}")
+        raise http_error(resp, resp.text)
 
     data = resp.json()
+    usage_metadata = data.get("usageMetadata")
+    record_usage(model, usage_metadata)
     candidates = data.get("candidates", [])
     if not candidates:
         raise RuntimeError("Gemini API returned no candidates")
 
     parts = candidates[0].get("content", {}).get("parts", [])
     text = "".join(p.get("text", "") for p in parts if isinstance(p, dict))
-    return text if text else json.dumps(data)
+    return Generation(text if text else json.dumps(data), model, usage_metadata)
+
+
+async def _open_stream(
+    model: str,
+    contents: List[Dict],
+    generation_config: Dict,
+    system_instruction: Optional[str],
+    stack: AsyncExitStack,
+) -> Tuple[str, httpx.Response]:
+    """
+    Open a streamGenerateContent response (headers received, status checked) on stack.
+    The limiter slot is held until the stream is closed. Returns (model, response).
+    """
+    url = f"{settings.GEMINI_API_BASE}/models/{model}:streamGenerateContent?alt=sse&key={settings.GEMINI_API_KEY}"
+    payload = await _build_payload(model, contents, generation_config, system_instruction)
+
+    for use_cache in (True, False):
+        if not use_cache:
+            payload = await _build_payload(model, contents, generation_config, system_instruction, use_cache=False)
+        attempt = AsyncExitStack()
+        try:
+            await attempt.enter_async_context(gemini_slot())
+            started = time.monotonic()
+            try:
+                resp = await attempt.enter_async_context(
+                    get_client("gemini").stream("POST", url, json=payload, timeout=gemini_timeout(model))
+                )
+            except httpx.TransportError:
+                observe(None, time.monotonic() - started)
+                raise
+            observe(resp.status_code, time.monotonic() - started, f"{model}:stream")
+            if resp.status_code < 400:
+                stack.push_async_exit(attempt.pop_all())
+                return model, resp
+            body = (await resp.aread()).decode(errors="replace")
+        finally:
+            await attempt.aclose()
+        if use_cache and resp.status_code in CACHE_REJECTED_STATUSES and "cachedContent" in payload:
+            invalidate(model, system_instruction)
+            continue
+        raise http_error(resp, body)
 
 
-def _history_to_contents(history: List[Dict]) -> List[Dict]:
+async def _stream_content(
+    model: str,
+    contents: List[Dict],
+    generation_config: Dict,
+    system_instruction: Optional[str] = None,
+) -> AsyncIterator[str]:
+    """Yield text chunks from streamGenerateContent (server-sent events)."""
+    if not settings.GEMINI_API_KEY:
+        raise RuntimeError("GEMINI_API_KEY is missing")
+
+    async with AsyncExitStack() as stack:
+        # Retries and fallback apply until the stream is open; not once text has been sent
+        used_model, resp = await call_with_resilience(
+            model,
+            lambda m: _open_stream(m, contents, generation_config, system_instruction, stack),
+            hedge=False,
+        )
+
+        # Each chunk carries cumulative usageMetadata; record the last one seen
+        usage_metadata = None
+        try:
+            async for line in resp.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = json.loads(line[5:].strip())
+                usage_metadata = data.get("usageMetadata") or usage_metadata
+                candidates = data.get("candidates", [])
+                if not candidates:
+                    continue
+                parts = candidates[0].get("content", {}).get("parts", [])
+                text = "".join(p.get("text", "") for p in parts if isinstance(p, dict))
+                if text:
+                    yield text
+        finally:
+            if usage_metadata is not None:
+                record_usage(used_model, usage_metadata)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token) for history budgeting."""
+    return (len(text) + 3) // 4
+
+
+def history_token_budget(model: str) -> int:
+    """Tokens of prior conversation sent with each turn; Pro gets the larger window."""
+    if model == settings.GEMINI_MODEL_PRO:
+        return settings.CHAT_HISTORY_TOKENS_PRO
+    return settings.CHAT_HISTORY_TOKENS_FLASH
+
+
+def _history_to_contents(history: List[Dict], max_tokens: int) -> List[Dict]:
+    """Most recent messages that fit in max_tokens, oldest first."""
     contents: List[Dict] = []
-    for msg in history[-10:]:
-        role = "user" if msg.get("role") == "user" else "model"
+    used = 0
+    for msg in reversed(history):
         content = msg.get("content", "")
-        if content:
-            contents.append({
-                "role": role,
-                "parts": [{"text": content}],
-            })
+        if not content:
+            continue
+        used += msg.get("tokens") or estimate_tokens(content)
+        if used > max_tokens:
+            break
+        role = "user" if msg.get("role") == "user" else "model"
+        contents.append({
+            "role": role,
+            "parts": [{"text": content}],
+        })
+    contents.reverse()
     return contents
 
 
+async def summarize_conversation(previous_summary: str, messages: List[Dict]) -> str:
+    """Fold messages into the running summary of a chat session (Flash)."""
+    transcript = "\n".join(
+        f"{'User' if m.get('role') == 'user' else 'Aura'}: {m.get('content', '')}" for m in messages
+    )
+    prompt = CHAT_SUMMARY_PROMPT.format(
+        max_words=settings.CHAT_SUMMARY_MAX_WORDS,
+        previous_summary=previous_summary or "(none)",
+        transcript=transcript,
+    )
+    contents = [{
+        "role": "user",
+        "parts": [{"text": prompt}],
+    }]
+    return (await _generate_content(settings.GEMINI_MODEL_FLASH, contents, SUMMARY_CONFIG)).strip()
+
+
 # ═══════════════════════════════════════════════════════════════
 # CHAT FUNCTIONS (Vibe Check)
 # ═══════════════════════════════════════════════════════════════
 
-async def chat_bestie(
+def _chat_contents(
+    model: str,
     message: str,
     user_name: str,
     user_sign: str,
     planetary_context: str,
-    conversation_history: Optional[List[Dict]] = None,
-) -> str:
-    system_prompt = BESTIE_SYSTEM_PROMPT.format(
+    conversation_history: Optional[List[Dict]],
+    conversation_summary: Optional[str] = None,
+) -> List[Dict]:
+    """
+    History plus the new user turn. The persona goes in systemInstruction; the per-day
+    planetary context rides on the latest turn so the history prefix stays stable.
+    """
+    chat_context = CHAT_CONTEXT_TEMPLATE.format(
         planetary_context=planetary_context,
         user_name=user_name,
         user_sign=user_sign.capitalize(),
     )
 
-    contents = _history_to_contents(conversation_history or [])
-    full_message = f"""[System Context - DO NOT repeat this to user]
-{system_prompt}
-
-[User's Message]
-{message}"""
+    if conversation_summary:
+        chat_context += f"\n## EARLIER IN THIS CONVERSATION\n{conversation_summary}\n"
 
+    contents = _history_to_contents(conversation_history or [], history_token_budget(model))
     contents.append({
         "role": "user",
-        "parts": [{"text": full_message}],
+        "parts": [
+            {"text": f"[System Context - DO NOT repeat this to user]\n{chat_context}"},
+            {"text": f"[User's Message]\n{message}"},
+        ],
     })
-
-    return await _generate_content(settings.GEMINI_MODEL_FLASH, contents, BESTIE_CONFIG)
+    return contents
 
 
-async def chat_guru(
+async def chat_bestie(
     message: str,
     user_name: str,
     user_sign: str,
     planetary_context: str,
     conversation_history: Optional[List[Dict]] = None,
+    conversation_summary: Optional[str] = None,
 ) -> str:
-    system_prompt = GURU_SYSTEM_PROMPT.format(
-        planetary_context=planetary_context,
-        user_name=user_name,
-        user_sign=user_sign.capitalize(),
+    model = settings.GEMINI_MODEL_FLASH
+    contents = _chat_contents(
+        model, message, user_name, user_sign, planetary_context, conversation_history, conversation_summary
     )
+    return await _generate_content(model, contents, BESTIE_CONFIG, BESTIE_PERSONA)
 
-    contents = _history_to_contents(conversation_history or [])
-    full_message = f"""[System Context - DO NOT repeat this to user]
-{system_prompt}
 
-[User's Message]
-{message}"""
+async def chat_guru(
+    message: str,
+    user_name: str,
+    user_sign: str,
+    planetary_context: str,
+    conversation_history: Optional[List[Dict]] = None,
+    conversation_summary: Optional[str] = None,
+    model: Optional[str] = None,
+) -> str:
+    """Guru reply; `model` overrides Pro, and history is budgeted for the model actually used."""
+    model = model or settings.GEMINI_MODEL_PRO
+    contents = _chat_contents(
+        model, message, user_name, user_sign, planetary_context, conversation_history, conversation_summary
+    )
+    return await _generate_content(model, contents, GURU_CONFIG, GURU_PERSONA)
 
-    contents.append({
-        "role": "user",
-        "parts": [{"text": full_message}],
-    })
 
-    return await _generate_content(settings.GEMINI_MODEL_PRO, contents, GURU_CONFIG)
+def stream_chat(
+    guru: bool,
+    message: str,
+    user_name: str,
+    user_sign: str,
+    planetary_context: str,
+    conversation_history: Optional[List[Dict]] = None,
+    conversation_summary: Optional[str] = None,
+    model: Optional[str] = None,
+) -> AsyncIterator[str]:
+    """Stream a Bestie (Flash) or Guru (Pro, unless `model` overrides) reply as text chunks."""
+    if guru:
+        default_model, persona, config = settings.GEMINI_MODEL_PRO, GURU_PERSONA, GURU_CONFIG
+    else:
+        default_model, persona, config = settings.GEMINI_MODEL_FLASH, BESTIE_PERSONA, BESTIE_CONFIG
+    model = model or default_model
+    contents = _chat_contents(
+        model, message, user_name, user_sign, planetary_context, conversation_history, conversation_summary
+    )
+    return _stream_content(model, contents, config, persona)
 
 
 # ═══════════════════════════════════════════════════════════════
@@ -323,11 +536,12 @@ async def chat_guru(
 # ═══════════════════════════════════════════════════════════════
 
 async def analyze_screenshot(
-    image_base64: str,
+    image: PreparedImage,
     user_name: str,
     user_sign: str,
     planetary_context: str,
     context: Optional[str] = None,
+    model: Optional[str] = None,
 ) -> Dict:
     system_prompt = RECEIPTS_SYSTEM_PROMPT.format(
         planetary_context=planetary_context,
@@ -335,20 +549,6 @@ async def analyze_screenshot(
         user_sign=user_sign.capitalize(),
     )
 
-    # Decode base64 image (supports data URLs)
-    mime_type = "image/png"
-    if image_base64.startswith("data:") and "," in image_base64:
-        header, image_base64 = image_base64.split(",", 1)
-        header = header[5:]  # strip 'data:'
-        if ";" in header:
-            mime_type = header.split(";", 1)[0] or mime_type
-    elif "," in image_base64:
-        image_base64 = image_base64.split(",", 1)[1]
-
-    image_base64 = image_base64.strip()
-    # Validate base64
-    base64.b64decode(image_base64, validate=True)
-
     user_context = f"\nUser's additional context: {context}" if context else ""
 
     prompt = f"""{system_prompt}
@@ -360,27 +560,11 @@ Analyze this chat screenshot. Read every message, note timestamps, and cross-ref
         "role": "user",
         "parts": [
             {"text": prompt},
-            {"inline_data": {"mime_type": mime_type, "data": image_base64}},
+            {"inline_data": {"mime_type": image.mime_type, "data": image.to_base64()}},
         ],
     }]
 
-    response_text = await _generate_content(settings.GEMINI_MODEL_PRO, contents, ANALYSIS_CONFIG)
-
-    result = _extract_json(response_text)
-    if result is None:
-        result = _parse_receipts_from_text(response_text)
-    if not result:
-        result = {
-                "toxic_score": 65,
-                "red_flags": [{"flag": "Could not fully analyze", "severity": 5, "planetary_cause": "Mercury interference"}],
-                "verdict": response_text[:500],
-                "planetary_context": planetary_context[:200],
-                "advice": "Try uploading a clearer screenshot for better analysis.",
-                "timestamp_analysis": "",
-                "shareable_summary": "The cosmos needs a better screenshot 📸"
-            }
-
-    return result
+    return await _generate_structured(model or settings.GEMINI_MODEL_PRO, contents, RECEIPTS_CONFIG, ReceiptsAnalysis)
 
 
 # ═══════════════════════════════════════════════════════════════
@@ -394,11 +578,8 @@ ELEMENT_MAP = {
     "cancer": "Water", "scorpio": "Water", "pisces": "Water",
 }
 
-async def check_compatibility(
-    user_sign: str,
-    crush_sign: str,
-    user_name: str = "User",
-) -> Dict:
+async def generate_compatibility(user_sign: str, crush_sign: str) -> Dict:
+    """One validated model result for a sign pair; StructuredOutputError if it never matched the schema."""
     user_element = ELEMENT_MAP.get(user_sign.lower(), "Unknown")
     crush_element = ELEMENT_MAP.get(crush_sign.lower(), "Unknown")
 
@@ -414,23 +595,7 @@ async def check_compatibility(
         "parts": [{"text": prompt}],
     }]
 
-    response_text = await _generate_content(settings.GEMINI_MODEL_FLASH, contents, ANALYSIS_CONFIG)
-
-    result = _extract_json(response_text)
-    if result is None:
-        result = _parse_match_from_text(response_text)
-    if not result:
-        result = {
-                "overall_score": 65,
-                "toxic_level": "Medium",
-                "verdict": f"{user_sign.capitalize()} and {crush_sign.capitalize()} — it's complicated. The stars are still deliberating.",
-                "element_dynamics": f"{user_element} meets {crush_element}",
-                "breakdown": {"emotional": 60, "physical": 65, "intellectual": 55, "spiritual": 50},
-                "advice": "Proceed with cosmic caution.",
-                "shareable_summary": f"{user_sign.capitalize()} × {crush_sign.capitalize()} = cosmic chaos 🌀"
-            }
-
-    return result
+    return await _generate_structured(settings.GEMINI_MODEL_FLASH, contents, MATCH_CONFIG, MatchResponse)
 
 
 # ═══════════════════════════════════════════════════════════════
@@ -470,6 +635,7 @@ async def generate_remedy(
     sign: str,
     planetary_context: str,
     concern: Optional[str] = None,
+    model: Optional[str] = None,
 ) -> Dict:
     prompt = REMEDY_SYSTEM_PROMPT.format(
         planetary_context=planetary_context,
@@ -482,21 +648,4 @@ async def generate_remedy(
         "parts": [{"text": prompt}],
     }]
 
-    response_text = await _generate_content(settings.GEMINI_MODEL_PRO, contents, ANALYSIS_CONFIG)
-
-    result = _extract_json(response_text)
-    if result is None:
-        result = _parse_remedy_from_text(response_text)
-    if not result:
-        result = _fallback_remedy_from_text(response_text, concern)
-    if not result:
-        result = {
-                "title": "General Wellness Upay",
-                "description": "Light a ghee diya at sunset and meditate for 5 minutes.",
-                "icon": "🪔",
-                "for_concern": concern or "general",
-                "planetary_basis": "Default remedy for cosmic alignment.",
-                "timing": "Today at sunset"
-            }
-
-    return result
+    return await _generate_structured(model or settings.GEMINI_MODEL_PRO, contents, REMEDY_CONFIG, RemedyAnalysis)
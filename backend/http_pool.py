@@ -0,0 +1,62 @@
+# http_pool.py — Application-scoped outbound HTTP clients
+# One long-lived httpx.AsyncClient per upstream, opened at startup and closed at shutdown,
+# so calls reuse warm TCP/TLS connections (HTTP/2 multiplexed where available).
+
+from typing import Dict, Optional
+import httpx
+
+from config import settings
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except Exception:
+    HTTP2_AVAILABLE = False
+
+_clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def _new_client(name: str) -> httpx.AsyncClient:
+    if name == "gemini":
+        return httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(settings.GEMINI_PRO_READ_TIMEOUT, connect=settings.GEMINI_CONNECT_TIMEOUT),
+        )
+    if name == "razorpay":
+        return httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=2),
+            timeout=httpx.Timeout(30.0, connect=5.0),
+        )
+    raise ValueError(f"Unknown HTTP client: {name}")
+
+
+def get_client(name: str) -> httpx.AsyncClient:
+    """Return the shared client for an upstream, creating it on first use."""
+    client = _clients.get(name)
+    if client is None or client.is_closed:
+        client = _new_client(name)
+        _clients[name] = client
+    return client
+
+
+def gemini_timeout(model: str) -> httpx.Timeout:
+    """Per-model timeout: Pro generations are slower than Flash."""
+    read = settings.GEMINI_PRO_READ_TIMEOUT if model == settings.GEMINI_MODEL_PRO else settings.GEMINI_FLASH_READ_TIMEOUT
+    return httpx.Timeout(read, connect=settings.GEMINI_CONNECT_TIMEOUT)
+
+
+async def open_clients() -> None:
+    for name in ("gemini", "razorpay"):
+        get_client(name)
+
+
+async def close_clients() -> None:
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await client.aclose()
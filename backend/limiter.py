@@ -0,0 +1,183 @@
+# limiter.py — Adaptive concurrency limit for outbound Gemini requests
+# At most `limit` upstream requests are in flight. Callers beyond that wait in a priority
+# queue: premium users and paid features first, then free traffic, then background jobs.
+# The limit adapts AIMD-style: +1 per limit's worth of healthy calls, ×GEMINI_LIMITER_BACKOFF
+# on 429/503, transport errors, or calls slower than GEMINI_LIMITER_LATENCY_FACTOR × that
+# model's median (a long Pro generation is only "slow" compared with other Pro calls).
+
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+from config import settings
+
+
+class Priority(IntEnum):
+    HIGH = 0        # Premium users, paid features (receipts)
+    NORMAL = 1      # Free chat, match, remedy
+    LOW = 2         # Roasts and background jobs (pools, warm-ups, summaries)
+
+
+_priority: ContextVar[Priority] = ContextVar("gemini_priority", default=Priority.NORMAL)
+
+
+def set_priority(priority: Priority) -> None:
+    """Priority for Gemini calls made from the current request / task."""
+    _priority.set(priority)
+
+
+def current_priority() -> Priority:
+    return _priority.get()
+
+
+# Don't cut the limit more than once per this many seconds (one burst of 429s = one cut)
+_DECREASE_COOLDOWN_SECONDS = 1.0
+# Queue-wait samples kept per priority for percentiles
+_WAIT_WINDOW = 500
+# Upstream latency samples kept per model (and call kind) for its baseline, and the minimum to use it
+_BASELINE_WINDOW = 200
+_BASELINE_MIN_SAMPLES = 20
+
+
+class AdaptiveLimiter:
+    def __init__(self, initial: int, minimum: int, maximum: int):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.in_flight = 0
+        self._queue: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._last_decrease = 0.0
+        self._waits: Dict[Priority, Deque[float]] = {p: deque(maxlen=_WAIT_WINDOW) for p in Priority}
+        self._counts: Dict[Priority, int] = {p: 0 for p in Priority}
+        self._baselines: Dict[str, Deque[float]] = {}
+
+    # ── slots ────────────────────────────────────────────────
+
+    async def acquire(self, priority: Priority) -> None:
+        started = time.monotonic()
+        if not self._queue and self.in_flight < int(self.limit):
+            self.in_flight += 1
+        else:
+            fut = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._queue, (int(priority), next(self._seq), fut))
+            self._wake()
+            try:
+                await fut
+            except asyncio.CancelledError:
+                if fut.done() and not fut.cancelled():
+                    self.release()  # Granted just as we were cancelled
+                raise
+        self._waits[priority].append(time.monotonic() - started)
+        self._counts[priority] += 1
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._queue and self.in_flight < int(self.limit):
+            _, _, fut = heapq.heappop(self._queue)
+            if fut.done():
+                continue  # Waiter was cancelled
+            self.in_flight += 1
+            fut.set_result(None)
+
+    # ── AIMD ─────────────────────────────────────────────────
+
+    def on_success(self, latency: float, baseline: Optional[str] = None) -> None:
+        """Healthy response; `baseline` names the latency baseline it belongs to (e.g. the model)."""
+        if self._is_slow(latency, baseline):
+            self.on_overload()
+            return
+        self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        self._wake()
+
+    def _is_slow(self, latency: float, baseline: Optional[str]) -> bool:
+        factor = settings.GEMINI_LIMITER_LATENCY_FACTOR
+        if factor <= 0 or baseline is None:
+            return False
+        samples = self._baselines.setdefault(baseline, deque(maxlen=_BASELINE_WINDOW))
+        slow = len(samples) >= _BASELINE_MIN_SAMPLES and latency > factor * _median(samples)
+        samples.append(latency)
+        return slow
+
+    def on_overload(self) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < _DECREASE_COOLDOWN_SECONDS:
+            return
+        self._last_decrease = now
+        self.limit = max(self.minimum, self.limit * settings.GEMINI_LIMITER_BACKOFF)
+
+    # ── metrics ──────────────────────────────────────────────
+
+    def snapshot(self) -> Dict:
+        queued = {p.name.lower(): 0 for p in Priority}
+        for priority, _, fut in self._queue:
+            if not fut.done():
+                queued[Priority(priority).name.lower()] += 1
+
+        wait_ms = {}
+        for p, samples in self._waits.items():
+            ordered = sorted(samples)
+            pct = lambda q: round(1000 * ordered[int(q * (len(ordered) - 1))], 1) if ordered else 0.0
+            wait_ms[p.name.lower()] = {"count": self._counts[p], "p50": pct(0.5), "p95": pct(0.95), "max": pct(1.0)}
+
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "queued": queued,
+            "queue_wait_ms": wait_ms,
+            "latency_baseline_ms": {
+                key: round(1000 * _median(samples), 1)
+                for key, samples in self._baselines.items() if len(samples) >= _BASELINE_MIN_SAMPLES
+            },
+        }
+
+
+def _median(samples: Deque[float]) -> float:
+    ordered = sorted(samples)
+    return ordered[len(ordered) // 2]
+
+
+_limiter: Optional[AdaptiveLimiter] = None
+
+
+def get_limiter() -> AdaptiveLimiter:
+    global _limiter
+    if _limiter is None:
+        _limiter = AdaptiveLimiter(
+            settings.GEMINI_CONCURRENCY_INITIAL,
+            settings.GEMINI_CONCURRENCY_MIN,
+            settings.GEMINI_CONCURRENCY_MAX,
+        )
+    return _limiter
+
+
+def observe(status_code: Optional[int], latency: float, baseline: Optional[str] = None) -> None:
+    """
+    Feed one upstream result into the AIMD loop (status None = transport error/timeout).
+    `baseline` groups comparable calls, e.g. "gemini-pro" vs "gemini-pro:stream" (time to headers).
+    """
+    limiter = get_limiter()
+    if status_code is None or status_code in (429, 503):
+        limiter.on_overload()
+    elif status_code < 400:
+        limiter.on_success(latency, baseline)
+
+
+@asynccontextmanager
+async def gemini_slot() -> AsyncIterator[None]:
+    """Hold one upstream slot at the current task's priority."""
+    limiter = get_limiter()
+    await limiter.acquire(current_priority())
+    try:
+        yield
+    finally:
+        limiter.release()
@@ -0,0 +1,275 @@
+# loadtest.py — Open-loop load test for the Aura AI backend
+# Fires requests at a fixed arrival rate (not "N workers in a loop", so a slow server
+# can't hide its latency by slowing the test down) across a weighted endpoint mix,
+# then reports achieved RPS, p50/p95/p99 latency and error rate per endpoint.
+# Run it against a backend pointed at fake_gemini.py (see README → Load Testing):
+#
+#   python loadtest.py --rps 20 --duration 60 --mix chat=4,receipts=1,match=2,battery=2,roast=1
+#
+# --max-p95-ms / --max-error-rate turn it into a regression gate (exit status 1 on breach).
+
+import argparse
+import asyncio
+import base64
+import io
+import json
+import random
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except Exception:
+    Image = None
+    PIL_AVAILABLE = False
+
+SIGNS = [
+    "aries", "taurus", "gemini", "cancer", "leo", "virgo",
+    "libra", "scorpio", "sagittarius", "capricorn", "aquarius", "pisces",
+]
+ENDPOINTS = ("chat", "chat_stream", "receipts", "match", "battery", "roast")
+CHAT_MESSAGES = [
+    "Why is my crush leaving me on read?",
+    "Should I text my ex tonight?",
+    "Is this week good for asking for a raise?",
+    "Kya mera situationship kabhi relationship banega?",
+    "Why do I feel so drained today?",
+]
+
+
+@dataclass
+class Result:
+    endpoint: str
+    status: int          # 0 = transport error / timeout
+    latency: float
+
+
+@dataclass
+class Report:
+    results: List[Result] = field(default_factory=list)
+    dropped: int = 0     # Arrivals skipped because --max-in-flight was reached
+    elapsed: float = 0.0
+
+
+# ═══════════════════════════════════════════════════════════════
+# PAYLOADS
+# ═══════════════════════════════════════════════════════════════
+
+def _screenshot(unique: bool) -> str:
+    """Small phone-shaped PNG; unique pixels defeat the receipts cache."""
+    if not PIL_AVAILABLE:
+        raise SystemExit("Pillow is required for the receipts endpoint")
+    seed = random.random() if unique else 0.5
+    shade = int(seed * 200)
+    img = Image.new("RGB", (390, 844), (245, 245, 245))
+    for y in range(40, 800, 60):
+        img.paste((shade, 120, 255 - shade), (20 + (y % 120), y, 300, y + 40))
+    out = io.BytesIO()
+    img.save(out, format="PNG")
+    return base64.b64encode(out.getvalue()).decode("ascii")
+
+
+def _request_for(endpoint: str, user: Dict, unique_images: bool) -> Tuple[str, str, Dict]:
+    """(method, path, json body) for one call."""
+    if endpoint in ("chat", "chat_stream"):
+        path = "/api/chat" if endpoint == "chat" else "/api/chat/stream"
+        return "POST", path, {
+            "user_id": user["id"],
+            "message": random.choice(CHAT_MESSAGES),
+            "mode": random.choice(["bestie", "bestie", "guru"]),
+        }
+    if endpoint == "receipts":
+        return "POST", "/api/receipts", {"user_id": user["id"], "image_base64": _screenshot(unique_images)}
+    if endpoint == "match":
+        return "POST", "/api/match", {
+            "user_id": user["id"], "user_sign": user["sign"], "crush_sign": random.choice(SIGNS),
+        }
+    if endpoint == "battery":
+        return "POST", "/api/battery", {"user_id": user["id"], "sign": user["sign"], "dob": user["dob"]}
+    if endpoint == "roast":
+        body = {"user_id": user["id"], "sign": random.choice(SIGNS)}
+        if random.random() < 0.2:
+            body["context"] = "roast my love life"
+        return "POST", "/api/roast", body
+    raise ValueError(f"Unknown endpoint {endpoint}")
+
+
+# ═══════════════════════════════════════════════════════════════
+# DRIVER
+# ═══════════════════════════════════════════════════════════════
+
+async def _create_users(client: httpx.AsyncClient, count: int) -> List[Dict]:
+    users = []
+    for i in range(count):
+        sign = SIGNS[i % len(SIGNS)]
+        dob = f"199{i % 10}-0{1 + i % 9}-1{i % 10}"
+        resp = await client.post("/api/user", json={"name": f"Load {i}", "sign": sign, "dob": dob})
+        resp.raise_for_status()
+        users.append({"id": resp.json()["id"], "sign": sign, "dob": dob})
+    return users
+
+
+async def _call(client: httpx.AsyncClient, endpoint: str, user: Dict, unique_images: bool) -> Result:
+    method, path, body = _request_for(endpoint, user, unique_images)
+    started = time.perf_counter()
+    try:
+        if endpoint == "chat_stream":
+            async with client.stream(method, path, json=body) as resp:
+                async for _ in resp.aiter_bytes():
+                    pass
+        else:
+            resp = await client.request(method, path, json=body)
+        status = resp.status_code
+    except httpx.HTTPError:
+        status = 0
+    return Result(endpoint, status, time.perf_counter() - started)
+
+
+def _picker(mix: Dict[str, float]) -> Callable[[], str]:
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    return lambda: random.choices(names, weights)[0]
+
+
+async def run(
+    base_url: str,
+    rps: float,
+    duration: float,
+    mix: Dict[str, float],
+    users: int,
+    max_in_flight: int,
+    unique_images: bool,
+    poisson: bool,
+    timeout: float,
+) -> Report:
+    report = Report()
+    limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        pool = await _create_users(client, users)
+        pick = _picker(mix)
+        tasks = set()
+
+        started = time.perf_counter()
+        next_at = started
+        while next_at - started < duration:
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if len(tasks) >= max_in_flight:
+                report.dropped += 1
+            else:
+                task = asyncio.create_task(_call(client, pick(), random.choice(pool), unique_images))
+                task.add_done_callback(lambda t: report.results.append(t.result()))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            next_at += random.expovariate(rps) if poisson else 1 / rps
+
+        if tasks:
+            await asyncio.wait(tasks)
+        report.elapsed = time.perf_counter() - started
+    return report
+
+
+# ═══════════════════════════════════════════════════════════════
+# REPORTING
+# ═══════════════════════════════════════════════════════════════
+
+def _percentile(ordered: List[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def summarize(report: Report) -> Dict[str, Dict]:
+    groups: Dict[str, List[Result]] = defaultdict(list)
+    for r in report.results:
+        groups[r.endpoint].append(r)
+        groups["all"].append(r)
+
+    summary = {}
+    for name, results in sorted(groups.items(), key=lambda kv: (kv[0] == "all", kv[0])):
+        ordered = sorted(r.latency for r in results)
+        errors = sum(1 for r in results if r.status == 0 or r.status >= 500)
+        statuses: Dict[str, int] = defaultdict(int)
+        for r in results:
+            statuses[str(r.status)] += 1
+        summary[name] = {
+            "requests": len(results),
+            "rps": round(len(results) / report.elapsed, 2) if report.elapsed else 0.0,
+            "p50_ms": round(1000 * _percentile(ordered, 0.50), 1),
+            "p95_ms": round(1000 * _percentile(ordered, 0.95), 1),
+            "p99_ms": round(1000 * _percentile(ordered, 0.99), 1),
+            "max_ms": round(1000 * ordered[-1], 1) if ordered else 0.0,
+            "error_rate": round(errors / len(results), 4) if results else 0.0,
+            "statuses": dict(statuses),
+        }
+    return summary
+
+
+def print_summary(summary: Dict[str, Dict], report: Report) -> None:
+    print(f"\n✦ {len(report.results)} requests in {report.elapsed:.1f}s, dropped {report.dropped}")
+    print(f"{'endpoint':<12} {'reqs':>6} {'rps':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'err%':>6}  statuses")
+    for name, s in summary.items():
+        print(
+            f"{name:<12} {s['requests']:>6} {s['rps']:>7.2f} {s['p50_ms']:>8.1f} {s['p95_ms']:>8.1f} "
+            f"{s['p99_ms']:>8.1f} {s['max_ms']:>8.1f} {100 * s['error_rate']:>5.1f}%  "
+            + " ".join(f"{k}:{v}" for k, v in sorted(s["statuses"].items()))
+        )
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for item in spec.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"Unknown endpoint {name!r} (choose from {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Open-loop load test for the Aura AI backend.")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--rps", type=float, default=10.0)
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of arrivals")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("chat=4,receipts=1,match=2,battery=2,roast=1"))
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--max-in-flight", type=int, default=500)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--repeat-images", action="store_true", help="Reuse one screenshot (hits the receipts cache)")
+    parser.add_argument("--poisson", action="store_true", help="Exponential inter-arrival times")
+    parser.add_argument("--json", dest="json_path", help="Also write the summary as JSON here")
+    parser.add_argument("--max-p95-ms", type=float, help="Fail if the overall p95 exceeds this")
+    parser.add_argument("--max-error-rate", type=float, help="Fail if the overall error rate exceeds this")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(
+        args.base_url, args.rps, args.duration, args.mix, args.users,
+        args.max_in_flight, not args.repeat_images, args.poisson, args.timeout,
+    ))
+    summary = summarize(report)
+    print_summary(summary, report)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"dropped": report.dropped, "elapsed": report.elapsed, "endpoints": summary}, f, indent=2)
+
+    overall = summary.get("all", {})
+    failed = False
+    if args.max_p95_ms is not None and overall.get("p95_ms", 0) > args.max_p95_ms:
+        print(f"✦ FAIL: p95 {overall['p95_ms']}ms > {args.max_p95_ms}ms")
+        failed = True
+    if args.max_error_rate is not None and overall.get("error_rate", 0) > args.max_error_rate:
+        print(f"✦ FAIL: error rate {overall['error_rate']} > {args.max_error_rate}")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
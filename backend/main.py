@@ -1,51 +1,98 @@
 # main.py — Aura AI FastAPI Backend
 # Run: uvicorn main:app --reload --port 8000
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from datetime import datetime, date
+from fastapi.responses import StreamingResponse
+from starlette.datastructures import UploadFile
+from starlette.formparsers import MultiPartException, MultiPartParser
+from datetime import datetime, date, timedelta, timezone
+from typing import Dict, Optional
+import asyncio
 import hmac
 import hashlib
-import httpx
+import json
 from pathlib import Path
 
 from config import settings
 from schemas import (
     ChatRequest, ChatResponse, ChatMode,
-    ReceiptsRequest, ReceiptsResponse, RedFlagDetail,
-    MatchRequest, MatchResponse, CompatibilityBreakdown,
+    ReceiptsRequest, ReceiptsResponse,
+    MatchRequest, MatchResponse,
     BatteryRequest, BatteryResponse, TransitInfo,
+    BatteryForecastRequest, BatteryForecastResponse, BatteryForecastPoint, ForecastInterval,
+    EventsRequest, EventsResponse, AstroEventInfo,
     RoastRequest, RoastResponse,
     RemedyRequest, RemedyResponse,
     UserCreate,
     CreateOrderRequest, CreateOrderResponse, VerifyPaymentRequest,
+    UsageTotals, UserUsage, UsageReportResponse,
 )
 from astro_engine import (
-    format_planetary_context,
-    calculate_cosmic_battery,
-    get_current_transits,
+    PLANETS,
+    SIGNS,
+    SWE_AVAILABLE,
+    SkySnapshot,
+    get_sky_snapshot,
+    sky_bucket_start,
+    get_user_sky_context,
+    forecast_cosmic_battery,
+    get_natal_chart,
+    natal_columns,
+    user_natal_chart,
+    datetime_to_jd,
+    ephemeris_source,
 )
+from ephemeris_table import table_status
+from events import get_events
+from cache_db import init_cache_db
+from chat_sessions import load_history, record_exchange, schedule_compaction
+from match_cache import get_match
+from roast_pool import ANONYMOUS_DOB, get_general_roast, fill_pool
+from resilience import breaker_states, is_retryable, CircuitOpenError
+from limiter import Priority, get_limiter, set_priority
+from model_router import route_model, router_stats
+from usage import start_meter, flush_usage
+from receipts_cache import get_cached_receipt, cache_receipt
+from screenshots import (
+    PreparedImage,
+    ScreenshotError,
+    ScreenshotTooLarge,
+    capped_stream,
+    spool_upload,
+    prepare_base64_screenshot,
+    prepare_screenshot_file,
+    shutdown_executor,
+)
+from http_pool import get_client, open_clients, close_clients, HTTP2_AVAILABLE
 from gemini_client import (
     chat_bestie,
     chat_guru,
+    stream_chat,
     analyze_screenshot,
-    check_compatibility,
     generate_roast,
     generate_remedy,
+    StructuredOutputError,
 )
 from storage import (
     init_db,
+    create_chat_session,
+    get_chat_session,
+    latest_chat_session,
+    prune_chat_sessions,
     create_user,
     get_user,
     increment_messages_today,
     increment_receipts_today,
+    refund_receipts_today,
     add_receipts_credit,
     consume_receipts_credit,
     create_order,
     get_order_by_razorpay_id,
     mark_order_paid,
     set_user_premium,
+    get_usage,
 )
 
 # ═══════════════════════════════════════════════════════════════
@@ -91,6 +138,20 @@ def _is_premium(user: dict) -> bool:
     return bool(user.get("is_premium"))
 
 
+def _user_priority(user: dict) -> Priority:
+    """Gemini queue priority: premium users are served before free traffic."""
+    return Priority.HIGH if _is_premium(user) else Priority.NORMAL
+
+
+def _upstream_error(e: Exception) -> Optional[HTTPException]:
+    """502/503 for Gemini failures worth retrying later; None for anything else."""
+    if isinstance(e, StructuredOutputError):
+        return HTTPException(status_code=502, detail=f"The stars answered in riddles, try again: {str(e)}")
+    if isinstance(e, CircuitOpenError) or is_retryable(e):
+        return HTTPException(status_code=503, detail=f"The cosmos is busy, try again shortly: {str(e)}")
+    return None
+
+
 # ═══════════════════════════════════════════════════════════════
 # HEALTH CHECK
 # ═══════════════════════════════════════════════════════════════
@@ -102,23 +163,55 @@ async def root():
         "tagline": "Your Cosmic Bestie. No Filter. No Judgement.",
         "status": "✦ Online",
         "version": "1.0.0",
+        "ephemeris": ephemeris_source(datetime_to_jd(datetime.utcnow())),
     }
 
 
 @app.get("/health")
 async def health():
-    return {"status": "ok", "timestamp": datetime.utcnow().isoformat()}
+    return {
+        "status": "ok",
+        "timestamp": datetime.utcnow().isoformat(),
+        "gemini_breakers": breaker_states(),
+        "gemini_limiter": get_limiter().snapshot(),
+        "gemini_router": router_stats(),
+        "ephemeris_table": table_status(),
+    }
 
 
 # ═══════════════════════════════════════════════════════════════
 # ROUTE 1: VIBE CHECK CHAT
 # POST /api/chat
+# POST /api/chat/stream
 # ═══════════════════════════════════════════════════════════════
 
+def _chat_session(req: ChatRequest, user: dict) -> Optional[dict]:
+    """
+    The request's server-side session: the one named, else the user's session in this mode
+    active within CHAT_SESSION_IDLE_HOURS, else a new one. None when the client sends its own history.
+    """
+    if req.session_id:
+        session = get_chat_session(req.session_id)
+        if not session or session["user_id"] != user["id"]:
+            raise HTTPException(status_code=404, detail="Chat session not found")
+        return session
+    if req.conversation_history:
+        return None
+    idle_since = datetime.utcnow() - timedelta(hours=settings.CHAT_SESSION_IDLE_HOURS)
+    session = latest_chat_session(user["id"], req.mode.value, idle_since.isoformat())
+    return session or create_chat_session(user["id"], req.mode.value)
+
+
+def _chat_model(mode: ChatMode) -> str:
+    return settings.GEMINI_MODEL_PRO if mode == ChatMode.guru else settings.GEMINI_MODEL_FLASH
+
+
 @app.post("/api/chat", response_model=ChatResponse)
 async def vibe_check(req: ChatRequest):
     try:
         user = _require_user(req.user_id)
+        set_priority(_user_priority(user))
+        meter = start_meter(user["id"], f"chat_{req.mode.value}")
 
         if not _is_premium(user) and user["messages_today"] >= settings.FREE_MESSAGES_PER_DAY:
             raise HTTPException(status_code=402, detail="Free message limit reached")
@@ -127,7 +220,13 @@ async def vibe_check(req: ChatRequest):
         user_dob = date.fromisoformat(user["dob"])
         user_name = user["name"]
 
-        planetary_context = format_planetary_context(user_sign, user_dob)
+        planetary_context = get_user_sky_context(user_sign, user_dob, user_natal_chart(user)).planetary_context
+
+        session = _chat_session(req, user)
+        history, summary = req.conversation_history or [], None
+        if session:
+            session_history = load_history(session)
+            history, summary = session_history.messages, session_history.summary
 
         if req.mode == ChatMode.bestie:
             reply = await chat_bestie(
@@ -135,7 +234,8 @@ async def vibe_check(req: ChatRequest):
                 user_name=user_name,
                 user_sign=user_sign,
                 planetary_context=planetary_context,
-                conversation_history=req.conversation_history or [],
+                conversation_history=history,
+                conversation_summary=summary,
             )
         else:
             reply = await chat_guru(
@@ -143,73 +243,175 @@ async def vibe_check(req: ChatRequest):
                 user_name=user_name,
                 user_sign=user_sign,
                 planetary_context=planetary_context,
-                conversation_history=req.conversation_history or [],
+                conversation_history=history,
+                conversation_summary=summary,
+                model=route_model("chat_guru", _is_premium(user), req.message).model,
             )
 
         increment_messages_today(user["id"])
+        if session:
+            record_exchange(session["id"], req.message, reply)
+            schedule_compaction(session["id"], _chat_model(req.mode))
 
         return ChatResponse(
             reply=reply,
             mode=req.mode,
             planetary_context=planetary_context[:200],
+            tokens_used=meter.tokens_used,
             is_free=not _is_premium(user),
+            session_id=session["id"] if session else None,
         )
 
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Cosmic interference: {str(e)}")
+        raise _upstream_error(e) or HTTPException(status_code=500, detail=f"Cosmic interference: {str(e)}")
+
+
+def _sse(data: dict, event: Optional[str] = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post("/api/chat/stream")
+async def vibe_check_stream(req: ChatRequest):
+    """Same as /api/chat, streamed as Server-Sent Events (chunk events, then done/error)."""
+    user = _require_user(req.user_id)
+    set_priority(_user_priority(user))
+    meter = start_meter(user["id"], f"chat_{req.mode.value}")
+
+    if not _is_premium(user) and user["messages_today"] >= settings.FREE_MESSAGES_PER_DAY:
+        raise HTTPException(status_code=402, detail="Free message limit reached")
+
+    session = _chat_session(req, user)
+    try:
+        user_dob = date.fromisoformat(user["dob"])
+        planetary_context = get_user_sky_context(user["sign"], user_dob, user_natal_chart(user)).planetary_context
+        history, summary = req.conversation_history or [], None
+        if session:
+            session_history = load_history(session)
+            history, summary = session_history.messages, session_history.summary
+    except Exception as e:
+        raise _upstream_error(e) or HTTPException(status_code=500, detail=f"Cosmic interference: {str(e)}")
+
+    guru = req.mode == ChatMode.guru
+    chunks = stream_chat(
+        guru=guru,
+        message=req.message,
+        user_name=user["name"],
+        user_sign=user["sign"],
+        planetary_context=planetary_context,
+        conversation_history=history,
+        conversation_summary=summary,
+        model=route_model("chat_guru", _is_premium(user), req.message).model if guru else None,
+    )
+
+    async def events():
+        counted = False
+        reply = []
+        try:
+            async for text in chunks:
+                # Count against the quota as soon as the user sees a token
+                if not counted:
+                    increment_messages_today(user["id"])
+                    counted = True
+                reply.append(text)
+                yield _sse({"text": text})
+            if session and reply:
+                record_exchange(session["id"], req.message, "".join(reply))
+                schedule_compaction(session["id"], _chat_model(req.mode))
+            yield _sse({
+                "mode": req.mode.value,
+                "planetary_context": planetary_context[:200],
+                "tokens_used": meter.tokens_used,
+                "is_free": not _is_premium(user),
+                "session_id": session["id"] if session else None,
+            }, event="done")
+        except Exception as e:
+            # Headers are already sent: the status the JSON route would return goes in the event
+            error = _upstream_error(e) or HTTPException(status_code=500, detail=f"Cosmic interference: {str(e)}")
+            yield _sse({"status": error.status_code, "detail": error.detail}, event="error")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 # ═══════════════════════════════════════════════════════════════
 # ROUTE 2: RECEIPTS JUDGE (Screenshot Analysis)
 # POST /api/receipts
+# POST /api/receipts/upload
 # ═══════════════════════════════════════════════════════════════
 
-@app.post("/api/receipts", response_model=ReceiptsResponse)
-async def receipts_judge(req: ReceiptsRequest):
-    try:
-        user = _require_user(req.user_id)
-
-        if not _is_premium(user):
-            if user["receipts_today"] < settings.FREE_RECEIPTS_PER_DAY:
-                increment_receipts_today(user["id"])
-            elif consume_receipts_credit(user["id"]):
-                pass
-            else:
-                raise HTTPException(status_code=402, detail="Receipts limit reached")
+async def _judge_receipts(user: dict, image: PreparedImage, context: Optional[str]) -> ReceiptsResponse:
+    set_priority(Priority.HIGH)  # Paid feature
+    meter = start_meter(user["id"], "receipts")
+
+    # Same screenshot + context today: no Gemini call, no credit
+    cached = get_cached_receipt(user["id"], image, context)
+    if cached is not None:
+        return ReceiptsResponse(**cached)
+
+    spent = None  # "daily" or "credit": given back if the analysis fails
+    if not _is_premium(user):
+        if user["receipts_today"] < settings.FREE_RECEIPTS_PER_DAY:
+            increment_receipts_today(user["id"])
+            spent = "daily"
+        elif consume_receipts_credit(user["id"]):
+            spent = "credit"
+        else:
+            raise HTTPException(status_code=402, detail="Receipts limit reached")
 
-        user_sign = user["sign"]
-        user_dob = date.fromisoformat(user["dob"])
-        user_name = user["name"]
+    user_sign = user["sign"]
+    user_dob = date.fromisoformat(user["dob"])
+    user_name = user["name"]
 
-        planetary_context = format_planetary_context(user_sign, user_dob)
+    try:
+        planetary_context = get_user_sky_context(user_sign, user_dob, user_natal_chart(user)).planetary_context
 
         result = await analyze_screenshot(
-            image_base64=req.image_base64,
+            image=image,
             user_name=user_name,
             user_sign=user_sign,
             planetary_context=planetary_context,
-            context=req.context,
+            context=context,
+            model=route_model("receipts", _is_premium(user)).model,
         )
+    except BaseException as e:
+        # No validated verdict, no charge (also when the client disconnects mid-call)
+        if spent == "daily":
+            refund_receipts_today(user["id"])
+        elif spent == "credit":
+            add_receipts_credit(user["id"], 1)
+        upstream = _upstream_error(e) if isinstance(e, Exception) else None
+        if upstream is not None:
+            raise upstream from e
+        raise
 
-        red_flags = []
-        for rf in result.get("red_flags", []):
-            red_flags.append(RedFlagDetail(
-                flag=rf.get("flag", "Unknown"),
-                severity=rf.get("severity", 5),
-                planetary_cause=rf.get("planetary_cause", "Cosmic mystery"),
-            ))
-
-        return ReceiptsResponse(
-            toxic_score=result.get("toxic_score", 50),
-            red_flags=red_flags,
-            verdict=result.get("verdict", "The cosmos is processing..."),
-            planetary_context=result.get("planetary_context", ""),
-            advice=result.get("advice", "Trust the process."),
-            timestamp_analysis=result.get("timestamp_analysis"),
-            shareable_summary=result.get("shareable_summary", "Analyzed by Aura AI ✦"),
-        )
+    cache_receipt(user["id"], image, context, result)
+
+    return ReceiptsResponse(
+        **result,
+        tokens_used=meter.tokens_used,
+    )
+
+
+@app.post("/api/receipts", response_model=ReceiptsResponse)
+async def receipts_judge(req: ReceiptsRequest):
+    try:
+        user = _require_user(req.user_id)
+
+        # Validate and shrink the screenshot before spending a receipts credit on it
+        try:
+            image = await prepare_base64_screenshot(req.image_base64)
+        except ScreenshotTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except ScreenshotError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        return await _judge_receipts(user, image, req.context)
 
     except HTTPException:
         raise
@@ -217,6 +419,74 @@ async def receipts_judge(req: ReceiptsRequest):
         raise HTTPException(status_code=500, detail=f"Vision disrupted: {str(e)}")
 
 
+# Room for the multipart boundaries and the user_id / context fields
+_UPLOAD_FORM_OVERHEAD_BYTES = 64 * 1024
+
+
+@app.post("/api/receipts/upload", response_model=ReceiptsResponse)
+async def receipts_upload(request: Request, user_id: Optional[str] = None, context: Optional[str] = None):
+    """
+    Receipts Judge without base64: multipart/form-data with an `image` file (plus `user_id`,
+    `context` fields), or the raw image bytes as the body with ?user_id=&context=.
+    The body is streamed to a spooled temp file and cut off past SCREENSHOT_MAX_BYTES.
+    """
+    limit = settings.SCREENSHOT_MAX_BYTES
+    content_type = request.headers.get("content-type", "")
+    is_form = content_type.startswith("multipart/form-data")
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > limit + (_UPLOAD_FORM_OVERHEAD_BYTES if is_form else 0):
+        raise HTTPException(status_code=413, detail="Screenshot too large")
+
+    form = None
+    file = None
+    try:
+        try:
+            if is_form:
+                parser = MultiPartParser(
+                    request.headers,
+                    capped_stream(request.stream(), limit + _UPLOAD_FORM_OVERHEAD_BYTES),
+                    max_files=1,
+                    max_fields=4,
+                )
+                form = await parser.parse()
+                user_id = form.get("user_id") or user_id
+                context = form.get("context") or context
+                upload = form.get("image")
+                if not isinstance(upload, UploadFile):
+                    raise HTTPException(status_code=400, detail="Missing image file")
+                file = upload.file
+            else:
+                if not user_id:
+                    raise HTTPException(status_code=400, detail="Missing user_id")
+                _require_user(user_id)  # Don't read the body for an unknown user
+                file = await spool_upload(request.stream())
+        except ScreenshotTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except MultiPartException as e:
+            raise HTTPException(status_code=400, detail=e.message)
+
+        user = _require_user(user_id)
+        try:
+            image = await prepare_screenshot_file(file)
+        except ScreenshotTooLarge as e:
+            # A file just over the limit fits in the multipart allowance for form overhead
+            raise HTTPException(status_code=413, detail=str(e))
+        except ScreenshotError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        return await _judge_receipts(user, image, context)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Vision disrupted: {str(e)}")
+    finally:
+        if form is not None:
+            await form.close()
+        elif file is not None:
+            file.close()
+
+
 # ═══════════════════════════════════════════════════════════════
 # ROUTE 3: MATCH CHECK (Compatibility)
 # POST /api/match
@@ -225,95 +495,161 @@ async def receipts_judge(req: ReceiptsRequest):
 @app.post("/api/match", response_model=MatchResponse)
 async def match_check(req: MatchRequest):
     try:
-        _require_user(req.user_id)
+        user = _require_user(req.user_id)
+        set_priority(_user_priority(user))
+        start_meter(user["id"], "match")
 
-        result = await check_compatibility(
-            user_sign=req.user_sign.value,
-            crush_sign=req.crush_sign.value,
-            user_name="User",
-        )
-
-        breakdown = result.get("breakdown", {})
-
-        return MatchResponse(
-            overall_score=result.get("overall_score", 65),
-            toxic_level=result.get("toxic_level", "Medium"),
-            verdict=result.get("verdict", "The stars are deliberating..."),
-            element_dynamics=result.get("element_dynamics", ""),
-            breakdown=CompatibilityBreakdown(
-                emotional=breakdown.get("emotional", 60),
-                physical=breakdown.get("physical", 60),
-                intellectual=breakdown.get("intellectual", 60),
-                spiritual=breakdown.get("spiritual", 60),
-            ),
-            advice=result.get("advice", "Proceed with cosmic caution."),
-            shareable_summary=result.get("shareable_summary", "Matched by Aura AI ✦"),
-        )
+        return await get_match(req.user_sign.value, req.crush_sign.value)
 
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Synastry error: {str(e)}")
+        raise _upstream_error(e) or HTTPException(status_code=500, detail=f"Synastry error: {str(e)}")
 
 
 # ═══════════════════════════════════════════════════════════════
 # ROUTE 4: COSMIC BATTERY
 # POST /api/battery
+# POST /api/battery/forecast
 # ═══════════════════════════════════════════════════════════════
 
+def _battery_response(transits, battery) -> BatteryResponse:
+    transit_list = []
+    for t in transits:
+        effect = ""
+        if t.planet == "Moon":
+            effect = "Emotional energy" + (" disrupted" if t.house_from_moon in [6, 8, 12] else " flowing")
+        elif t.planet == "Saturn":
+            effect = "Discipline & karma"
+        elif t.planet == "Jupiter":
+            effect = "Expansion & luck"
+        elif t.planet == "Mars":
+            effect = "Energy & drive"
+        elif t.planet == "Venus":
+            effect = "Love & pleasure"
+        elif t.planet == "Mercury":
+            effect = "Communication" + (" disrupted" if t.is_retrograde else " clear")
+        else:
+            effect = f"Influencing {t.house_from_moon}th house"
+
+        transit_list.append(TransitInfo(
+            planet=t.planet,
+            status="Retrograde" if t.is_retrograde else "Direct",
+            sign=t.sign,
+            house=t.house_from_moon,
+            effect=effect,
+        ))
+
+    remedy = None
+    if battery.percentage < 40:
+        remedy = "Light a ghee diya tonight and chant 'Om' 11 times. Your Moon energy needs grounding."
+
+    return BatteryResponse(
+        percentage=battery.percentage,
+        level=battery.level,
+        message=battery.message,
+        detailed_reason="\n".join(battery.factors),
+        active_transits=transit_list,
+        remedy=remedy,
+    )
+
+
+# Battery responses for all 12 natal Moon signs, per sky snapshot bucket (current + next)
+_battery_boards: Dict[datetime, Dict[str, BatteryResponse]] = {}
+
+
+def _battery_board(snapshot: SkySnapshot) -> Dict[str, BatteryResponse]:
+    board = _battery_boards.get(snapshot.bucket_start)
+    if board is None:
+        board = {
+            sign: _battery_response(snapshot.transits_for_moon_sign(sign), snapshot.battery_for_moon_sign(sign))
+            for sign in SIGNS
+        }
+        # Prune against now, not this snapshot: the refresher builds the upcoming board
+        # while the current one is still being served
+        current = sky_bucket_start(datetime.utcnow())
+        for stale in [k for k in _battery_boards if k < current]:
+            del _battery_boards[stale]
+        _battery_boards[snapshot.bucket_start] = board
+    return board
+
+
 @app.post("/api/battery", response_model=BatteryResponse)
 async def cosmic_battery(req: BatteryRequest):
     try:
         user = _require_user(req.user_id)
-        user_sign = user["sign"]
-        user_dob = date.fromisoformat(user["dob"])
+        return _battery_board(get_sky_snapshot())[user_natal_chart(user).moon_sign]
 
-        battery = calculate_cosmic_battery(user_sign, user_dob)
-        transits = get_current_transits(user_sign, user_dob)
-
-        transit_list = []
-        for t in transits:
-            effect = ""
-            if t.planet == "Moon":
-                effect = "Emotional energy" + (" disrupted" if t.house_from_moon in [6, 8, 12] else " flowing")
-            elif t.planet == "Saturn":
-                effect = "Discipline & karma"
-            elif t.planet == "Jupiter":
-                effect = "Expansion & luck"
-            elif t.planet == "Mars":
-                effect = "Energy & drive"
-            elif t.planet == "Venus":
-                effect = "Love & pleasure"
-            elif t.planet == "Mercury":
-                effect = "Communication" + (" disrupted" if t.is_retrograde else " clear")
-            else:
-                effect = f"Influencing {t.house_from_moon}th house"
-
-            transit_list.append(TransitInfo(
-                planet=t.planet,
-                status="Retrograde" if t.is_retrograde else "Direct",
-                sign=t.sign,
-                house=t.house_from_moon,
-                effect=effect,
-            ))
-
-        remedy = None
-        if battery.percentage < 40:
-            remedy = "Light a ghee diya tonight and chant 'Om' 11 times. Your Moon energy needs grounding."
-
-        return BatteryResponse(
-            percentage=battery.percentage,
-            level=battery.level,
-            message=battery.message,
-            detailed_reason="\n".join(battery.factors),
-            active_transits=transit_list,
-            remedy=remedy,
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Battery error: {str(e)}")
+
+
+@app.post("/api/battery/forecast", response_model=BatteryForecastResponse)
+async def cosmic_battery_forecast(req: BatteryForecastRequest):
+    try:
+        user = _require_user(req.user_id)
+
+        start = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+        step_hours = 24 if req.interval == ForecastInterval.daily else 1
+        forecast = forecast_cosmic_battery(user_natal_chart(user), start, req.days, step_hours)
+
+        return BatteryForecastResponse(
+            interval=req.interval,
+            points=[
+                BatteryForecastPoint(time=t, percentage=b.percentage, level=b.level)
+                for t, b in forecast
+            ],
         )
 
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Battery error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Battery forecast error: {str(e)}")
+
+
+# ═══════════════════════════════════════════════════════════════
+# ROUTE 4b: ASTRO EVENTS (ingresses, nakshatra changes, stations)
+# POST /api/events
+# ═══════════════════════════════════════════════════════════════
+
+@app.post("/api/events", response_model=EventsResponse)
+async def astro_events(req: EventsRequest):
+    planets = [p.capitalize() for p in req.planets] if req.planets else None
+    unknown = [p for p in planets or [] if p not in PLANETS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown planets: {', '.join(unknown)}")
+
+    try:
+        if req.start is None:
+            start = datetime.utcnow()
+        elif req.start.tzinfo is not None:
+            start = req.start.astimezone(timezone.utc).replace(tzinfo=None)
+        else:
+            start = req.start  # Naive times are UTC
+        end = start + timedelta(days=req.days)
+        kinds = [k.value for k in req.kinds] if req.kinds else None
+
+        events = get_events(start, end, planets, kinds)
+
+        return EventsResponse(
+            start=start,
+            end=end,
+            events=[
+                AstroEventInfo(
+                    planet=e.planet,
+                    kind=e.kind,
+                    time=e.time,
+                    from_value=e.from_value,
+                    to_value=e.to_value,
+                )
+                for e in events
+            ],
+        )
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Event engine error: {str(e)}")
 
 
 # ═══════════════════════════════════════════════════════════════
@@ -324,27 +660,37 @@ async def cosmic_battery(req: BatteryRequest):
 @app.post("/api/roast", response_model=RoastResponse)
 async def roast_sign(req: RoastRequest):
     try:
-        user_dob = date(2000, 1, 1)
-        if req.user_id:
-            user = get_user(req.user_id)
-            if user:
-                user_dob = date.fromisoformat(user["dob"])
-
-        planetary_context = format_planetary_context(req.sign.value, user_dob)
-
-        roast = await generate_roast(
-            sign=req.sign.value,
-            planetary_context=planetary_context,
-            context=req.context,
-        )
+        set_priority(Priority.LOW)
+        meter = start_meter(req.user_id, "roast")
+        if not req.context and settings.ROAST_POOL_SIZE > 0:
+            roast = await get_general_roast(req.sign.value)
+        else:
+            user_dob = ANONYMOUS_DOB
+            natal = None
+            if req.user_id:
+                user = get_user(req.user_id)
+                if user:
+                    user_dob = date.fromisoformat(user["dob"])
+                    natal = user_natal_chart(user)
+
+            planetary_context = get_user_sky_context(req.sign.value, user_dob, natal).planetary_context
+
+            roast = await generate_roast(
+                sign=req.sign.value,
+                planetary_context=planetary_context,
+                context=req.context,
+            )
 
         return RoastResponse(
             roast=roast,
             planetary_context=f"Current transits adding extra spice to {req.sign.value.capitalize()}'s energy",
+            tokens_used=meter.tokens_used,
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Roast machine broke: {str(e)}")
+        raise _upstream_error(e) or HTTPException(status_code=500, detail=f"Roast machine broke: {str(e)}")
 
 
 # ═══════════════════════════════════════════════════════════════
@@ -356,28 +702,27 @@ async def roast_sign(req: RoastRequest):
 async def get_remedy(req: RemedyRequest):
     try:
         user = _require_user(req.user_id)
+        set_priority(_user_priority(user))
+        meter = start_meter(user["id"], "remedy")
         user_dob = date.fromisoformat(user["dob"])
-        planetary_context = format_planetary_context(req.sign.value, user_dob)
+        planetary_context = get_user_sky_context(req.sign.value, user_dob, user_natal_chart(user)).planetary_context
 
         result = await generate_remedy(
             sign=req.sign.value,
             planetary_context=planetary_context,
             concern=req.concern,
+            model=route_model("remedy", _is_premium(user)).model,
         )
 
         return RemedyResponse(
-            title=result.get("title", "Daily Upay"),
-            description=result.get("description", ""),
-            icon=result.get("icon", "🪔"),
-            for_concern=result.get("for_concern", "general"),
-            planetary_basis=result.get("planetary_basis", ""),
-            timing=result.get("timing", "Today"),
+            **result,
+            tokens_used=meter.tokens_used,
         )
 
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Remedy error: {str(e)}")
+        raise _upstream_error(e) or HTTPException(status_code=500, detail=f"Remedy error: {str(e)}")
 
 
 # ═══════════════════════════════════════════════════════════════
@@ -394,6 +739,8 @@ async def create_user_route(req: UserCreate):
             dob=req.dob.isoformat(),
             birth_time=req.birth_time.isoformat() if req.birth_time else None,
             birth_place=req.birth_place,
+            # Persisted only from an accurate ephemeris; otherwise computed per request
+            natal=natal_columns(get_natal_chart(req.dob)),
         )
 
         return {
@@ -426,8 +773,8 @@ async def _razorpay_create_order(amount: int, currency: str = "INR") -> dict:
         "payment_capture": 1,
     }
 
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        resp = await client.post(url, auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET), json=payload)
+    client = get_client("razorpay")
+    resp = await client.post(url, auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET), json=payload)
 
     if resp.status_code >= 400:
         raise HTTPException(status_code=502, detail=f"Razorpay error: {resp.text}")
@@ -494,21 +841,186 @@ async def verify_payment(req: VerifyPaymentRequest):
     return {"status": "verified", "message": "Payment verified. Feature unlocked! ✦"}
 
 
+# ═══════════════════════════════════════════════════════════════
+# BACKGROUND SKY REFRESHER
+# ═══════════════════════════════════════════════════════════════
+
+_sky_refresher_task: Optional[asyncio.Task] = None
+
+
+async def _refresh_sky_forever():
+    """Build the current and next snapshot + battery board before requests need them."""
+    bucket = timedelta(seconds=max(1, settings.SKY_SNAPSHOT_BUCKET_SECONDS))
+    while True:
+        try:
+            current = await asyncio.to_thread(get_sky_snapshot)
+            _battery_board(current)
+            upcoming = await asyncio.to_thread(get_sky_snapshot, current.bucket_start + bucket)
+            _battery_board(upcoming)
+            delay = (upcoming.bucket_start - datetime.utcnow()).total_seconds()
+        except Exception as e:
+            print(f"✦ Sky refresher error: {e}")
+            delay = 30
+        await asyncio.sleep(max(1.0, delay))
+
+
+# ═══════════════════════════════════════════════════════════════
+# ADMIN: TOKEN USAGE
+# GET /api/admin/usage
+# ═══════════════════════════════════════════════════════════════
+
+def _require_admin(key: Optional[str]) -> None:
+    if not settings.ADMIN_API_KEY or not key or not hmac.compare_digest(key, settings.ADMIN_API_KEY):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+
+def _add_totals(totals: UsageTotals, row: dict) -> None:
+    for name in UsageTotals.model_fields:
+        setattr(totals, name, getattr(totals, name) + int(row.get(name) or 0))
+
+
+@app.get("/api/admin/usage", response_model=UsageReportResponse)
+async def usage_report(days: int = 7, x_admin_key: Optional[str] = Header(default=None)):
+    """Gemini token usage for the last `days` UTC days, by feature, model, day and user."""
+    _require_admin(x_admin_key)
+    try:
+        await asyncio.to_thread(flush_usage)
+        since = datetime.utcnow().date() - timedelta(days=max(1, days) - 1)
+        rows = await asyncio.to_thread(get_usage, since.isoformat())
+
+        totals = UsageTotals()
+        by_feature: Dict[str, UsageTotals] = {}
+        by_model: Dict[str, UsageTotals] = {}
+        by_day: Dict[str, UsageTotals] = {}
+        by_user: Dict[str, UserUsage] = {}
+        for row in rows:
+            _add_totals(totals, row)
+            _add_totals(by_feature.setdefault(row["feature"], UsageTotals()), row)
+            _add_totals(by_model.setdefault(row["model"], UsageTotals()), row)
+            _add_totals(by_day.setdefault(str(row["day"]), UsageTotals()), row)
+            if row["user_id"]:
+                _add_totals(by_user.setdefault(row["user_id"], UserUsage(user_id=row["user_id"])), row)
+
+        top_users = sorted(by_user.values(), key=lambda u: u.total_tokens, reverse=True)[:20]
+        return UsageReportResponse(
+            since=since,
+            totals=totals,
+            by_feature=by_feature,
+            by_model=by_model,
+            by_day=dict(sorted(by_day.items())),
+            top_users=top_users,
+        )
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Usage report error: {str(e)}")
+
+
+# ═══════════════════════════════════════════════════════════════
+# BACKGROUND USAGE FLUSH
+# ═══════════════════════════════════════════════════════════════
+
+_usage_flush_task: Optional[asyncio.Task] = None
+
+
+async def _flush_usage_forever():
+    """Write buffered token usage to storage every USAGE_FLUSH_SECONDS."""
+    while True:
+        await asyncio.sleep(max(1.0, settings.USAGE_FLUSH_SECONDS))
+        try:
+            await asyncio.to_thread(flush_usage)
+        except Exception as e:
+            print(f"✦ Usage flush error: {e}")
+
+
+# ═══════════════════════════════════════════════════════════════
+# BACKGROUND ROAST POOL
+# ═══════════════════════════════════════════════════════════════
+
+_roast_pool_task: Optional[asyncio.Task] = None
+
+
+async def _refresh_roasts_forever():
+    """Fill each UTC day's roast pool shortly after midnight (and once at startup)."""
+    set_priority(Priority.LOW)
+    start_meter(None, "roast_pool")
+    while True:
+        try:
+            generated = await fill_pool()
+            if generated:
+                print(f"✦ Roast pool: generated {generated} roasts")
+        except Exception as e:
+            print(f"✦ Roast pool error: {e}")
+        now = datetime.utcnow()
+        next_day = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+        await asyncio.sleep(max(60.0, (next_day - now).total_seconds() + 60))
+
+
+# ═══════════════════════════════════════════════════════════════
+# BACKGROUND CHAT SESSION PRUNE
+# ═══════════════════════════════════════════════════════════════
+
+_chat_prune_task: Optional[asyncio.Task] = None
+
+
+async def _prune_chat_sessions_forever():
+    """Delete chat sessions idle for CHAT_SESSION_RETENTION_DAYS, at startup and then daily."""
+    while True:
+        try:
+            cutoff = datetime.utcnow() - timedelta(days=settings.CHAT_SESSION_RETENTION_DAYS)
+            pruned = await asyncio.to_thread(prune_chat_sessions, cutoff.isoformat())
+            if pruned:
+                print(f"✦ Chat sessions: pruned {pruned} idle sessions")
+        except Exception as e:
+            print(f"✦ Chat session prune error: {e}")
+        await asyncio.sleep(24 * 3600)
+
+
 # ═══════════════════════════════════════════════════════════════
 # STARTUP / SHUTDOWN
 # ═══════════════════════════════════════════════════════════════
 
 @app.on_event("startup")
 async def startup():
+    global _sky_refresher_task, _roast_pool_task, _usage_flush_task, _chat_prune_task
     init_db(settings.DB_PATH)
+    init_cache_db(settings.CACHE_DB_PATH)
+    await open_clients()
+    _sky_refresher_task = asyncio.create_task(_refresh_sky_forever())
+    _usage_flush_task = asyncio.create_task(_flush_usage_forever())
+    if settings.CHAT_SESSION_RETENTION_DAYS > 0:
+        _chat_prune_task = asyncio.create_task(_prune_chat_sessions_forever())
+    if settings.ROAST_POOL_SIZE > 0 and settings.GEMINI_API_KEY:
+        _roast_pool_task = asyncio.create_task(_refresh_roasts_forever())
     print("✦ Aura AI Backend starting...")
     print(f"  Gemini Flash: {settings.GEMINI_MODEL_FLASH}")
     print(f"  Gemini Pro:   {settings.GEMINI_MODEL_PRO}")
     print(f"  API Key:      {'configured' if settings.GEMINI_API_KEY else 'MISSING!'}")
     print(f"  DB Path:      {settings.DB_PATH}")
+    print(f"  Cache DB:     {settings.CACHE_DB_PATH}")
+    print(f"  HTTP/2:       {'enabled' if HTTP2_AVAILABLE else 'unavailable (install h2)'}")
+    table = table_status()
+    if table["active"]:
+        print(f"  Ephemeris:    table {table['covers'][0]} → {table['covers'][1]}")
+    else:
+        fallback = "Swiss Ephemeris" if SWE_AVAILABLE else "MEAN-MOTION APPROXIMATION (inaccurate)"
+        print(f"  Ephemeris:    {fallback}; table {table['detail']}")
     print("✦ The cosmos is online.")
 
 
 @app.on_event("shutdown")
 async def shutdown():
+    if _sky_refresher_task:
+        _sky_refresher_task.cancel()
+    if _roast_pool_task:
+        _roast_pool_task.cancel()
+    if _usage_flush_task:
+        _usage_flush_task.cancel()
+    if _chat_prune_task:
+        _chat_prune_task.cancel()
+    try:
+        flush_usage()
+    except Exception as e:
+        print(f"✦ Usage flush error: {e}")
+    shutdown_executor()
+    await close_clients()
     print("✦ Aura AI Backend shutting down. The stars remain.")
@@ -0,0 +1,178 @@
+# match_cache.py — Cached compatibility results for the 144 sign pairs
+# The match prompt has no user-specific data, so each (user_sign, crush_sign) pair keeps a
+# small pool of parsed variants in cache_db. Variants expire after MATCH_CACHE_TTL_HOURS
+# and are regenerated on demand, one request per pair at a time (concurrent cold requests
+# would otherwise coalesce into one Gemini call and store identical "variants").
+# MATCH_CACHE_VARIANTS=0 disables the cache. Pre-generate every pair with:  python match_cache.py
+
+import argparse
+import asyncio
+import random
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from config import settings
+from schemas import ZodiacSign, MatchResponse, CompatibilityBreakdown
+from cache_db import init_cache_db, get_match_variants, add_match_variant, prune_match_variants
+from gemini_client import generate_compatibility
+
+SIGN_VALUES = [s.value for s in ZodiacSign]
+
+# In-process mirror of cache_db, so hits never touch SQLite
+_pools: Dict[Tuple[str, str], List[Tuple[datetime, MatchResponse]]] = {}
+_pools_lock = threading.Lock()
+# One generator per pair; other requests for the pair wait and re-read the pool
+_generate_locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+
+
+def _generate_lock(pair: Tuple[str, str]) -> asyncio.Lock:
+    return _generate_locks.setdefault(pair, asyncio.Lock())
+
+
+def match_response_from_result(result: Dict) -> MatchResponse:
+    breakdown = result.get("breakdown", {})
+
+    return MatchResponse(
+        overall_score=result.get("overall_score", 65),
+        toxic_level=result.get("toxic_level", "Medium"),
+        verdict=result.get("verdict", "The stars are deliberating..."),
+        element_dynamics=result.get("element_dynamics", ""),
+        breakdown=CompatibilityBreakdown(
+            emotional=breakdown.get("emotional", 60),
+            physical=breakdown.get("physical", 60),
+            intellectual=breakdown.get("intellectual", 60),
+            spiritual=breakdown.get("spiritual", 60),
+        ),
+        advice=result.get("advice", "Proceed with cosmic caution."),
+        shareable_summary=result.get("shareable_summary", "Matched by Aura AI ✦"),
+    )
+
+
+def _ttl() -> timedelta:
+    return timedelta(hours=settings.MATCH_CACHE_TTL_HOURS)
+
+
+def _fresh_variants(pair: Tuple[str, str], now: datetime) -> List[MatchResponse]:
+    cutoff = now - _ttl()
+    with _pools_lock:
+        pool = _pools.get(pair)
+    if pool is None:
+        pool = []
+        for created_at, payload in get_match_variants(*pair, cutoff):
+            try:
+                pool.append((created_at, match_response_from_result(payload)))
+            except (ValueError, AttributeError):
+                continue  # Stored before a schema change; let it be replaced
+        with _pools_lock:
+            _pools[pair] = pool
+    return [response for created_at, response in pool if created_at >= cutoff]
+
+
+def _store_variant(pair: Tuple[str, str], result: Dict, response: MatchResponse, now: datetime) -> None:
+    add_match_variant(*pair, result, now)
+    cutoff = now - _ttl()
+    with _pools_lock:
+        pool = [v for v in _pools.get(pair, []) if v[0] >= cutoff]
+        pool.append((now, response))
+        _pools[pair] = pool
+
+
+async def _generate_variant(pair: Tuple[str, str], now: datetime) -> MatchResponse:
+    """Generate, validate and store one variant (StructuredOutputError if the output never validated)."""
+    result = await generate_compatibility(*pair)
+    response = match_response_from_result(result)
+    await asyncio.to_thread(_store_variant, pair, result, response, now)
+    return response
+
+
+async def get_match(user_sign: str, crush_sign: str) -> MatchResponse:
+    """
+    Serve a cached variant once the pair's pool is full; otherwise generate a new one.
+    Falls back to a cached variant if generation fails; with none cached, the error is raised.
+    """
+    pair = (user_sign.lower(), crush_sign.lower())
+    if settings.MATCH_CACHE_VARIANTS <= 0:
+        return match_response_from_result(await generate_compatibility(*pair))
+
+    now = datetime.utcnow()
+    if pair in _pools:
+        variants = _fresh_variants(pair, now)
+    else:
+        variants = await asyncio.to_thread(_fresh_variants, pair, now)  # First access reads SQLite
+    if len(variants) >= settings.MATCH_CACHE_VARIANTS:
+        return random.choice(variants)
+
+    async with _generate_lock(pair):
+        fresh = _fresh_variants(pair, datetime.utcnow())
+        if len(fresh) > len(variants) or len(fresh) >= settings.MATCH_CACHE_VARIANTS:
+            return random.choice(fresh)  # Generated while we waited for the lock
+        variants = fresh
+        try:
+            return await _generate_variant(pair, now)
+        except Exception as e:
+            if not variants:
+                raise
+            print(f"✦ Match {pair[0]}/{pair[1]}: serving a cached variant after: {e}")
+    return random.choice(variants)
+
+
+def prune_expired() -> int:
+    """Drop expired variants from disk and memory. Returns the number of rows removed."""
+    cutoff = datetime.utcnow() - _ttl()
+    with _pools_lock:
+        _pools.clear()
+    return prune_match_variants(cutoff)
+
+
+# ═══════════════════════════════════════════════════════════════
+# WARM-UP
+# ═══════════════════════════════════════════════════════════════
+
+async def warm_up(concurrency: int = 4) -> int:
+    """Top up every pair to MATCH_CACHE_VARIANTS fresh variants. Returns variants generated."""
+    from http_pool import open_clients, close_clients
+    from usage import start_meter
+
+    start_meter(None, "match_cache")
+    prune_expired()
+    semaphore = asyncio.Semaphore(concurrency)
+    generated = 0
+
+    async def fill(pair: Tuple[str, str]) -> None:
+        nonlocal generated
+        missing = settings.MATCH_CACHE_VARIANTS - len(_fresh_variants(pair, datetime.utcnow()))
+        for _ in range(missing):
+            async with semaphore, _generate_lock(pair):
+                try:
+                    await _generate_variant(pair, datetime.utcnow())
+                except Exception as e:
+                    print(f"  {pair[0]} × {pair[1]}: {e}")
+                    return
+            generated += 1
+
+    await open_clients()
+    try:
+        await asyncio.gather(*(fill((a, b)) for a in SIGN_VALUES for b in SIGN_VALUES))
+    finally:
+        await close_clients()
+    return generated
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Pre-generate cached compatibility results for all sign pairs.")
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    from storage import init_db
+    from usage import flush_usage
+
+    init_db(settings.DB_PATH)
+    init_cache_db(settings.CACHE_DB_PATH)
+    count = asyncio.run(warm_up(args.concurrency))
+    flush_usage()
+    print(f"✦ Generated {count} match variants into {settings.CACHE_DB_PATH}")
+
+
+if __name__ == "__main__":
+    main()
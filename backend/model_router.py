@@ -0,0 +1,92 @@
+# model_router.py — Per-call Flash/Pro choice for features that default to Pro
+# Guru chat, receipts and remedies go to Pro unless the policy moves a free-tier call to Flash:
+#   pro_budget   — this process has spent ROUTER_PRO_DAILY_TOKENS on Pro today (chat, remedy)
+#   pro_errors   — Pro's recent error rate is above ROUTER_PRO_MAX_ERROR_RATE
+#   pro_slow     — Pro's upstream p95 (limiter queueing excluded) is above
+#                  ROUTER_PRO_SLOW_P95_SECONDS: remedies and Guru messages up to
+#                  ROUTER_SHORT_MESSAGE_CHARS move; long questions stay
+# Premium users always get Pro. ROUTER_PRO_PROBE_RATE of would-be downgrades still go to Pro
+# so its latency/error signal stays fresh. Every decision is counted; downgrades are logged.
+
+import random
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict
+
+from config import settings
+from resilience import health
+from usage import tokens_today
+
+PRO_FEATURES = ("chat_guru", "receipts", "remedy")
+
+_decisions: Counter = Counter()
+_decisions_lock = threading.Lock()
+
+
+@dataclass
+class RouteDecision:
+    feature: str
+    model: str
+    reason: str
+
+
+def _downgrade_reason(feature: str, message: str) -> str:
+    """Why a free-tier call should leave Pro, or "" to stay."""
+    pro = settings.GEMINI_MODEL_PRO
+    state = health(pro)
+
+    budget = settings.ROUTER_PRO_DAILY_TOKENS
+    if budget > 0 and feature != "receipts" and tokens_today(pro) >= budget:
+        return "pro_budget"
+
+    error_rate = state.error_rate()
+    if error_rate is not None and error_rate > settings.ROUTER_PRO_MAX_ERROR_RATE:
+        return "pro_errors"
+
+    p95 = state.p95()
+    if p95 is not None and p95 > settings.ROUTER_PRO_SLOW_P95_SECONDS:
+        if feature == "remedy":
+            return "pro_slow"
+        if feature == "chat_guru" and len(message) <= settings.ROUTER_SHORT_MESSAGE_CHARS:
+            return "pro_slow"
+    return ""
+
+
+def route_model(feature: str, premium: bool = False, message: str = "") -> RouteDecision:
+    """Model for one call of a Pro-default feature (see PRO_FEATURES)."""
+    pro, flash = settings.GEMINI_MODEL_PRO, settings.GEMINI_MODEL_FLASH
+    if not settings.MODEL_ROUTER_ENABLED:
+        decision = RouteDecision(feature, pro, "router_off")
+    elif premium:
+        decision = RouteDecision(feature, pro, "premium")
+    else:
+        reason = _downgrade_reason(feature, message)
+        if not reason:
+            decision = RouteDecision(feature, pro, "default")
+        elif random.random() < settings.ROUTER_PRO_PROBE_RATE:
+            decision = RouteDecision(feature, pro, f"probe:{reason}")
+        else:
+            decision = RouteDecision(feature, flash, reason)
+
+    with _decisions_lock:
+        _decisions[(decision.feature, decision.model, decision.reason)] += 1
+    if decision.model != pro:
+        state = health(pro)
+        p95, error_rate = state.p95(), state.error_rate()
+        print(
+            f"✦ Router: {feature} → {decision.model} ({decision.reason}; "
+            f"pro p95={'-' if p95 is None else f'{p95:.1f}s'}, "
+            f"errors={'-' if error_rate is None else f'{error_rate:.0%}'}, "
+            f"tokens today={tokens_today(pro)})"
+        )
+    return decision
+
+
+def router_stats() -> Dict[str, Dict[str, int]]:
+    """Decision counts per feature, as {"model/reason": count}."""
+    out: Dict[str, Dict[str, int]] = {}
+    with _decisions_lock:
+        for (feature, model, reason), count in sorted(_decisions.items()):
+            out.setdefault(feature, {})[f"{model}/{reason}"] = count
+    return out
@@ -0,0 +1,54 @@
+# receipts_cache.py — Content-addressed cache of Receipts Judge analyses
+# Key: sha256 of the prepared screenshot bytes + normalized context + UTC day + user
+# (analyses are personalised with the user's name and transits, so entries are per user).
+# Repeats are served from cache_db without a Gemini call or a receipts credit.
+# With RECEIPTS_CACHE_PHASH_DISTANCE > 0, near-duplicates (same user, day and context,
+# perceptual hash within that many bits) also hit. Size-bounded by LRU eviction.
+
+import hashlib
+from datetime import date, datetime
+from typing import Any, Dict, Optional
+
+from config import settings
+from cache_db import get_receipt, get_receipt_candidates, add_receipt, evict_receipts
+from screenshots import PreparedImage, phash_distance
+
+
+def _today() -> date:
+    return datetime.utcnow().date()
+
+
+def _context_key(context: Optional[str]) -> str:
+    return " ".join((context or "").lower().split())
+
+
+def cache_key(user_id: str, image: PreparedImage, context: Optional[str], day: date) -> str:
+    raw = "\0".join([user_id, day.isoformat(), _context_key(context), image.digest])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def get_cached_receipt(user_id: str, image: PreparedImage, context: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Cached analysis for this screenshot, or None."""
+    if settings.RECEIPTS_CACHE_MAX_ENTRIES <= 0:
+        return None
+    day = _today()
+    hit = get_receipt(cache_key(user_id, image, context, day))
+    if hit is not None or settings.RECEIPTS_CACHE_PHASH_DISTANCE <= 0 or not image.phash:
+        return hit
+
+    best_key, best_distance = None, settings.RECEIPTS_CACHE_PHASH_DISTANCE + 1
+    for key, phash in get_receipt_candidates(user_id, day, _context_key(context)):
+        distance = phash_distance(image.phash, phash)
+        if distance < best_distance:
+            best_key, best_distance = key, distance
+    return get_receipt(best_key) if best_key else None
+
+
+def cache_receipt(user_id: str, image: PreparedImage, context: Optional[str], analysis: Dict[str, Any]) -> None:
+    if settings.RECEIPTS_CACHE_MAX_ENTRIES <= 0:
+        return
+    day = _today()
+    add_receipt(
+        cache_key(user_id, image, context, day), user_id, day, _context_key(context), image.phash, analysis
+    )
+    evict_receipts(settings.RECEIPTS_CACHE_MAX_ENTRIES, before=day)
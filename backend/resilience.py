@@ -0,0 +1,270 @@
+# resilience.py — Retries, hedging, circuit breaking and model fallback for Gemini
+# Every upstream call goes through call_with_resilience():
+#   retries     — bounded, full-jitter exponential backoff on 408/429/5xx and transport errors
+#   hedging     — optional second request once the first exceeds the model's observed p95
+#                 (timed from when the attempt gets a limiter slot, not while it queues)
+#   breaker     — per model; opens after consecutive failures, probes again after a cool-down
+#   fallback    — Pro requests move to Flash while Pro is failing or its breaker is open
+
+import asyncio
+import random
+import time
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple, TypeVar
+
+import httpx
+
+from config import settings
+
+T = TypeVar("T")
+
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+# Latency samples kept per model, and how many are needed before hedging kicks in
+_LATENCY_WINDOW = 200
+_HEDGE_MIN_SAMPLES = 20
+# Recent call outcomes kept per model for the error rate, and the minimum to report one
+_OUTCOME_WINDOW = 100
+_ERROR_RATE_MIN_SAMPLES = 10
+
+
+class GeminiHTTPError(RuntimeError):
+    """Non-2xx response from Gemini."""
+
+    def __init__(self, status_code: int, body: str, retry_after: Optional[float] = None):
+        super().__init__(f"Gemini API error {status_code}: {body}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        return self.status_code in RETRYABLE_STATUSES
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling upstream while a model's breaker is open."""
+
+
+def http_error(resp: httpx.Response, body: str) -> GeminiHTTPError:
+    retry_after = None
+    try:
+        retry_after = float(resp.headers.get("retry-after", ""))
+    except ValueError:
+        pass
+    return GeminiHTTPError(resp.status_code, body, retry_after)
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, GeminiHTTPError):
+        return exc.retryable
+    return isinstance(exc, httpx.TransportError)  # Includes timeouts
+
+
+# ═══════════════════════════════════════════════════════════════
+# CIRCUIT BREAKER + LATENCY
+# ═══════════════════════════════════════════════════════════════
+
+@dataclass
+class ModelHealth:
+    failures: int = 0                # Consecutive retryable failures
+    opened_at: Optional[float] = None
+    probing: bool = False            # Half-open: one trial request in flight
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=_LATENCY_WINDOW))
+    outcomes: Deque[bool] = field(default_factory=lambda: deque(maxlen=_OUTCOME_WINDOW))  # True = failed
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if time.monotonic() - self.opened_at < settings.GEMINI_BREAKER_RESET_SECONDS:
+            return False
+        if self.probing:
+            return False
+        self.probing = True
+        return True
+
+    def record_success(self, latency: Optional[float] = None) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.outcomes.append(False)
+        if latency is not None:
+            self.latencies.append(latency)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.outcomes.append(True)
+        if self.probing or self.failures >= settings.GEMINI_BREAKER_FAILURES:
+            self.opened_at = time.monotonic()
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if self.probing else "open"
+
+    def p95(self) -> Optional[float]:
+        if len(self.latencies) < _HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def error_rate(self) -> Optional[float]:
+        """Share of recent attempts that failed with a retryable error."""
+        if len(self.outcomes) < _ERROR_RATE_MIN_SAMPLES:
+            return None
+        return sum(self.outcomes) / len(self.outcomes)
+
+
+_health: Dict[str, ModelHealth] = {}
+
+
+def health(model: str) -> ModelHealth:
+    return _health.setdefault(model, ModelHealth())
+
+
+def breaker_states() -> Dict[str, str]:
+    return {model: h.state for model, h in _health.items()}
+
+
+def model_chain(model: str) -> List[str]:
+    """Models to try in order: Pro falls back to Flash when enabled."""
+    if settings.GEMINI_PRO_FALLBACK and model == settings.GEMINI_MODEL_PRO:
+        return [model, settings.GEMINI_MODEL_FLASH]
+    return [model]
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Full-jitter exponential backoff, honouring Retry-After up to the max delay."""
+    cap = settings.GEMINI_RETRY_MAX_DELAY
+    if retry_after is not None:
+        return min(cap, retry_after)
+    return random.uniform(0, min(cap, settings.GEMINI_RETRY_BASE_DELAY * (2 ** attempt)))
+
+
+# ═══════════════════════════════════════════════════════════════
+# CALLS
+# ═══════════════════════════════════════════════════════════════
+
+@dataclass
+class AttemptTiming:
+    """Upstream timing of one attempt, reported by the code holding the limiter slot."""
+    started: asyncio.Event = field(default_factory=asyncio.Event)  # Slot granted, request sent
+    latency: Optional[float] = None                                 # Upstream seconds, no queueing
+
+
+_attempt: ContextVar[Optional[AttemptTiming]] = ContextVar("gemini_attempt", default=None)
+
+
+def upstream_started() -> None:
+    """Mark the current attempt as sent (called once a limiter slot is held)."""
+    timing = _attempt.get()
+    if timing is not None:
+        timing.started.set()
+
+
+def upstream_finished(latency: float) -> None:
+    """Add one upstream round trip to the current attempt's latency."""
+    timing = _attempt.get()
+    if timing is not None:
+        timing.latency = (timing.latency or 0.0) + latency
+
+
+async def _run_attempt(model: str, attempt_fn: Callable[[str], Awaitable[T]], timing: AttemptTiming) -> T:
+    _attempt.set(timing)  # Each attempt runs in its own task, so this stays local to it
+    return await attempt_fn(model)
+
+
+async def _hedged(
+    model: str, attempt_fn: Callable[[str], Awaitable[T]], hedge: bool
+) -> Tuple[T, AttemptTiming]:
+    """
+    Run attempt_fn; if it outlives the model's p95 once upstream, race a second copy
+    against it. Returns the winning result and that attempt's timing.
+    """
+    threshold = health(model).p95() if hedge and settings.GEMINI_HEDGE_ENABLED else None
+    timings: Dict[asyncio.Future, AttemptTiming] = {}
+
+    def start() -> asyncio.Future:
+        timing = AttemptTiming()
+        task = asyncio.ensure_future(_run_attempt(model, attempt_fn, timing))
+        timings[task] = timing
+        return task
+
+    first = start()
+    if threshold is None:
+        return await first, timings[first]
+
+    delay = max(settings.GEMINI_HEDGE_MIN_DELAY, threshold)
+    pending = {first}
+    try:
+        # Queue time in the limiter doesn't count toward the hedge delay
+        sent = asyncio.ensure_future(timings[first].started.wait())
+        try:
+            await asyncio.wait({first, sent}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            sent.cancel()
+
+        done, pending = await asyncio.wait(pending, timeout=delay)
+        if not done:
+            pending = {first, start()}
+        error: Optional[BaseException] = None
+        while True:
+            for task in done:
+                if task.exception() is None:
+                    return task.result(), timings[task]
+                error = task.exception()
+            if not pending:
+                raise error
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        # Losers, and everything if the caller was cancelled: don't leak requests or slots
+        for task in pending:
+            task.cancel()
+
+
+async def call_with_resilience(
+    model: str,
+    attempt_fn: Callable[[str], Awaitable[T]],
+    hedge: bool = True,
+) -> T:
+    """
+    Call attempt_fn(model) with retries, hedging and the breaker, falling back along
+    model_chain(model). Non-retryable errors (e.g. 400) are raised immediately.
+    The p95 only sees upstream latency reported via upstream_finished() (limiter queueing
+    excluded); hedge=False (e.g. when opening a stream) keeps the attempt out of it.
+    """
+    last_error: Optional[BaseException] = None
+
+    for candidate in model_chain(model):
+        state = health(candidate)
+        for attempt in range(settings.GEMINI_MAX_RETRIES + 1):
+            if not state.allow():
+                last_error = last_error or CircuitOpenError(f"Circuit open for {candidate}")
+                break
+            is_probe = state.opened_at is not None  # allow() let this call through half-open
+
+            try:
+                result, timing = await _hedged(candidate, attempt_fn, hedge)
+            except Exception as e:
+                if not is_retryable(e):
+                    if is_probe:
+                        state.probing = False
+                    raise
+                state.record_failure()
+                last_error = e
+                if attempt < settings.GEMINI_MAX_RETRIES:
+                    await asyncio.sleep(backoff_delay(attempt, getattr(e, "retry_after", None)))
+                continue
+            except BaseException:
+                # Cancelled (e.g. client disconnect): free the half-open slot for the next probe
+                if is_probe:
+                    state.probing = False
+                raise
+
+            state.record_success(timing.latency if hedge else None)
+            return result
+
+    raise last_error or CircuitOpenError(f"Circuit open for {model}")
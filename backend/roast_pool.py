@@ -0,0 +1,138 @@
+# roast_pool.py — Pre-generated daily roasts per sign
+# The default roast prompt only varies by sign and the day's sky, so a background job
+# fills ROAST_POOL_SIZE roasts per sign per UTC day and /api/roast serves random picks.
+# Custom contexts still go to Gemini live. Generation is one at a time per sign, so
+# concurrent callers never pool the same (coalesced) roast twice.
+# Fill today's pool by hand with:  python roast_pool.py
+
+import argparse
+import asyncio
+import random
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from config import settings
+from schemas import ZodiacSign
+from astro_engine import get_user_sky_context
+from cache_db import init_cache_db, get_roasts, add_roast, prune_roasts
+from gemini_client import generate_roast
+
+SIGN_VALUES = [s.value for s in ZodiacSign]
+
+# Birth date used for roasts without a user (and for the shared pool)
+ANONYMOUS_DOB = date(2000, 1, 1)
+
+# In-process mirror of cache_db, keyed by (sign, UTC day)
+_pools: Dict[Tuple[str, date], List[str]] = {}
+_pools_lock = threading.Lock()
+# One generator per (sign, day); the lazy fill and the background fill share it
+_generate_locks: Dict[Tuple[str, date], asyncio.Lock] = {}
+
+
+def _today() -> date:
+    return datetime.utcnow().date()
+
+
+def _generate_lock(sign: str, day: date) -> asyncio.Lock:
+    return _generate_locks.setdefault((sign, day), asyncio.Lock())
+
+
+def _pool(sign: str, day: date, reload: bool = False) -> List[str]:
+    key = (sign, day)
+    with _pools_lock:
+        roasts = None if reload else _pools.get(key)
+    if roasts is None:
+        roasts = get_roasts(sign, day)
+        with _pools_lock:
+            _pools[key] = roasts
+    return roasts
+
+
+async def _generate_pooled(sign: str, day: date) -> Optional[str]:
+    """Generate one general roast for today's sky and add it to the pool."""
+    planetary_context = get_user_sky_context(sign, ANONYMOUS_DOB).planetary_context
+    roast = (await generate_roast(sign=sign, planetary_context=planetary_context)).strip()
+    # An empty or blocked response comes back as the raw JSON payload; never pool it
+    if not roast or roast.startswith("{"):
+        return None
+    add_roast(sign, day, roast)
+    with _pools_lock:
+        _pools.setdefault((sign, day), []).append(roast)
+    return roast
+
+
+async def get_general_roast(sign: str) -> str:
+    """Random roast from today's pool; generated live (and pooled) while the pool is empty."""
+    day = _today()
+    roasts = _pool(sign, day)
+    if roasts:
+        return random.choice(roasts)
+    async with _generate_lock(sign, day):
+        roasts = _pool(sign, day)
+        if roasts:
+            return random.choice(roasts)  # Filled while we waited for the lock
+        roast = await _generate_pooled(sign, day)
+    if roast is not None:
+        return roast
+    planetary_context = get_user_sky_context(sign, ANONYMOUS_DOB).planetary_context
+    return await generate_roast(sign=sign, planetary_context=planetary_context)
+
+
+async def fill_pool(day: Optional[date] = None, concurrency: int = 4) -> int:
+    """Top up every sign to ROAST_POOL_SIZE roasts for the day. Returns roasts generated."""
+    day = day or _today()
+    prune_roasts(day - timedelta(days=1))
+    with _pools_lock:
+        for key in [k for k in _pools if k[1] < day]:
+            del _pools[key]
+    for key in [k for k in _generate_locks if k[1] < day]:
+        del _generate_locks[key]
+
+    semaphore = asyncio.Semaphore(concurrency)
+    generated = 0
+
+    async def fill(sign: str) -> None:
+        nonlocal generated
+        # Re-read from disk: another worker may already have filled this sign
+        missing = settings.ROAST_POOL_SIZE - len(_pool(sign, day, reload=True))
+        for _ in range(missing):
+            async with semaphore, _generate_lock(sign, day):
+                try:
+                    roast = await _generate_pooled(sign, day)
+                except Exception as e:
+                    print(f"  Roast pool {sign}: {e}")
+                    return
+            if roast is not None:
+                generated += 1
+
+    await asyncio.gather(*(fill(sign) for sign in SIGN_VALUES))
+    return generated
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Fill today's roast pool for every sign.")
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    from http_pool import open_clients, close_clients
+    from storage import init_db
+    from usage import start_meter, flush_usage
+
+    async def run() -> int:
+        start_meter(None, "roast_pool")
+        await open_clients()
+        try:
+            return await fill_pool(concurrency=args.concurrency)
+        finally:
+            await close_clients()
+
+    init_db(settings.DB_PATH)
+    init_cache_db(settings.CACHE_DB_PATH)
+    count = asyncio.run(run())
+    flush_usage()
+    print(f"✦ Generated {count} roasts into {settings.CACHE_DB_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 # schemas.py — Pydantic models for Aura AI API
 
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Dict, Optional, List
 from datetime import datetime, date, time
 from enum import Enum
 
@@ -69,7 +69,8 @@ class ChatRequest(BaseModel):
     user_id: str
     message: str = Field(..., min_length=1, max_length=2000)
     mode: ChatMode = ChatMode.bestie
-    conversation_history: Optional[List[dict]] = Field(default_factory=list)  # [{role, content}]
+    session_id: Optional[str] = None  # Server-side history; omit (with no history) to start one
+    conversation_history: Optional[List[dict]] = Field(default_factory=list)  # Legacy: [{role, content}]
 
 
 class ChatResponse(BaseModel):
@@ -78,6 +79,7 @@ class ChatResponse(BaseModel):
     planetary_context: Optional[str] = None  # Current transit summary
     tokens_used: Optional[int] = None
     is_free: bool = True  # False if counted against free limit
+    session_id: Optional[str] = None  # Send back on the next turn
 
 
 # ═══════════════════════════════════════════════════════════════
@@ -96,7 +98,8 @@ class RedFlagDetail(BaseModel):
     planetary_cause: str  # "Mars-Venus clash at 2:03 AM"
 
 
-class ReceiptsResponse(BaseModel):
+# Screenshot verdict as returned by Gemini (also its responseSchema)
+class ReceiptsAnalysis(BaseModel):
     toxic_score: int = Field(..., ge=0, le=100)
     red_flags: List[RedFlagDetail]
     verdict: str          # Main analysis paragraph
@@ -106,6 +109,10 @@ class ReceiptsResponse(BaseModel):
     shareable_summary: str  # One-liner for sharing
 
 
+class ReceiptsResponse(ReceiptsAnalysis):
+    tokens_used: Optional[int] = None
+
+
 # ═══════════════════════════════════════════════════════════════
 # MATCH CHECK (Compatibility)
 # ═══════════════════════════════════════════════════════════════
@@ -125,6 +132,7 @@ class CompatibilityBreakdown(BaseModel):
     spiritual: int = Field(..., ge=0, le=100)
 
 
+# Also Gemini's responseSchema for compatibility calls
 class MatchResponse(BaseModel):
     overall_score: int = Field(..., ge=0, le=100)
     toxic_level: str  # "Low", "Medium", "High"
@@ -163,6 +171,60 @@ class BatteryResponse(BaseModel):
     remedy: Optional[str] = None  # If battery is low
 
 
+class ForecastInterval(str, Enum):
+    hourly = "hourly"
+    daily = "daily"
+
+
+class BatteryForecastRequest(BaseModel):
+    user_id: str
+    days: int = Field(7, ge=1, le=30)
+    interval: ForecastInterval = ForecastInterval.hourly
+
+
+class BatteryForecastPoint(BaseModel):
+    time: datetime    # UTC
+    percentage: int = Field(..., ge=0, le=100)
+    level: str
+
+
+class BatteryForecastResponse(BaseModel):
+    interval: ForecastInterval
+    points: List[BatteryForecastPoint]
+
+
+# ═══════════════════════════════════════════════════════════════
+# ASTRO EVENTS (ingresses & stations)
+# ═══════════════════════════════════════════════════════════════
+
+class EventKind(str, Enum):
+    ingress = "ingress"
+    nakshatra = "nakshatra"
+    retrograde = "retrograde"
+    direct = "direct"
+
+
+class EventsRequest(BaseModel):
+    start: Optional[datetime] = None  # Naive = UTC, offsets converted; defaults to now
+    days: int = Field(7, ge=1, le=90)
+    planets: Optional[List[str]] = None  # "Moon", "Mercury", ... (default: all)
+    kinds: Optional[List[EventKind]] = None
+
+
+class AstroEventInfo(BaseModel):
+    planet: str
+    kind: EventKind
+    time: datetime    # UTC
+    from_value: str   # Previous sign / nakshatra / motion
+    to_value: str     # New sign / nakshatra / motion
+
+
+class EventsResponse(BaseModel):
+    start: datetime
+    end: datetime
+    events: List[AstroEventInfo]
+
+
 # ═══════════════════════════════════════════════════════════════
 # ROAST
 # ═══════════════════════════════════════════════════════════════
@@ -176,6 +238,7 @@ class RoastRequest(BaseModel):
 class RoastResponse(BaseModel):
     roast: str
     planetary_context: str
+    tokens_used: Optional[int] = None  # None when served from the roast pool
 
 
 # ═══════════════════════════════════════════════════════════════
@@ -188,7 +251,8 @@ class RemedyRequest(BaseModel):
     concern: Optional[str] = None  # "career", "love", "health"
 
 
-class RemedyResponse(BaseModel):
+# Remedy as returned by Gemini (also its responseSchema)
+class RemedyAnalysis(BaseModel):
     title: str
     description: str
     icon: str
@@ -197,6 +261,10 @@ class RemedyResponse(BaseModel):
     timing: str           # "Tonight at sunset", "Thursday morning"
 
 
+class RemedyResponse(RemedyAnalysis):
+    tokens_used: Optional[int] = None
+
+
 # ═══════════════════════════════════════════════════════════════
 # PAYMENTS
 # ═══════════════════════════════════════════════════════════════
@@ -218,3 +286,30 @@ class VerifyPaymentRequest(BaseModel):
     razorpay_order_id: str
     razorpay_payment_id: str
     razorpay_signature: str
+
+
+# ═══════════════════════════════════════════════════════════════
+# ADMIN: TOKEN USAGE
+# ═══════════════════════════════════════════════════════════════
+
+class UsageTotals(BaseModel):
+    requests: int = 0
+    prompt_tokens: int = 0
+    candidates_tokens: int = 0
+    cached_tokens: int = 0
+    total_tokens: int = 0
+    shared_requests: int = 0   # Served by another request's coalesced call (not billed twice)
+    shared_tokens: int = 0
+
+
+class UserUsage(UsageTotals):
+    user_id: str
+
+
+class UsageReportResponse(BaseModel):
+    since: date
+    totals: UsageTotals
+    by_feature: Dict[str, UsageTotals]
+    by_model: Dict[str, UsageTotals]
+    by_day: Dict[str, UsageTotals]
+    top_users: List[UserUsage]
@@ -0,0 +1,227 @@
+# screenshots.py — Receipts Judge screenshot preprocessing
+# Decodes the upload once, rejects anything that isn't an image Gemini reads (by magic bytes),
+# then downscales to SCREENSHOT_MAX_SIDE and re-encodes as JPEG without metadata.
+# Runs in a small dedicated thread pool so large images don't block the event loop.
+# Without Pillow, images are type-checked and forwarded unchanged.
+
+import asyncio
+import base64
+import binascii
+import hashlib
+import io
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import cached_property
+from typing import AsyncIterator, BinaryIO, Optional, Tuple
+
+from config import settings
+
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except Exception:
+    Image = None
+    ImageOps = None
+    PIL_AVAILABLE = False
+
+
+class ScreenshotError(ValueError):
+    """Upload is not a usable image (bad base64, unsupported type, too large)."""
+
+
+class ScreenshotTooLarge(ScreenshotError):
+    """Upload exceeded SCREENSHOT_MAX_BYTES."""
+
+
+@dataclass
+class PreparedImage:
+    data: bytes
+    mime_type: str
+    original_size: int           # Decoded upload size in bytes
+    width: Optional[int] = None
+    height: Optional[int] = None
+    phash: Optional[str] = None  # Perceptual (difference) hash; None without Pillow
+
+    def to_base64(self) -> str:
+        return base64.b64encode(self.data).decode("ascii")
+
+    @cached_property
+    def digest(self) -> str:
+        """sha256 of the prepared bytes (identical uploads prepare to identical bytes)."""
+        return hashlib.sha256(self.data).hexdigest()
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=max(1, settings.SCREENSHOT_WORKERS), thread_name_prefix="screenshot"
+        )
+    return _executor
+
+
+# Uploads up to this size stay in memory while spooling; larger ones go to a temp file
+_SPOOL_MEMORY_BYTES = 1024 * 1024
+
+
+def _too_large_message() -> str:
+    return f"Screenshot is larger than {round(settings.SCREENSHOT_MAX_BYTES / (1024 * 1024), 1):g} MB"
+
+
+# ═══════════════════════════════════════════════════════════════
+# UPLOADS
+# ═══════════════════════════════════════════════════════════════
+
+async def capped_stream(chunks: AsyncIterator[bytes], limit: int) -> AsyncIterator[bytes]:
+    """Pass chunks through, raising ScreenshotTooLarge as soon as more than `limit` bytes arrive."""
+    received = 0
+    async for chunk in chunks:
+        received += len(chunk)
+        if received > limit:
+            raise ScreenshotTooLarge(_too_large_message())
+        yield chunk
+
+
+async def spool_upload(chunks: AsyncIterator[bytes]) -> BinaryIO:
+    """Stream a raw upload into a spooled temp file, capped at SCREENSHOT_MAX_BYTES."""
+    spool = tempfile.SpooledTemporaryFile(max_size=_SPOOL_MEMORY_BYTES)
+    try:
+        async for chunk in capped_stream(chunks, settings.SCREENSHOT_MAX_BYTES):
+            spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+
+# ═══════════════════════════════════════════════════════════════
+# DECODING + TYPE CHECK
+# ═══════════════════════════════════════════════════════════════
+
+def sniff_mime_type(data: bytes) -> Optional[str]:
+    """Image type from magic bytes, limited to formats Gemini accepts."""
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if data.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[4:8] == b"ftyp" and data[8:12] in (b"heic", b"heix", b"heim", b"heis"):
+        return "image/heic"
+    if data[4:8] == b"ftyp" and data[8:12] in (b"mif1", b"msf1", b"heif"):
+        return "image/heif"
+    return None
+
+
+def decode_base64_image(image_base64: str) -> bytes:
+    """Decode a base64 string or data URL (the declared type is ignored; bytes are sniffed)."""
+    if "," in image_base64[:256]:
+        image_base64 = image_base64.split(",", 1)[1]
+    try:
+        return base64.b64decode(image_base64.strip(), validate=True)
+    except (binascii.Error, ValueError):
+        raise ScreenshotError("Screenshot is not valid base64")
+
+
+# ═══════════════════════════════════════════════════════════════
+# DOWNSCALE + RE-ENCODE
+# ═══════════════════════════════════════════════════════════════
+
+def _target_size(width: int, height: int) -> Tuple[int, int]:
+    longest = max(width, height)
+    max_side = settings.SCREENSHOT_MAX_SIDE
+    if max_side <= 0 or longest <= max_side:
+        return width, height
+    scale = max_side / longest
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def _dhash(img, size: int = 16) -> str:
+    """size×size-bit difference hash: does each pixel get brighter to its right?"""
+    small = img.convert("L").resize((size + 1, size), Image.LANCZOS)
+    px = small.tobytes()
+    bits = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            bits = (bits << 1) | (px[offset + col] < px[offset + col + 1])
+    return f"{bits:0{size * size // 4}x}"
+
+
+def phash_distance(a: str, b: str) -> int:
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+
+def prepare_image(data: bytes) -> PreparedImage:
+    """Validate, downscale and strip metadata. Blocking; async code uses the prepare_* helpers below."""
+    if len(data) > settings.SCREENSHOT_MAX_BYTES:
+        raise ScreenshotTooLarge(_too_large_message())
+    mime_type = sniff_mime_type(data)
+    if mime_type is None:
+        raise ScreenshotError("Unsupported image type (use PNG, JPEG, WebP or HEIC)")
+    if not PIL_AVAILABLE or mime_type in ("image/heic", "image/heif"):
+        # Pillow can't decode HEIC without a plugin; Gemini reads it natively
+        return PreparedImage(data=data, mime_type=mime_type, original_size=len(data))
+
+    try:
+        img = Image.open(io.BytesIO(data))
+        width, height = img.size
+        if width * height > settings.SCREENSHOT_MAX_PIXELS:
+            raise ScreenshotError("Screenshot resolution is too large")
+        has_metadata = bool(img.info.get("exif") or img.info.get("icc_profile") or img.info.get("xmp"))
+
+        img = ImageOps.exif_transpose(img)
+        if img.mode != "RGB":
+            # Screenshots with transparency go onto white, not black
+            rgba = img.convert("RGBA")
+            img = Image.new("RGB", rgba.size, (255, 255, 255))
+            img.paste(rgba, mask=rgba.getchannel("A"))
+        size = _target_size(*img.size)
+        if size != img.size:
+            img = img.resize(size, Image.LANCZOS)
+
+        phash = _dhash(img)
+        out = io.BytesIO()
+        img.save(out, format="JPEG", quality=settings.SCREENSHOT_JPEG_QUALITY, optimize=True)
+    except ScreenshotError:
+        raise
+    except Exception as e:
+        raise ScreenshotError(f"Could not read screenshot: {e}")
+
+    encoded = out.getvalue()
+    if len(encoded) >= len(data) and size == (width, height) and not has_metadata:
+        # Already small and clean: the original is the better copy
+        return PreparedImage(
+            data=data, mime_type=mime_type, original_size=len(data), width=width, height=height, phash=phash
+        )
+    return PreparedImage(
+        data=encoded, mime_type="image/jpeg", original_size=len(data), width=size[0], height=size[1], phash=phash
+    )
+
+
+async def prepare_screenshot_file(file: BinaryIO) -> PreparedImage:
+    """Read an uploaded file and prepare it, both on the screenshot thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_executor(), lambda: prepare_image(file.read(settings.SCREENSHOT_MAX_BYTES + 1))
+    )
+
+
+async def prepare_base64_screenshot(image_base64: str) -> PreparedImage:
+    """Decode + prepare a base64 / data-URL screenshot on the screenshot thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_executor(), lambda: prepare_image(decode_base64_image(image_base64))
+    )
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
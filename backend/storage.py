@@ -4,7 +4,7 @@ import sqlite3
 from pathlib import Path
 from datetime import datetime, date
 import uuid
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
 from config import settings
 
@@ -18,6 +18,23 @@ _DB_PATH: Optional[Path] = None
 _SUPABASE = None
 _USE_SUPABASE = False
 
+# Natal data is derived from dob once and persisted on the user row
+NATAL_COLUMNS = {
+    "natal_moon_longitude": "REAL",
+    "natal_moon_sign": "TEXT",
+    "natal_nakshatra": "TEXT",
+    "natal_nakshatra_pada": "INTEGER",
+    "natal_dasha_lord": "TEXT",
+    "natal_dasha_balance": "REAL",
+    "natal_source": "TEXT",      # Ephemeris the natal fields came from ("table" / "swe")
+}
+
+# Usage counters added after usage_daily was first created
+USAGE_SHARED_COLUMNS = {
+    "shared_requests": "INTEGER NOT NULL DEFAULT 0",
+    "shared_tokens": "INTEGER NOT NULL DEFAULT 0",
+}
+
 
 def init_db(db_path: str) -> None:
     """Initialize storage backend (Supabase or SQLite)."""
@@ -50,10 +67,18 @@ def init_db(db_path: str) -> None:
                 messages_date TEXT NOT NULL,
                 receipts_today INTEGER NOT NULL DEFAULT 0,
                 receipts_date TEXT NOT NULL,
-                receipts_credits INTEGER NOT NULL DEFAULT 0
+                receipts_credits INTEGER NOT NULL DEFAULT 0,
+                natal_moon_longitude REAL,
+                natal_moon_sign TEXT,
+                natal_nakshatra TEXT,
+                natal_nakshatra_pada INTEGER,
+                natal_dasha_lord TEXT,
+                natal_dasha_balance REAL,
+                natal_source TEXT
             )
             """
         )
+        _ensure_columns(conn, "users", NATAL_COLUMNS)
         conn.execute(
             """
             CREATE TABLE IF NOT EXISTS orders (
@@ -70,6 +95,52 @@ def init_db(db_path: str) -> None:
             """
         )
         conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_rzp ON orders(razorpay_order_id)")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS chat_sessions (
+                id TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                mode TEXT NOT NULL,
+                summary TEXT NOT NULL DEFAULT '',
+                summarized_through INTEGER NOT NULL DEFAULT 0,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS chat_messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                tokens INTEGER NOT NULL,
+                created_at TEXT NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_chat_messages_session ON chat_messages(session_id, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_chat_sessions_user ON chat_sessions(user_id, mode, updated_at)")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS usage_daily (
+                day TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                feature TEXT NOT NULL,
+                model TEXT NOT NULL,
+                requests INTEGER NOT NULL DEFAULT 0,
+                prompt_tokens INTEGER NOT NULL DEFAULT 0,
+                candidates_tokens INTEGER NOT NULL DEFAULT 0,
+                cached_tokens INTEGER NOT NULL DEFAULT 0,
+                total_tokens INTEGER NOT NULL DEFAULT 0,
+                shared_requests INTEGER NOT NULL DEFAULT 0,
+                shared_tokens INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, user_id, feature, model)
+            )
+            """
+        )
+        _ensure_columns(conn, "usage_daily", USAGE_SHARED_COLUMNS)
         conn.commit()
 
 
@@ -81,6 +152,14 @@ def _connect() -> sqlite3.Connection:
     return conn
 
 
+def _ensure_columns(conn: sqlite3.Connection, table: str, columns: Dict[str, str]) -> None:
+    """Add columns missing from databases created before they existed."""
+    existing = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+    for name, col_type in columns.items():
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {col_type}")
+
+
 def _today_str() -> str:
     return date.today().isoformat()
 
@@ -136,10 +215,13 @@ def create_user(
     dob: str,
     birth_time: Optional[str] = None,
     birth_place: Optional[str] = None,
+    natal: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, Any]:
+    """natal: precomputed natal columns (see NATAL_COLUMNS); left NULL when not given."""
     user_id = "user_" + uuid.uuid4().hex[:12]
     created_at = datetime.utcnow().isoformat()
     today = _today_str()
+    natal = natal or {}
 
     if _USE_SUPABASE:
         payload = {
@@ -156,6 +238,7 @@ def create_user(
             "receipts_today": 0,
             "receipts_date": today,
             "receipts_credits": 0,
+            **natal,
         }
         _sb_table("users").insert(payload).execute()
         return _sb_get_user(user_id)
@@ -166,10 +249,13 @@ def create_user(
             INSERT INTO users (
                 id, name, sign, dob, birth_time, birth_place, created_at,
                 is_premium, messages_today, messages_date, receipts_today,
-                receipts_date, receipts_credits
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, 0, 0, ?, 0, ?, 0)
-            """,
-            (user_id, name, sign, dob, birth_time, birth_place, created_at, today, today)
+                receipts_date, receipts_credits{natal_columns}
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, 0, 0, ?, 0, ?, 0{natal_params})
+            """.format(
+                natal_columns="".join(f", {k}" for k in natal),
+                natal_params=", ?" * len(natal),
+            ),
+            (user_id, name, sign, dob, birth_time, birth_place, created_at, today, today, *natal.values())
         )
         conn.commit()
 
@@ -213,6 +299,39 @@ def _reset_daily_counts_sqlite(conn: sqlite3.Connection, row: sqlite3.Row) -> No
         conn.commit()
 
 
+def users_missing_natal(limit: int = 500, after_id: str = "") -> List[Dict[str, Any]]:
+    """
+    Users (id, dob) without persisted natal fields, by id after `after_id`: never filled,
+    or filled before natal_source was recorded (possibly from the mean-motion fallback).
+    """
+    if _USE_SUPABASE:
+        resp = (
+            _sb_table("users").select("id, dob").is_("natal_source", "null")
+            .gt("id", after_id).order("id").limit(limit).execute()
+        )
+        return getattr(resp, "data", None) or []
+
+    with _connect() as conn:
+        rows = conn.execute(
+            "SELECT id, dob FROM users WHERE natal_source IS NULL AND id > ? ORDER BY id LIMIT ?",
+            (after_id, limit),
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+
+def set_natal_fields(user_id: str, natal: Dict[str, Any]) -> None:
+    if _USE_SUPABASE:
+        _sb_update_user(user_id, natal)
+        return
+
+    with _connect() as conn:
+        conn.execute(
+            f"UPDATE users SET {', '.join(f'{k} = ?' for k in natal)} WHERE id = ?",
+            (*natal.values(), user_id),
+        )
+        conn.commit()
+
+
 def set_user_premium(user_id: str, is_premium: bool) -> None:
     if _USE_SUPABASE:
         _sb_update_user(user_id, {"is_premium": bool(is_premium)})
@@ -249,6 +368,20 @@ def increment_receipts_today(user_id: str) -> None:
         conn.commit()
 
 
+def refund_receipts_today(user_id: str) -> None:
+    """Give back a free daily receipt spent on an analysis that failed."""
+    if _USE_SUPABASE:
+        user = _sb_get_user(user_id)
+        if not user:
+            return
+        _sb_update_user(user_id, {"receipts_today": max(0, int(user.get("receipts_today") or 0) - 1)})
+        return
+
+    with _connect() as conn:
+        conn.execute("UPDATE users SET receipts_today = MAX(0, receipts_today - 1) WHERE id = ?", (user_id,))
+        conn.commit()
+
+
 def add_receipts_credit(user_id: str, credits: int) -> None:
     if _USE_SUPABASE:
         user = _sb_get_user(user_id)
@@ -341,3 +474,181 @@ def mark_order_paid(order_id: str, razorpay_payment_id: str) -> None:
             ("paid", razorpay_payment_id, order_id)
         )
         conn.commit()
+
+
+# ═══════════════════════════════════════════════════════════════
+# CHAT SESSIONS
+# ═══════════════════════════════════════════════════════════════
+
+def create_chat_session(user_id: str, mode: str) -> Dict[str, Any]:
+    session = {
+        "id": "chat_" + uuid.uuid4().hex[:12],
+        "user_id": user_id,
+        "mode": mode,
+        "summary": "",
+        "summarized_through": 0,
+        "created_at": datetime.utcnow().isoformat(),
+    }
+    session["updated_at"] = session["created_at"]
+
+    if _USE_SUPABASE:
+        _sb_table("chat_sessions").insert(session).execute()
+        return session
+
+    with _connect() as conn:
+        conn.execute(
+            """
+            INSERT INTO chat_sessions (id, user_id, mode, summary, summarized_through, created_at, updated_at)
+            VALUES (:id, :user_id, :mode, :summary, :summarized_through, :created_at, :updated_at)
+            """,
+            session,
+        )
+        conn.commit()
+    return session
+
+
+def get_chat_session(session_id: str) -> Optional[Dict[str, Any]]:
+    if _USE_SUPABASE:
+        resp = _sb_table("chat_sessions").select("*").eq("id", session_id).limit(1).execute()
+        data = getattr(resp, "data", None) or []
+        return data[0] if data else None
+
+    with _connect() as conn:
+        row = conn.execute("SELECT * FROM chat_sessions WHERE id = ?", (session_id,)).fetchone()
+        return dict(row) if row else None
+
+
+def latest_chat_session(user_id: str, mode: str, updated_after: str) -> Optional[Dict[str, Any]]:
+    """The user's most recently active session in this mode, if touched after `updated_after`."""
+    if _USE_SUPABASE:
+        resp = (
+            _sb_table("chat_sessions").select("*")
+            .eq("user_id", user_id).eq("mode", mode).gt("updated_at", updated_after)
+            .order("updated_at", desc=True).limit(1).execute()
+        )
+        data = getattr(resp, "data", None) or []
+        return data[0] if data else None
+
+    with _connect() as conn:
+        row = conn.execute(
+            """
+            SELECT * FROM chat_sessions WHERE user_id = ? AND mode = ? AND updated_at > ?
+            ORDER BY updated_at DESC LIMIT 1
+            """,
+            (user_id, mode, updated_after),
+        ).fetchone()
+        return dict(row) if row else None
+
+
+def prune_chat_sessions(updated_before: str) -> int:
+    """Delete sessions (and their messages) last active before `updated_before`. Returns the count."""
+    if _USE_SUPABASE:
+        # chat_messages rows go with their session (on delete cascade)
+        resp = _sb_table("chat_sessions").delete().lt("updated_at", updated_before).execute()
+        return len(getattr(resp, "data", None) or [])
+
+    with _connect() as conn:
+        conn.execute(
+            "DELETE FROM chat_messages WHERE session_id IN (SELECT id FROM chat_sessions WHERE updated_at < ?)",
+            (updated_before,),
+        )
+        cur = conn.execute("DELETE FROM chat_sessions WHERE updated_at < ?", (updated_before,))
+        conn.commit()
+        return cur.rowcount
+
+
+def add_chat_messages(session_id: str, messages: List[Dict[str, Any]]) -> None:
+    """Append [{role, content, tokens}, ...] to a session."""
+    now = datetime.utcnow().isoformat()
+    rows = [{"session_id": session_id, "created_at": now, **m} for m in messages]
+
+    if _USE_SUPABASE:
+        _sb_table("chat_messages").insert(rows).execute()
+        _sb_table("chat_sessions").update({"updated_at": now}).eq("id", session_id).execute()
+        return
+
+    with _connect() as conn:
+        conn.executemany(
+            """
+            INSERT INTO chat_messages (session_id, role, content, tokens, created_at)
+            VALUES (:session_id, :role, :content, :tokens, :created_at)
+            """,
+            rows,
+        )
+        conn.execute("UPDATE chat_sessions SET updated_at = ? WHERE id = ?", (now, session_id))
+        conn.commit()
+
+
+def get_chat_messages(session_id: str, after_id: int = 0) -> List[Dict[str, Any]]:
+    """Messages with id > after_id, oldest first."""
+    if _USE_SUPABASE:
+        resp = (
+            _sb_table("chat_messages").select("id, role, content, tokens")
+            .eq("session_id", session_id).gt("id", after_id).order("id").execute()
+        )
+        return getattr(resp, "data", None) or []
+
+    with _connect() as conn:
+        rows = conn.execute(
+            "SELECT id, role, content, tokens FROM chat_messages WHERE session_id = ? AND id > ? ORDER BY id",
+            (session_id, after_id),
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+
+def update_chat_summary(session_id: str, summary: str, summarized_through: int) -> None:
+    updates = {"summary": summary, "summarized_through": summarized_through}
+
+    if _USE_SUPABASE:
+        _sb_table("chat_sessions").update(updates).eq("id", session_id).execute()
+        return
+
+    with _connect() as conn:
+        conn.execute(
+            "UPDATE chat_sessions SET summary = ?, summarized_through = ? WHERE id = ?",
+            (summary, summarized_through, session_id),
+        )
+        conn.commit()
+
+
+# ═══════════════════════════════════════════════════════════════
+# TOKEN USAGE
+# ═══════════════════════════════════════════════════════════════
+
+USAGE_COUNTERS = (
+    "requests", "prompt_tokens", "candidates_tokens", "cached_tokens", "total_tokens",
+    "shared_requests", "shared_tokens",
+)
+
+
+def add_usage(rows: List[Dict[str, Any]]) -> None:
+    """Increment usage_daily counters for [{day, user_id, feature, model, <counters>}, ...]."""
+    if _USE_SUPABASE:
+        _SUPABASE.rpc("add_usage", {"rows": rows}).execute()
+        return
+
+    with _connect() as conn:
+        conn.executemany(
+            """
+            INSERT INTO usage_daily (day, user_id, feature, model, {cols})
+            VALUES (:day, :user_id, :feature, :model, {params})
+            ON CONFLICT (day, user_id, feature, model) DO UPDATE SET {updates}
+            """.format(
+                cols=", ".join(USAGE_COUNTERS),
+                params=", ".join(f":{c}" for c in USAGE_COUNTERS),
+                updates=", ".join(f"{c} = {c} + excluded.{c}" for c in USAGE_COUNTERS),
+            ),
+            rows,
+        )
+        conn.commit()
+
+
+def get_usage(since_day: str) -> List[Dict[str, Any]]:
+    """All usage_daily rows with day >= since_day (YYYY-MM-DD)."""
+    if _USE_SUPABASE:
+        resp = _sb_table("usage_daily").select("*").gte("day", since_day).execute()
+        return getattr(resp, "data", None) or []
+
+    with _connect() as conn:
+        rows = conn.execute("SELECT * FROM usage_daily WHERE day >= ?", (since_day,)).fetchall()
+        return [dict(row) for row in rows]
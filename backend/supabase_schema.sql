@@ -13,9 +13,25 @@ create table if not exists users (
   messages_date date not null default current_date,
   receipts_today integer not null default 0,
   receipts_date date not null default current_date,
-  receipts_credits integer not null default 0
+  receipts_credits integer not null default 0,
+  natal_moon_longitude double precision null,
+  natal_moon_sign text null,
+  natal_nakshatra text null,
+  natal_nakshatra_pada integer null,
+  natal_dasha_lord text null,
+  natal_dasha_balance double precision null,
+  natal_source text null
 );
 
+-- Natal columns for databases created before they existed (fill with: python backfill_natal.py)
+alter table users add column if not exists natal_moon_longitude double precision null;
+alter table users add column if not exists natal_moon_sign text null;
+alter table users add column if not exists natal_nakshatra text null;
+alter table users add column if not exists natal_nakshatra_pada integer null;
+alter table users add column if not exists natal_dasha_lord text null;
+alter table users add column if not exists natal_dasha_balance double precision null;
+alter table users add column if not exists natal_source text null;
+
 create table if not exists orders (
   order_id text primary key,
   user_id text not null references users(id),
@@ -29,3 +45,65 @@ create table if not exists orders (
 );
 
 create index if not exists idx_orders_rzp on orders(razorpay_order_id);
+
+create table if not exists chat_sessions (
+  id text primary key,
+  user_id text not null references users(id),
+  mode text not null,
+  summary text not null default '',
+  summarized_through bigint not null default 0,
+  created_at timestamptz not null default now(),
+  updated_at timestamptz not null default now()
+);
+
+create table if not exists chat_messages (
+  id bigint generated always as identity primary key,
+  session_id text not null references chat_sessions(id) on delete cascade,
+  role text not null,
+  content text not null,
+  tokens integer not null,
+  created_at timestamptz not null default now()
+);
+
+create index if not exists idx_chat_messages_session on chat_messages(session_id, id);
+create index if not exists idx_chat_sessions_user on chat_sessions(user_id, mode, updated_at);
+
+create table if not exists usage_daily (
+  day date not null,
+  user_id text not null,
+  feature text not null,
+  model text not null,
+  requests bigint not null default 0,
+  prompt_tokens bigint not null default 0,
+  candidates_tokens bigint not null default 0,
+  cached_tokens bigint not null default 0,
+  total_tokens bigint not null default 0,
+  shared_requests bigint not null default 0,
+  shared_tokens bigint not null default 0,
+  primary key (day, user_id, feature, model)
+);
+
+-- Coalesced-call counters for tables created before they existed
+alter table usage_daily add column if not exists shared_requests bigint not null default 0;
+alter table usage_daily add column if not exists shared_tokens bigint not null default 0;
+
+-- Batched counter increments from the backend (storage.add_usage)
+create or replace function add_usage(rows jsonb) returns void language sql as $$
+  insert into usage_daily as u (day, user_id, feature, model, requests, prompt_tokens,
+                                candidates_tokens, cached_tokens, total_tokens,
+                                shared_requests, shared_tokens)
+  select (r->>'day')::date, r->>'user_id', r->>'feature', r->>'model',
+         (r->>'requests')::bigint, (r->>'prompt_tokens')::bigint,
+         (r->>'candidates_tokens')::bigint, (r->>'cached_tokens')::bigint,
+         (r->>'total_tokens')::bigint,
+         coalesce((r->>'shared_requests')::bigint, 0), coalesce((r->>'shared_tokens')::bigint, 0)
+  from jsonb_array_elements(rows) as r
+  on conflict (day, user_id, feature, model) do update set
+    requests = u.requests + excluded.requests,
+    prompt_tokens = u.prompt_tokens + excluded.prompt_tokens,
+    candidates_tokens = u.candidates_tokens + excluded.candidates_tokens,
+    cached_tokens = u.cached_tokens + excluded.cached_tokens,
+    total_tokens = u.total_tokens + excluded.total_tokens,
+    shared_requests = u.shared_requests + excluded.shared_requests,
+    shared_tokens = u.shared_tokens + excluded.shared_tokens;
+$$;
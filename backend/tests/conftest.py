@@ -0,0 +1,37 @@
+# conftest.py — Shared fixtures: backend modules on sys.path, fake Gemini wired in-process
+
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import fake_gemini  # noqa: E402
+import http_pool  # noqa: E402
+import limiter  # noqa: E402
+import resilience  # noqa: E402
+from config import settings  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    """Fresh breaker/latency state, limiter and fake upstream config for every test."""
+    monkeypatch.setattr(settings, "GEMINI_API_KEY", "fake")
+    monkeypatch.setattr(settings, "GEMINI_API_BASE", "http://fake-gemini/v1beta")
+    monkeypatch.setattr(settings, "GEMINI_CONTEXT_CACHE", "off")
+    monkeypatch.setattr(resilience, "_health", {})
+    monkeypatch.setattr(limiter, "_limiter", None)
+    monkeypatch.setattr(fake_gemini, "config", fake_gemini.FakeConfig())
+    monkeypatch.setattr(fake_gemini, "stats", dict.fromkeys(fake_gemini.stats, 0))
+    yield
+    http_pool._clients.clear()
+
+
+@pytest.fixture
+def fake_upstream(monkeypatch):
+    """Route the shared Gemini client to fake_gemini.app in-process; returns its config."""
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=fake_gemini.app))
+    monkeypatch.setitem(http_pool._clients, "gemini", client)
+    return fake_gemini.config
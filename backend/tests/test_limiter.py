@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+import limiter
+from config import settings
+from limiter import AdaptiveLimiter, Priority
+
+
+@pytest.fixture(autouse=True)
+def _aimd_settings(monkeypatch):
+    monkeypatch.setattr(settings, "GEMINI_LIMITER_BACKOFF", 0.5)
+    monkeypatch.setattr(settings, "GEMINI_LIMITER_LATENCY_FACTOR", 3.0)
+
+
+def test_healthy_calls_add_one_slot_per_limits_worth():
+    lim = AdaptiveLimiter(4, 1, 10)
+    for _ in range(4):
+        lim.on_success(0.5)
+    assert int(lim.limit) == 4 and lim.limit == pytest.approx(5.0, abs=0.1)
+    for _ in range(100):
+        lim.on_success(0.5)
+    assert lim.limit == 10  # Capped at the maximum
+
+
+def test_overload_cuts_once_per_cooldown(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(limiter.time, "monotonic", lambda: now[0])
+    lim = AdaptiveLimiter(8, 2, 16)
+
+    lim.on_overload()
+    lim.on_overload()  # Same burst: ignored
+    assert lim.limit == 4
+
+    now[0] += limiter._DECREASE_COOLDOWN_SECONDS + 0.1
+    lim.on_overload()
+    assert lim.limit == 2
+    now[0] += limiter._DECREASE_COOLDOWN_SECONDS + 0.1
+    lim.on_overload()
+    assert lim.limit == 2  # Floored at the minimum
+
+
+def test_long_generations_are_judged_against_their_own_model():
+    lim = AdaptiveLimiter(8, 1, 64)
+    for _ in range(limiter._BASELINE_MIN_SAMPLES):
+        lim.on_success(0.5, "flash")
+    for _ in range(3 * limiter._BASELINE_MIN_SAMPLES):
+        lim.on_success(40.0, "pro")  # Slow in absolute terms, normal for Pro
+    assert lim.limit > 8
+    assert lim.snapshot()["latency_baseline_ms"] == {"flash": 500.0, "pro": 40000.0}
+
+
+def test_call_far_above_its_baseline_counts_as_overload():
+    lim = AdaptiveLimiter(8, 1, 64)
+    for _ in range(limiter._BASELINE_MIN_SAMPLES):
+        lim.on_success(1.0, "pro")
+    before = lim.limit
+    lim.on_success(2.5, "pro")
+    assert lim.limit > before
+    lim.on_success(3.5, "pro")
+    assert lim.limit == pytest.approx(before * settings.GEMINI_LIMITER_BACKOFF, abs=0.1)
+
+
+def test_latency_factor_zero_ignores_latency(monkeypatch):
+    monkeypatch.setattr(settings, "GEMINI_LIMITER_LATENCY_FACTOR", 0.0)
+    lim = AdaptiveLimiter(8, 1, 64)
+    for _ in range(limiter._BASELINE_MIN_SAMPLES):
+        lim.on_success(1.0, "pro")
+    lim.on_success(100.0, "pro")
+    assert lim.limit > 8
+
+
+def test_observe_maps_statuses(monkeypatch):
+    monkeypatch.setattr(limiter, "_limiter", AdaptiveLimiter(8, 1, 16))
+    lim = limiter.get_limiter()
+    limiter.observe(400, 0.1)
+    assert lim.limit == 8
+    limiter.observe(429, 0.1)
+    assert lim.limit == 4
+
+
+def test_waiters_are_served_by_priority_then_arrival():
+    lim = AdaptiveLimiter(1, 1, 1)
+    order = []
+
+    async def wait(name, priority):
+        await lim.acquire(priority)
+        order.append(name)
+
+    async def run():
+        await lim.acquire(Priority.NORMAL)  # Hold the only slot
+        tasks = []
+        for name, priority in (("low", Priority.LOW), ("normal-1", Priority.NORMAL),
+                               ("high", Priority.HIGH), ("normal-2", Priority.NORMAL)):
+            tasks.append(asyncio.create_task(wait(name, priority)))
+            await asyncio.sleep(0)
+        assert lim.snapshot()["queued"] == {"high": 1, "normal": 2, "low": 1}
+        for _ in tasks:
+            lim.release()
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    assert order == ["high", "normal-1", "normal-2", "low"]
+
+
+def test_cancelled_waiter_gives_its_slot_back():
+    lim = AdaptiveLimiter(1, 1, 1)
+
+    async def run():
+        await lim.acquire(Priority.NORMAL)
+        waiter = asyncio.create_task(lim.acquire(Priority.HIGH))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        lim.release()
+        assert lim.in_flight == 0
+        await asyncio.wait_for(lim.acquire(Priority.LOW), 1.0)
+
+    asyncio.run(run())
+    assert lim.in_flight == 1
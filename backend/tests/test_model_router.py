@@ -0,0 +1,57 @@
+import asyncio
+
+import gemini_client
+import limiter
+from config import settings
+from fake_gemini import Latency
+from model_router import route_model
+from resilience import health
+
+
+def _ask(i: int):
+    contents = [{"role": "user", "parts": [{"text": f"question {i}"}]}]
+    return gemini_client._generate_content(settings.GEMINI_MODEL_PRO, contents, {})
+
+
+def test_saturated_limiter_does_not_look_like_slow_pro(fake_upstream, monkeypatch):
+    # Pro answers in 30ms, but only 2 slots for 80 concurrent calls: most of the
+    # wall time is queueing, which must not count as Pro being slow
+    fake_upstream.pro_latency = Latency("fixed", 30, 0)
+    monkeypatch.setattr(limiter, "_limiter", limiter.AdaptiveLimiter(2, 2, 2))
+    monkeypatch.setattr(settings, "ROUTER_PRO_SLOW_P95_SECONDS", 0.2)
+    monkeypatch.setattr(settings, "ROUTER_PRO_PROBE_RATE", 0.0)
+    monkeypatch.setattr(settings, "MODEL_ROUTER_ENABLED", True)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await asyncio.gather(*(_ask(i) for i in range(80)))
+        return loop.time() - started
+
+    wall = asyncio.run(run())
+    assert wall > 1.0  # The limiter really was saturated
+
+    p95 = health(settings.GEMINI_MODEL_PRO).p95()
+    assert p95 is not None and p95 < settings.ROUTER_PRO_SLOW_P95_SECONDS
+    for feature, message in (("remedy", ""), ("chat_guru", "short?")):
+        decision = route_model(feature, message=message)
+        assert decision.model == settings.GEMINI_MODEL_PRO
+        assert decision.reason == "default"
+
+
+def test_slow_pro_moves_short_guru_messages_and_remedies(fake_upstream, monkeypatch):
+    fake_upstream.pro_latency = Latency("fixed", 120, 0)
+    monkeypatch.setattr(settings, "ROUTER_PRO_SLOW_P95_SECONDS", 0.05)
+    monkeypatch.setattr(settings, "ROUTER_PRO_PROBE_RATE", 0.0)
+    monkeypatch.setattr(settings, "MODEL_ROUTER_ENABLED", True)
+
+    async def run():
+        await asyncio.gather(*(_ask(i) for i in range(25)))
+
+    asyncio.run(run())
+
+    assert route_model("remedy").reason == "pro_slow"
+    assert route_model("chat_guru", message="short?").model == settings.GEMINI_MODEL_FLASH
+    long_question = "x" * (settings.ROUTER_SHORT_MESSAGE_CHARS + 1)
+    assert route_model("chat_guru", message=long_question).model == settings.GEMINI_MODEL_PRO
+    assert route_model("remedy", premium=True).reason == "premium"
@@ -0,0 +1,187 @@
+import asyncio
+
+import httpx
+import pytest
+
+import gemini_client
+import http_pool
+import resilience
+from config import settings
+from resilience import CircuitOpenError, GeminiHTTPError, ModelHealth, backoff_delay, health
+
+
+def _reply(text: str = "ok") -> dict:
+    return {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}]}
+
+
+def _script(monkeypatch, responses):
+    """Serve `responses` (status, headers) in order from the shared Gemini client; returns the models hit."""
+    hits = []
+    queue = list(responses)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        hits.append(request.url.path.rsplit("/", 1)[-1].split(":")[0])
+        status, headers = queue.pop(0) if queue else (200, {})
+        if status >= 400:
+            return httpx.Response(status, headers=headers, json={"error": {"code": status}})
+        return httpx.Response(200, json=_reply())
+
+    monkeypatch.setitem(http_pool._clients, "gemini", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    return hits
+
+
+def _ask(model: str):
+    contents = [{"role": "user", "parts": [{"text": "hi"}]}]
+    return gemini_client._generate_content(model, contents, {})
+
+
+def _record_backoff(monkeypatch):
+    delays = []
+
+    def spy(attempt, retry_after=None):
+        delays.append(backoff_delay(attempt, retry_after))
+        return 0.0
+
+    monkeypatch.setattr(resilience, "backoff_delay", spy)
+    return delays
+
+
+# ═══════════════════════════════════════════════════════════════
+# RETRIES
+# ═══════════════════════════════════════════════════════════════
+
+def test_backoff_honours_retry_after_up_to_the_cap(monkeypatch):
+    monkeypatch.setattr(settings, "GEMINI_RETRY_BASE_DELAY", 0.5)
+    monkeypatch.setattr(settings, "GEMINI_RETRY_MAX_DELAY", 8.0)
+    assert backoff_delay(0, retry_after=3.0) == 3.0
+    assert backoff_delay(0, retry_after=60.0) == 8.0
+    for attempt in range(6):
+        assert 0.0 <= backoff_delay(attempt) <= min(8.0, 0.5 * 2 ** attempt)
+
+
+def test_retry_after_header_sets_the_wait(monkeypatch):
+    monkeypatch.setattr(settings, "GEMINI_MAX_RETRIES", 2)
+    hits = _script(monkeypatch, [(429, {"Retry-After": "2"}), (503, {"Retry-After": "soon"})])
+    delays = _record_backoff(monkeypatch)
+
+    assert asyncio.run(_ask(settings.GEMINI_MODEL_FLASH)) == "ok"
+    assert len(hits) == 3
+    assert delays[0] == 2.0
+    assert 0.0 <= delays[1] <= settings.GEMINI_RETRY_BASE_DELAY * 2  # Unparseable header → jitter
+
+
+def test_non_retryable_status_is_raised_without_retry(monkeypatch):
+    hits = _script(monkeypatch, [(400, {})])
+    delays = _record_backoff(monkeypatch)
+
+    with pytest.raises(GeminiHTTPError) as exc:
+        asyncio.run(_ask(settings.GEMINI_MODEL_FLASH))
+    assert exc.value.status_code == 400
+    assert len(hits) == 1 and delays == []
+    assert health(settings.GEMINI_MODEL_FLASH).failures == 0
+
+
+def test_failing_pro_falls_back_to_flash(monkeypatch):
+    monkeypatch.setattr(settings, "GEMINI_MAX_RETRIES", 1)
+    monkeypatch.setattr(settings, "GEMINI_PRO_FALLBACK", True)
+    hits = _script(monkeypatch, [(503, {}), (503, {})])
+    _record_backoff(monkeypatch)
+
+    assert asyncio.run(_ask(settings.GEMINI_MODEL_PRO)) == "ok"
+    assert hits == [settings.GEMINI_MODEL_PRO, settings.GEMINI_MODEL_PRO, settings.GEMINI_MODEL_FLASH]
+
+
+# ═══════════════════════════════════════════════════════════════
+# CIRCUIT BREAKER
+# ═══════════════════════════════════════════════════════════════
+
+def test_breaker_opens_then_lets_one_probe_through(monkeypatch):
+    monkeypatch.setattr(settings, "GEMINI_BREAKER_FAILURES", 3)
+    monkeypatch.setattr(settings, "GEMINI_BREAKER_RESET_SECONDS", 30.0)
+    state = ModelHealth()
+    for _ in range(3):
+        assert state.allow()
+        state.record_failure()
+    assert state.state == "open"
+    assert not state.allow()
+
+    state.opened_at -= 31  # Cool-down over: half-open, exactly one probe
+    assert state.allow()
+    assert state.state == "half-open"
+    assert not state.allow()
+
+    state.record_failure()  # Failed probe re-opens at once
+    assert state.state == "open" and not state.allow()
+
+    state.opened_at -= 31
+    assert state.allow()
+    state.record_success(0.4)
+    assert state.state == "closed" and state.failures == 0
+    assert state.allow()
+
+
+def test_open_breaker_skips_upstream(monkeypatch):
+    monkeypatch.setattr(settings, "GEMINI_PRO_FALLBACK", False)
+    hits = _script(monkeypatch, [])
+    monkeypatch.setattr(settings, "GEMINI_BREAKER_FAILURES", 1)
+    health(settings.GEMINI_MODEL_PRO).record_failure()
+
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(_ask(settings.GEMINI_MODEL_PRO))
+    assert hits == []
+
+
+# ═══════════════════════════════════════════════════════════════
+# HEDGING
+# ═══════════════════════════════════════════════════════════════
+
+def test_hedge_loser_is_cancelled(monkeypatch):
+    monkeypatch.setattr(settings, "GEMINI_HEDGE_ENABLED", True)
+    monkeypatch.setattr(settings, "GEMINI_HEDGE_MIN_DELAY", 0.01)
+    model = settings.GEMINI_MODEL_FLASH
+    for _ in range(resilience._HEDGE_MIN_SAMPLES):
+        health(model).record_success(0.01)
+
+    calls, cancelled = [], []
+
+    async def attempt(name):
+        calls.append(name)
+        resilience.upstream_started()
+        try:
+            await asyncio.sleep(5.0 if len(calls) == 1 else 0.02)
+        except asyncio.CancelledError:
+            cancelled.append(len(calls))
+            raise
+        return len(calls)
+
+    async def run():
+        result = await resilience.call_with_resilience(model, attempt)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(run()) == 2
+    assert len(calls) == 2 and len(cancelled) == 1
+
+
+def test_cancelled_probe_frees_the_half_open_slot(monkeypatch):
+    monkeypatch.setattr(settings, "GEMINI_PRO_FALLBACK", False)
+    monkeypatch.setattr(settings, "GEMINI_BREAKER_FAILURES", 1)
+    model = settings.GEMINI_MODEL_PRO
+    state = health(model)
+    state.record_failure()
+    state.opened_at -= settings.GEMINI_BREAKER_RESET_SECONDS + 1
+
+    async def hang(name):
+        await asyncio.sleep(5.0)
+
+    async def run():
+        probe = asyncio.create_task(resilience.call_with_resilience(model, hang))
+        await asyncio.sleep(0.01)
+        assert state.state == "half-open"
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+    asyncio.run(run())
+    assert not state.probing
+    assert state.allow()  # The next request gets to probe
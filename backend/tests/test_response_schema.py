@@ -0,0 +1,59 @@
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+from gemini_client import response_schema
+from schemas import ReceiptsAnalysis
+
+
+class Flag(BaseModel):
+    text: str = Field(description="What happened")
+    severity: int = Field(ge=1, le=5)
+
+
+class Report(BaseModel):
+    verdict: str
+    score: float
+    flags: List[Flag] = Field(min_length=1, max_length=4)
+    note: Optional[str] = None
+
+
+def test_refs_are_inlined_and_types_upper_cased():
+    schema = response_schema(Report)
+    assert "$defs" not in str(schema) and "$ref" not in str(schema)
+    assert schema["type"] == "OBJECT"
+    assert schema["properties"]["score"] == {"type": "NUMBER"}
+
+    flags = schema["properties"]["flags"]
+    assert flags["type"] == "ARRAY"
+    assert (flags["minItems"], flags["maxItems"]) == (1, 4)
+    assert flags["items"] == {
+        "type": "OBJECT",
+        "properties": {
+            "text": {"type": "STRING", "description": "What happened"},
+            "severity": {"type": "INTEGER", "minimum": 1, "maximum": 5},
+        },
+        "required": ["text", "severity"],
+        "propertyOrdering": ["text", "severity"],
+    }
+
+
+def test_optional_becomes_nullable_and_order_is_kept():
+    schema = response_schema(Report)
+    assert schema["properties"]["note"] == {"type": "STRING", "nullable": True}
+    assert schema["propertyOrdering"] == ["verdict", "score", "flags", "note"]
+    assert schema["required"] == ["verdict", "score", "flags"]
+
+
+def test_only_gemini_keywords_survive():
+    allowed = {"type", "format", "description", "enum", "required", "minimum", "maximum",
+               "minItems", "maxItems", "nullable", "properties", "propertyOrdering", "items"}
+
+    def walk(node):
+        assert set(node) <= allowed, set(node) - allowed
+        for prop in node.get("properties", {}).values():
+            walk(prop)
+        if "items" in node:
+            walk(node["items"])
+
+    walk(response_schema(ReceiptsAnalysis))
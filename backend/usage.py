@@ -0,0 +1,131 @@
+# usage.py — Gemini token accounting from usageMetadata
+# Each request opens a meter (user + feature); every Gemini call made while serving it adds
+# its usageMetadata to the meter and to an in-process buffer aggregated per
+# (day, user, feature, model). The buffer is flushed to storage in one batched write.
+# A call coalesced onto another request's identical in-flight call is billed once (to the
+# request that sent it); every other caller records it as shared_requests / shared_tokens.
+
+import threading
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from storage import add_usage
+
+
+@dataclass
+class TokenCounts:
+    requests: int = 0
+    prompt_tokens: int = 0
+    candidates_tokens: int = 0
+    cached_tokens: int = 0
+    total_tokens: int = 0
+    shared_requests: int = 0     # Answers taken from another request's upstream call
+    shared_tokens: int = 0
+
+    def add(self, other: "TokenCounts") -> None:
+        self.requests += other.requests
+        self.prompt_tokens += other.prompt_tokens
+        self.candidates_tokens += other.candidates_tokens
+        self.cached_tokens += other.cached_tokens
+        self.total_tokens += other.total_tokens
+        self.shared_requests += other.shared_requests
+        self.shared_tokens += other.shared_tokens
+
+
+@dataclass
+class UsageMeter:
+    user_id: str
+    feature: str
+    counts: TokenCounts = field(default_factory=TokenCounts)
+
+    @property
+    def tokens_used(self) -> Optional[int]:
+        """Total tokens behind the request (shared calls included), or None without Gemini."""
+        if not self.counts.requests and not self.counts.shared_requests:
+            return None
+        return self.counts.total_tokens + self.counts.shared_tokens
+
+
+_meter: ContextVar[Optional[UsageMeter]] = ContextVar("usage_meter", default=None)
+
+# (day, user_id, feature, model) -> counts not yet written to storage
+_pending: Dict[Tuple[str, str, str, str], TokenCounts] = {}
+_pending_lock = threading.Lock()
+
+# (day, model) -> total tokens used by this process today (for the model router's budget)
+_model_tokens: Dict[Tuple[str, str], int] = {}
+
+
+def start_meter(user_id: Optional[str], feature: str) -> UsageMeter:
+    """Attribute Gemini usage in the current request / task to user_id and feature."""
+    meter = UsageMeter(user_id=user_id or "", feature=feature)
+    _meter.set(meter)
+    return meter
+
+
+def counts_from_metadata(metadata: Optional[Dict]) -> TokenCounts:
+    metadata = metadata or {}
+    return TokenCounts(
+        requests=1,
+        prompt_tokens=int(metadata.get("promptTokenCount") or 0),
+        candidates_tokens=int(metadata.get("candidatesTokenCount") or 0),
+        cached_tokens=int(metadata.get("cachedContentTokenCount") or 0),
+        total_tokens=int(metadata.get("totalTokenCount") or 0),
+    )
+
+
+def shared_counts(metadata: Optional[Dict]) -> TokenCounts:
+    total = int((metadata or {}).get("totalTokenCount") or 0)
+    return TokenCounts(shared_requests=1, shared_tokens=total)
+
+
+def record_usage(model: str, metadata: Optional[Dict], shared: bool = False) -> None:
+    """
+    Add one response's usageMetadata to the current meter and the pending buffer.
+    shared=True: this caller got another request's coalesced response (not billed again).
+    """
+    counts = shared_counts(metadata) if shared else counts_from_metadata(metadata)
+    meter = _meter.get()
+    if meter is not None:
+        meter.counts.add(counts)
+        user_id, feature = meter.user_id, meter.feature
+    else:
+        user_id, feature = "", "other"
+
+    day = datetime.utcnow().date().isoformat()
+    with _pending_lock:
+        _pending.setdefault((day, user_id, feature, model), TokenCounts()).add(counts)
+        if (day, model) not in _model_tokens:
+            for stale in [k for k in _model_tokens if k[0] != day]:
+                del _model_tokens[stale]
+        _model_tokens[(day, model)] = _model_tokens.get((day, model), 0) + counts.total_tokens  # Billed only
+
+
+def tokens_today(model: str) -> int:
+    """Tokens this process has spent on `model` since UTC midnight."""
+    return _model_tokens.get((datetime.utcnow().date().isoformat(), model), 0)
+
+
+def flush_usage() -> int:
+    """Write buffered usage to storage in one batch. Returns the number of rows written."""
+    global _pending
+    with _pending_lock:
+        batch, _pending = _pending, {}
+    if not batch:
+        return 0
+
+    rows = [
+        {"day": day, "user_id": user_id, "feature": feature, "model": model, **vars(counts)}
+        for (day, user_id, feature, model), counts in batch.items()
+    ]
+    try:
+        add_usage(rows)
+    except Exception:
+        # Put the batch back so the next flush retries it
+        with _pending_lock:
+            for key, counts in batch.items():
+                _pending.setdefault(key, TokenCounts()).add(counts)
+        raise
+    return len(rows)